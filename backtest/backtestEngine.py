@@ -0,0 +1,295 @@
+import os
+import time
+
+import numpy as np
+
+from strategies.barHistory import Bar
+from strategies.baseStrategy import BUY_CODE, SELL_CODE, SIGNAL_CODES
+
+# Event-driven backtester that replays stored minute bars through strategies.
+#
+# Bars are held column-wise in a BarData and replayed one timestamp at a
+# time across all symbols, in time order. Three paths share the same simulated
+# broker:
+#   run()        calls BaseStrategy.on_bar() for every bar, one instance per
+#                symbol, so any strategy or EnsembleStrategy can be tested.
+#   run_batch()  feeds each timestamp's cross-section to a BatchEnsemble in
+#                one vectorized call (the incremental indicator path).
+#   run_vectorized()  computes each symbol's whole signal series up front
+#                with BaseStrategy.generate_signals() and replays those, which
+#                gives run()'s results without calling on_bar at all.
+#
+# Orders are generated the way the live bot does it (BUY targets a long of
+# `qty`, SELL targets flat or short) and fill at the symbol's next bar open
+# with slippage and commission applied.
+
+_COLUMNS = ("symbol_idx", "time", "open", "high", "low", "close", "volume")
+
+
+# Column-wise bars sorted by (time, symbol). `time` is int64 unix
+# microseconds and `symbol_idx` indexes into `symbols`.
+class BarData:
+    __slots__ = ("symbols", "symbol_idx", "time", "open", "high", "low", "close", "volume")
+
+    def __init__(self, symbols, symbol_idx, time, open, high, low, close, volume):
+        order = np.lexsort((symbol_idx, time))
+        self.symbols = list(symbols)
+        self.symbol_idx = np.asarray(symbol_idx, dtype=np.int64)[order]
+        self.time = np.asarray(time, dtype=np.int64)[order]
+        self.open = np.asarray(open, dtype=np.float64)[order]
+        self.high = np.asarray(high, dtype=np.float64)[order]
+        self.low = np.asarray(low, dtype=np.float64)[order]
+        self.close = np.asarray(close, dtype=np.float64)[order]
+        self.volume = np.asarray(volume, dtype=np.float64)[order]
+
+    def __len__(self):
+        return len(self.time)
+
+    # Yield (time, slice) for each timestamp's cross-section, in time order.
+    def cross_sections(self):
+        if len(self.time) == 0:
+            return
+        bounds = np.flatnonzero(np.diff(self.time)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self.time)]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield int(self.time[start]), slice(start, end)
+
+    # (rows x 5) OHLCV matrix in batchEnsemble.BAR_FIELDS order.
+    def matrix(self, rows=slice(None)) -> np.ndarray:
+        return np.column_stack((self.open[rows], self.high[rows], self.low[rows],
+                                self.close[rows], self.volume[rows]))
+
+    # From a DataFrame with symbol, timestamp, open, high, low, close, volume columns.
+    @classmethod
+    def from_dataframe(cls, df):
+        import pandas
+        symbols, symbol_idx = np.unique(df["symbol"].to_numpy(dtype=str), return_inverse=True)
+        times = pandas.to_datetime(df["timestamp"], utc=True).dt.tz_localize(None)
+        return cls(symbols, symbol_idx, times.to_numpy(dtype="datetime64[us]").astype(np.int64),
+                   df["open"].to_numpy(), df["high"].to_numpy(), df["low"].to_numpy(),
+                   df["close"].to_numpy(), df["volume"].to_numpy())
+
+    # Local file cache (.npz), so repeated runs skip the database.
+    def save(self, path: str):
+        np.savez(path, symbols=np.asarray(self.symbols), symbol_idx=self.symbol_idx, time=self.time,
+                 open=self.open, high=self.high, low=self.low, close=self.close, volume=self.volume)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            return cls(f["symbols"].tolist(), f["symbol_idx"], f["time"], f["open"], f["high"],
+                       f["low"], f["close"], f["volume"])
+
+    # From a datastream.barCache.BarCache, for the cached part of [start, end).
+    @classmethod
+    def from_cache(cls, cache, symbols, start=None, end=None):
+        columns = cache.read_many(symbols, start, end)
+        names = list(columns)
+        parts = list(columns.values())
+        lengths = [len(c["time"]) for c in parts]
+
+        def stack(name):
+            return np.concatenate([c[name] for c in parts]) if parts else np.empty(0)
+
+        return cls(names, np.repeat(np.arange(len(names)), lengths), stack("time"), stack("open"),
+                   stack("high"), stack("low"), stack("close"), stack("volume"))
+
+    # One raw .npy file per column under `directory`, so other processes can
+    # map the same bars with open_columns() instead of receiving a copy.
+    def save_columns(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "symbols.npy"), np.asarray(self.symbols))
+        for name in _COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    # Read-only memory map of a save_columns() directory. The columns are
+    # already sorted, so this skips the sort and copy done by __init__.
+    @classmethod
+    def open_columns(cls, directory: str):
+        data = cls.__new__(cls)
+        data.symbols = np.load(os.path.join(directory, "symbols.npy")).tolist()
+        for name in _COLUMNS:
+            setattr(data, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        return data
+
+
+# Read bars for `symbols` in [start, end) from stock_bars or crypto_bars,
+# decoded straight into arrays by datastream.barReader.
+async def load_bars_from_db(pool, symbols, start, end, crypto: bool = False) -> BarData:
+    from datastream import barReader
+    bars = await barReader.fetch_range(symbols, start, end, crypto=crypto, pool=pool)
+    return BarData(symbols, bars["symbol_id"], bars["time"].view(np.int64), bars["open"], bars["high"],
+                   bars["low"], bars["close"], bars["volume"])
+
+
+# Simulated account holding one position per symbol slot.
+class SimulatedBroker:
+    def __init__(self, n_symbols: int, initial_cash: float = 100000.0, qty: float = 1,
+                 allow_short: bool = False, commission_per_share: float = 0.0,
+                 commission_pct: float = 0.0, slippage_bps: float = 1.0):
+        self.initial_cash = initial_cash
+        self.cash = initial_cash
+        self.qty = qty
+        self.allow_short = allow_short
+        self.commission_per_share = commission_per_share
+        self.commission_pct = commission_pct
+        self.slippage = slippage_bps / 10000.0
+
+        self.position = np.zeros(n_symbols)
+        self.avg_cost = np.zeros(n_symbols)
+        self.last_price = np.zeros(n_symbols)
+        self.pending = np.full(n_symbols, np.nan)  # target awaiting the next open
+        self.n_pending = 0
+
+        self.trades = 0
+        self.round_trips = 0
+        self.wins = 0
+        self.commission = 0.0
+        self.realized_pnl = 0.0
+
+    # Fill orders queued on the previous bar at this bar's open.
+    def fill(self, idx, open_):
+        if self.n_pending == 0:
+            return
+        target = self.pending[idx]
+        queued = ~np.isnan(target)
+        if not queued.any():
+            return
+        rows = idx[queued]
+        self.pending[rows] = np.nan
+        self.n_pending -= len(rows)
+
+        target = target[queued]
+        pos = self.position[rows]
+        delta = target - pos
+        side = np.sign(delta)
+        price = open_[queued] * (1.0 + side * self.slippage)
+        size = np.abs(delta)
+
+        commission = size * self.commission_per_share + size * price * self.commission_pct
+        closing = np.where(side != np.sign(pos), np.minimum(size, np.abs(pos)), 0.0)
+        opening = size - closing
+        realized = closing * (price - self.avg_cost[rows]) * np.sign(pos)
+
+        avg = self.avg_cost[rows]
+        grown = (avg * np.abs(pos) + price * opening) / np.where(target == 0, 1.0, np.abs(target))
+        avg = np.where(target == 0, 0.0, np.where(opening > 0, np.where(closing > 0, price, grown), avg))
+
+        self.avg_cost[rows] = avg
+        self.position[rows] = target
+        self.cash -= float(np.sum(delta * price) + np.sum(commission))
+
+        self.trades += len(rows)
+        self.round_trips += int(np.count_nonzero(closing > 0))
+        self.wins += int(np.count_nonzero((closing > 0) & (realized > 0)))
+        self.commission += float(np.sum(commission))
+        self.realized_pnl += float(np.sum(realized))
+
+    # Mark prices and queue orders for signals that change the target position.
+    def on_signals(self, idx, close, signals):
+        self.last_price[idx] = close
+        target = np.where(signals == BUY_CODE, self.qty,
+                          np.where(signals == SELL_CODE, -self.qty if self.allow_short else 0.0, np.nan))
+        change = ~np.isnan(target) & (target != self.position[idx])
+        if change.any():
+            rows = idx[change]
+            self.n_pending += int(np.count_nonzero(np.isnan(self.pending[rows])))
+            self.pending[rows] = target[change]
+
+    def equity(self) -> float:
+        return self.cash + float(np.dot(self.position, self.last_price))
+
+
+class Backtest:
+    # broker_args: keyword arguments for SimulatedBroker
+    def __init__(self, **broker_args):
+        self.broker_args = broker_args
+
+    # Replay through per-symbol strategy instances from `strategy_factory`.
+    def run(self, data: BarData, strategy_factory) -> dict:
+        strategies = [strategy_factory() for _ in data.symbols]
+        symbols = data.symbols
+        # strategies copy what they need, so one Bar is reused for every row
+        bar = Bar()
+
+        def evaluate(rows):
+            idx = data.symbol_idx[rows]
+            signals = np.empty(len(idx), dtype=np.int8)
+            opens, highs, lows = data.open[rows].tolist(), data.high[rows].tolist(), data.low[rows].tolist()
+            closes, volumes, times = data.close[rows].tolist(), data.volume[rows].tolist(), data.time[rows]
+            for i, slot in enumerate(idx.tolist()):
+                bar.symbol, bar.timestamp = symbols[slot], times[i]
+                bar.open, bar.high, bar.low, bar.close, bar.volume = opens[i], highs[i], lows[i], closes[i], volumes[i]
+                signals[i] = SIGNAL_CODES[strategies[slot].on_bar(symbols[slot], bar)]
+            return signals
+
+        return self._replay(data, evaluate)
+
+    # Replay through a BatchEnsemble, one vectorized update per timestamp.
+    def run_batch(self, data: BarData, batch_ensemble) -> dict:
+        matrix = data.matrix()
+
+        def evaluate(rows):
+            return batch_ensemble.update(data.symbol_idx[rows], matrix[rows])
+
+        return self._replay(data, evaluate)
+
+    # Replay signals from one generate_signals() call per symbol. The time
+    # spent generating them is included in elapsed_s / bars_per_sec.
+    def run_vectorized(self, data: BarData, strategy_factory) -> dict:
+        start = time.perf_counter()
+        signals = np.zeros(len(data), dtype=np.int8)
+        order = np.argsort(data.symbol_idx, kind="stable")
+        for rows in np.split(order, np.flatnonzero(np.diff(data.symbol_idx[order])) + 1):
+            if len(rows):
+                columns = {name: getattr(data, name)[rows] for name in ("open", "high", "low", "close", "volume")}
+                signals[rows] = strategy_factory().generate_signals(columns)
+        generated = time.perf_counter() - start
+
+        result = self._replay(data, lambda rows: signals[rows])
+        result["elapsed_s"] += generated
+        result["bars_per_sec"] = result["bars"] / result["elapsed_s"] if result["elapsed_s"] > 0 else float("inf")
+        return result
+
+    def _replay(self, data: BarData, evaluate) -> dict:
+        broker = SimulatedBroker(len(data.symbols), **self.broker_args)
+        equity = []
+
+        start = time.perf_counter()
+        for _, rows in data.cross_sections():
+            idx = data.symbol_idx[rows]
+            broker.fill(idx, data.open[rows])
+            signals = evaluate(rows)
+            broker.on_signals(idx, data.close[rows], signals)
+            equity.append(broker.equity())
+        elapsed = time.perf_counter() - start
+
+        return summarize(broker, np.asarray(equity), len(data), elapsed)
+
+
+# PnL and trade statistics for a finished replay.
+def summarize(broker: SimulatedBroker, equity: np.ndarray, bars: int, elapsed: float) -> dict:
+    final = float(equity[-1]) if len(equity) else broker.initial_cash
+    if len(equity):
+        peak = np.maximum.accumulate(equity)
+        max_drawdown = float(np.max((peak - equity) / peak))
+    else:
+        max_drawdown = 0.0
+
+    return {
+        "bars": bars,
+        "timestamps": len(equity),
+        "final_equity": final,
+        "pnl": final - broker.initial_cash,
+        "return_pct": (final / broker.initial_cash - 1.0) * 100.0,
+        "max_drawdown_pct": max_drawdown * 100.0,
+        "realized_pnl": broker.realized_pnl,
+        "trades": broker.trades,
+        "round_trips": broker.round_trips,
+        "win_rate": broker.wins / broker.round_trips if broker.round_trips else 0.0,
+        "commission": broker.commission,
+        "elapsed_s": elapsed,
+        "bars_per_sec": bars / elapsed if elapsed > 0 else float("inf"),
+        "equity_curve": equity,
+    }
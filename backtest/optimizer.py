@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import datetime
+import functools
+import importlib
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest.backtestEngine import Backtest, BarData, load_bars_from_db
+
+# Grid / random search over strategy constructor parameters.
+#
+# The bars are written once as raw column files (in /dev/shm when available)
+# and every worker process memory-maps them read-only, so a sweep shares one
+# copy of the history no matter how many workers or configurations it runs.
+# Each worker only receives (strategy class, params) and sends back the
+# backtest summary, and the results come back ranked by `metric`.
+
+# Strategy name -> (class path, default search space). In a search space a
+# list is a set of choices and a (low, high) tuple is a range that random
+# search samples uniformly (integers when both ends are ints).
+STRATEGIES = {
+    "bollinger": ("strategies.TALibStrategies.BollingerStrategy",
+                  {"period": list(range(10, 42, 2)), "nbdev": [1.5, 1.75, 2.0, 2.25, 2.5, 3.0]}),
+    "macd": ("strategies.TALibStrategies.MACDStrategy",
+             {"fast": list(range(6, 17)), "slow": list(range(18, 42, 2)), "signal": list(range(5, 13))}),
+    "stochastic": ("strategies.TALibStrategies.StochasticStrategy",
+                   {"fastk_period": list(range(5, 22)), "slowk_period": [1, 2, 3, 4, 5],
+                    "slowd_period": [1, 2, 3, 4, 5]}),
+    "psar": ("strategies.TALibStrategies.ParabolicSARStrategy",
+             {"acceleration": [0.01, 0.015, 0.02, 0.025, 0.03, 0.04],
+              "maximum": [0.1, 0.15, 0.2, 0.25, 0.3]}),
+    "rsi": ("strategies.myStrategies.RSIStrategy",
+            {"period": list(range(7, 29)), "rsi_buy": [20, 25, 30, 35], "rsi_sell": [65, 70, 75, 80]}),
+}
+
+# Summary fields where smaller is better
+_LOWER_IS_BETTER = {"max_drawdown_pct", "commission"}
+
+
+# Every combination in `space`, as a list of parameter dicts.
+def grid(space: dict) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+# Up to `n` distinct random draws from `space` (fewer if the space is smaller).
+def random_configs(space: dict, n: int, seed: int = None) -> list:
+    rng = random.Random(seed)
+
+    def draw(choices):
+        if isinstance(choices, tuple):
+            low, high = choices
+            if isinstance(low, int) and isinstance(high, int):
+                return rng.randint(low, high)
+            return rng.uniform(low, high)
+        return rng.choice(choices)
+
+    configs = {}
+    for _ in range(n * 20):
+        if len(configs) == n:
+            break
+        params = {name: draw(choices) for name, choices in space.items()}
+        configs.setdefault(tuple(params.values()), params)
+    return list(configs.values())
+
+
+@functools.lru_cache(maxsize=None)
+def _load_class(class_path: str):
+    module, name = class_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+# Per-worker state, set up once by the pool initializer
+_worker_data = None
+_worker_backtest = None
+_worker_run = None
+
+def _init_worker(directory: str, broker_args: dict, vectorized: bool):
+    global _worker_data, _worker_backtest, _worker_run
+    _worker_data = BarData.open_columns(directory)
+    _worker_backtest = Backtest(**broker_args)
+    _worker_run = _worker_backtest.run_vectorized if vectorized else _worker_backtest.run
+
+def _run_config(job) -> dict:
+    class_path, params = job
+    try:
+        result = _worker_run(_worker_data, functools.partial(_load_class(class_path), **params))
+    except Exception as e:
+        return {"params": params, "error": repr(e)}
+    del result["equity_curve"]
+    result["params"] = params
+    return result
+
+
+# Backtest `strategy` (a STRATEGIES name or a class path) with every params
+# dict in `configs` across `workers` processes. Returns the successful runs
+# sorted best first by `metric`; failed configurations are reported and left out.
+# vectorized=False replays every bar through on_bar instead of using the
+# strategy's generate_signals().
+def sweep(data: BarData, strategy: str, configs, metric: str = "return_pct",
+          workers: int = None, broker_args: dict = None, chunksize: int = None,
+          vectorized: bool = True) -> list:
+    class_path = STRATEGIES[strategy][0] if strategy in STRATEGIES else strategy
+    configs = list(configs)
+    workers = workers or os.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, len(configs) // (workers * 16))
+    shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="sweep_", dir=shm) as directory:
+        data.save_columns(directory)
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(directory, broker_args or {}, vectorized)) as pool:
+            jobs = ((class_path, params) for params in configs)
+            results = list(pool.map(_run_config, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if "error" in r]
+    for r in failed[:5]:
+        print(f"Config {r['params']} failed: {r['error']}")
+    print(f"Swept {len(configs)} configurations ({len(failed)} failed) over {len(data)} bars "
+          f"on {workers} workers in {elapsed:.1f}s")
+
+    ranked = [r for r in results if "error" not in r]
+    ranked.sort(key=lambda r: r[metric], reverse=metric not in _LOWER_IS_BETTER)
+    return ranked
+
+
+async def _load_from_db(symbols, start, end, crypto):
+    import datastream.databaseQueries as dbq
+
+    await dbq.init_db_pool()
+    try:
+        return await load_bars_from_db(dbq.pool, symbols, start, end, crypto=crypto)
+    finally:
+        await dbq.close_db_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep for a single strategy")
+    parser.add_argument("strategy", choices=sorted(STRATEGIES))
+    parser.add_argument("--bars", help=".npz file saved with BarData.save (otherwise read from the database)")
+    parser.add_argument("--symbols", nargs="+", help="symbols to load from the database")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--crypto", action="store_true")
+    parser.add_argument("--samples", type=int, default=0, help="random search with this many draws (default: full grid)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--metric", default="return_pct")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--per-bar", action="store_true",
+                        help="replay every bar through on_bar instead of generate_signals")
+    args = parser.parse_args()
+
+    if args.bars:
+        data = BarData.load(args.bars)
+    else:
+        if not (args.symbols and args.start and args.end):
+            parser.error("--symbols, --start and --end are required without --bars")
+        data = asyncio.run(_load_from_db(args.symbols, args.start, args.end, args.crypto))
+
+    space = STRATEGIES[args.strategy][1]
+    configs = random_configs(space, args.samples, args.seed) if args.samples else grid(space)
+    ranked = sweep(data, args.strategy, configs, metric=args.metric, workers=args.workers,
+                   vectorized=not args.per_bar)
+
+    for rank, r in enumerate(ranked[:args.top], start=1):
+        print(f"{rank:3d}. {args.metric}={r[args.metric]:10.4f}  trades={r['trades']:6d}  "
+              f"win_rate={r['win_rate']:.2f}  max_dd={r['max_drawdown_pct']:.2f}%  {r['params']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datastream.barCache import BarCache
+
+# Times opening a year of cached minute bars. The cache is built from
+# synthetic bars under --root the first time (about 2.4GB for 500 symbols).
+# Mapping every file should take well under a second; the concatenated
+# read copies the data and is reported for comparison.
+
+TARGET_SECONDS = 1.0
+TRADING_DAYS = 252
+MINUTES_PER_DAY = 390
+
+def build(cache: BarCache, n_symbols: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64("2023-01-02"), np.datetime64("2024-01-01"))
+    days = days[np.is_busday(days)][:TRADING_DAYS]
+    opens = (days.astype("datetime64[us]") + np.timedelta64(14 * 60 + 30, "m")).astype(np.int64)
+    times = (opens[:, None] + np.arange(MINUTES_PER_DAY) * 60_000_000).ravel()
+
+    start = time.perf_counter()
+    for i in range(n_symbols):
+        close = 100.0 + np.cumsum(rng.normal(0.0, 0.05, len(times)))
+        spread = rng.uniform(0.01, 0.1, len(times))
+        cache.write(f"SYM{i}", {"time": times, "open": close - spread / 2, "high": close + spread,
+                                "low": close - spread, "close": close,
+                                "volume": rng.integers(100, 10000, len(times)).astype(np.float64)},
+                    covered=(int(times[0]), int(times[-1]) + 60_000_000))
+    print(f"built {n_symbols} symbols x {len(times)} bars in {time.perf_counter() - start:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bar cache load benchmark")
+    parser.add_argument("--root", default="/tmp/bar_cache_benchmark")
+    parser.add_argument("--symbols", type=int, default=500)
+    args = parser.parse_args()
+
+    cache = BarCache(args.root)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    if any(cache.coverage(s) is None for s in symbols):
+        build(cache, args.symbols)
+
+    # fresh instance so nothing is mapped yet
+    cache = BarCache(args.root)
+    start = time.perf_counter()
+    segments = {s: cache.segments(s) for s in symbols}
+    elapsed = time.perf_counter() - start
+    bars = sum(len(seg["time"]) for parts in segments.values() for seg in parts)
+    status = "OK" if elapsed < TARGET_SECONDS else "BELOW TARGET"
+    print(f"mapped {bars:,} bars ({args.symbols} symbols) in {elapsed:.3f}s  [{status}]")
+
+    start = time.perf_counter()
+    closes = sum(float(seg["close"][-1]) for parts in segments.values() for seg in parts)
+    print(f"touched the last close of every file in {time.perf_counter() - start:.3f}s ({closes:.0f})")
+
+    start = time.perf_counter()
+    read = cache.read_many(symbols)
+    print(f"concatenated read of {sum(len(c['time']) for c in read.values()):,} bars "
+          f"in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.latencyMetrics import LatencyHistogram, metrics
+from strategies.barHistory import Bar
+from strategies.ensembleStrategy import EnsembleStrategy
+from strategies.myStrategies import BreakoutStrategy, MovingAverageCrossoverStrategy, RSIStrategy
+from strategies.TALibStrategies import BollingerStrategy, MACDStrategy, ParabolicSARStrategy, StochasticStrategy
+
+# Benchmark and load-test harness.
+#
+#   strategies  per-bar latency and throughput of every strategy class and
+#               the default ensemble on a synthetic random walk
+#   db          the databaseQueries insert paths against the configured
+#               Postgres (rows for BENCH* symbols, deleted afterwards)
+#   replay      a trading day of synthetic bars for --symbols symbols pushed
+#               through strategyManager (batch or per-bar mode) with a fake
+#               broker, at --speedup times real time (0 = as fast as possible)
+#
+# Results are written as JSON (--output) together with the git commit, and
+# --compare prints the change against an earlier results file.
+#
+#   python benchmarks/benchmarkSuite.py strategies db --output bench.json
+#   python benchmarks/benchmarkSuite.py replay --symbols 1000 --speedup 0
+
+MINUTES_PER_DAY = 390
+SESSION_OPEN = datetime.datetime(2024, 1, 2, 14, 30, tzinfo=datetime.timezone.utc)
+
+
+# Random-walk minute bars: a list per minute of one bar per symbol.
+def synthetic_stream(n_symbols: int, n_minutes: int, seed: int = 0, start=SESSION_OPEN) -> list:
+    rng = np.random.default_rng(seed)
+    close = (100.0 + np.cumsum(rng.normal(0.0, 0.1, (n_minutes, n_symbols)), axis=0)).tolist()
+    spread = rng.uniform(0.01, 0.2, (n_minutes, n_symbols)).tolist()
+    volume = rng.integers(100, 10000, (n_minutes, n_symbols)).astype(float).tolist()
+    symbols = [f"BENCH{i}" for i in range(n_symbols)]
+    stream = []
+    for m in range(n_minutes):
+        ts = start + datetime.timedelta(minutes=m)
+        c, s, v = close[m], spread[m], volume[m]
+        stream.append([Bar(symbols[i], ts, c[i] - s[i] / 2, c[i] + s[i], c[i] - s[i], c[i], v[i])
+                       for i in range(n_symbols)])
+    return stream
+
+
+def _histogram_summary(histogram: LatencyHistogram, elapsed: float) -> dict:
+    summary = histogram.summary()
+    summary["elapsed_s"] = elapsed
+    summary["per_sec"] = histogram.count / elapsed if elapsed > 0 else 0.0
+    return summary
+
+
+STRATEGY_FACTORIES = {
+    "BollingerStrategy": lambda: BollingerStrategy(period=20, nbdev=2),
+    "MACDStrategy": MACDStrategy,
+    "StochasticStrategy": StochasticStrategy,
+    "ParabolicSARStrategy": ParabolicSARStrategy,
+    "MovingAverageCrossoverStrategy": MovingAverageCrossoverStrategy,
+    "BreakoutStrategy": BreakoutStrategy,
+    "RSIStrategy": RSIStrategy,
+    "EnsembleStrategy": lambda: EnsembleStrategy([BollingerStrategy(period=20, nbdev=2), MACDStrategy(),
+                                                  ParabolicSARStrategy(), StochasticStrategy()]),
+}
+
+# Per-bar on_bar latency for each strategy over `n_bars` bars of one symbol.
+def bench_strategies(n_bars: int = 20000) -> dict:
+    bars = [b for (b,) in synthetic_stream(1, n_bars)]
+    clock = time.perf_counter_ns
+    results = {}
+    for name, factory in STRATEGY_FACTORIES.items():
+        strategy = factory()
+        histogram = LatencyHistogram()
+        start = time.perf_counter()
+        for bar in bars:
+            t = clock()
+            strategy.on_bar("BENCH0", bar)
+            histogram.record(clock() - t)
+        results[name] = _histogram_summary(histogram, time.perf_counter() - start)
+        print(f"{name:32s} p50 {results[name]['p50_us']:7.2f}us  p99 {results[name]['p99_us']:7.2f}us  "
+              f"{results[name]['per_sec']:>10,.0f} bars/s")
+    return results
+
+
+# Insert paths in databaseQueries: DataFrame COPY, live-bar COPY flush,
+# the write-behind buffer and single-row inserts.
+async def bench_db(n_symbols: int = 100, n_minutes: int = 390, single_rows: int = 2000) -> dict:
+    import pandas
+    import datastream.databaseQueries as dbq
+
+    await dbq.init_db_pool()
+    results = {}
+    try:
+        async def clear():
+            async with dbq.pool.acquire() as conn:
+                await conn.execute("DELETE FROM stock_bars WHERE symbol LIKE 'BENCH%'")
+
+        stream = synthetic_stream(n_symbols, n_minutes)
+        flat = [bar for minute in stream for bar in minute]
+
+        await clear()
+        df = pandas.DataFrame({
+            "timestamp": [b.timestamp for b in flat], "symbol": [b.symbol for b in flat],
+            "open": [b.open for b in flat], "high": [b.high for b in flat], "low": [b.low for b in flat],
+            "close": [b.close for b in flat], "volume": [b.volume for b in flat],
+        })
+        start = time.perf_counter()
+        await dbq.insert_df_to_db(df, crypto=False)
+        elapsed = time.perf_counter() - start
+        results["insert_df_to_db"] = {"rows": len(flat), "elapsed_s": elapsed, "rows_per_sec": len(flat) / elapsed}
+
+        await clear()
+        histogram = LatencyHistogram()
+        start = time.perf_counter()
+        for minute in stream:
+            t = time.perf_counter_ns()
+            await dbq.flush_bars(minute, crypto=False)
+            histogram.record(time.perf_counter_ns() - t)
+        elapsed = time.perf_counter() - start
+        results["flush_bars"] = _histogram_summary(histogram, elapsed)
+        results["flush_bars"]["rows_per_sec"] = len(flat) / elapsed
+
+        await clear()
+        buffer = dbq.BarWriteBuffer(crypto=False)
+        histogram = LatencyHistogram()
+        start = time.perf_counter()
+        for bar in flat:
+            t = time.perf_counter_ns()
+            await buffer.add(bar)
+            histogram.record(time.perf_counter_ns() - t)
+        await buffer.close()
+        elapsed = time.perf_counter() - start
+        results["BarWriteBuffer.add"] = _histogram_summary(histogram, elapsed)
+        results["BarWriteBuffer.add"]["rows_per_sec"] = len(flat) / elapsed
+
+        await clear()
+        histogram = LatencyHistogram()
+        start = time.perf_counter()
+        for bar in flat[:single_rows]:
+            t = time.perf_counter_ns()
+            await dbq.insert_bar_asyncpg(bar, crypto=False)
+            histogram.record(time.perf_counter_ns() - t)
+        results["insert_bar_asyncpg"] = _histogram_summary(histogram, time.perf_counter() - start)
+        await clear()
+    finally:
+        await dbq.close_db_pool()
+
+    for name, r in results.items():
+        print(f"{name:32s} {r.get('rows_per_sec', r.get('per_sec')):>12,.0f} rows/s")
+    return results
+
+
+# A trading day through strategyManager with the order executor on a fake
+# broker. speedup: simulated minutes per real minute (0 = unthrottled).
+async def bench_replay(n_symbols: int = 1000, n_minutes: int = MINUTES_PER_DAY,
+                       speedup: float = 0.0, batch: bool = True) -> dict:
+    import strategies.strategyManager as sm
+    from execution.fakeBroker import FakeBroker
+
+    # dropped and failed orders are counted in the metrics instead
+    logging.getLogger().setLevel(logging.CRITICAL)
+    stream = synthetic_stream(n_symbols, n_minutes)
+    sm.order_executor.broker = FakeBroker(latency=0.0005)
+    sm.bar_batcher.expected_symbols = n_symbols
+    handler = sm.on_stock_bar_batched if batch else sm.on_stock_bar
+
+    metrics.reset()
+    metrics.enabled = True
+    sm.order_executor.start()
+    lag = LatencyHistogram()
+    interval = 60.0 / speedup if speedup else 0.0
+    start = time.perf_counter()
+    try:
+        for m, minute in enumerate(stream):
+            if interval:
+                delay = start + m * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            due = time.perf_counter_ns()
+            for bar in minute:
+                t = time.perf_counter_ns()
+                await handler(bar)
+                metrics.record("replay.handler", time.perf_counter_ns() - t)
+            # how long the minute's bars took to get through, which must stay
+            # below the bar interval to keep up in real time
+            lag.record(time.perf_counter_ns() - due)
+            # let the order workers run, as the stream's socket reads would
+            await asyncio.sleep(0)
+        await sm.bar_batcher.flush()
+        await sm.order_executor.stop(drain=True)
+    finally:
+        metrics.enabled = False
+    elapsed = time.perf_counter() - start
+
+    bars = n_symbols * n_minutes
+    result = {
+        "symbols": n_symbols, "minutes": n_minutes, "bars": bars, "batch": batch, "speedup": speedup,
+        "elapsed_s": elapsed, "bars_per_sec": bars / elapsed,
+        "minute_processing": lag.summary(),
+        "metrics": metrics.snapshot(),
+    }
+    print(f"replay: {bars:,} bars ({n_symbols} symbols x {n_minutes} min, "
+          f"{'batch' if batch else 'per-bar'}) in {elapsed:.1f}s = {result['bars_per_sec']:,.0f} bars/s, "
+          f"minute p99 {result['minute_processing']['p99_us'] / 1000:.1f}ms")
+    counters = result["metrics"]["counters"]
+    print(f"        orders acked={counters.get('orders.acked', 0)} dropped={counters.get('orders.dropped', 0)} "
+          f"failed={counters.get('orders.failed', 0)}")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+
+def _flatten(value, prefix="") -> dict:
+    if isinstance(value, dict):
+        flat = {}
+        for key, v in value.items():
+            flat.update(_flatten(v, f"{prefix}.{key}" if prefix else str(key)))
+        return flat
+    return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+
+
+# Print numeric results that changed by more than `threshold` percent.
+def compare(old: dict, new: dict, threshold: float = 5.0):
+    before, after = _flatten(old.get("results", {})), _flatten(new.get("results", {}))
+    print(f"compared with {old.get('commit')} ({old.get('created')}):")
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] and (key.endswith("_us") or key.endswith("per_sec") or key.endswith("elapsed_s")):
+            change = (after[key] - before[key]) / abs(before[key]) * 100.0
+            if abs(change) >= threshold:
+                print(f"  {key:60s} {before[key]:>14,.2f} -> {after[key]:>14,.2f}  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strategy, ingest and replay benchmarks")
+    parser.add_argument("suites", nargs="*", default=["strategies"], choices=["strategies", "db", "replay"])
+    parser.add_argument("--bars", type=int, default=20000, help="bars per strategy micro-benchmark")
+    parser.add_argument("--symbols", type=int, default=1000, help="symbols for replay")
+    parser.add_argument("--db-symbols", type=int, default=100, help="symbols for the db suite")
+    parser.add_argument("--minutes", type=int, default=MINUTES_PER_DAY, help="minutes for replay and db")
+    parser.add_argument("--speedup", type=float, default=0.0, help="replay speed vs real time (0 = unthrottled)")
+    parser.add_argument("--per-bar", action="store_true", help="replay through the per-bar path instead of batch")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    if "strategies" in args.suites:
+        results["strategies"] = bench_strategies(args.bars)
+    if "db" in args.suites:
+        results["db"] = asyncio.run(bench_db(args.db_symbols, args.minutes))
+    if "replay" in args.suites:
+        results["replay"] = asyncio.run(bench_replay(args.symbols, args.minutes, args.speedup, not args.per_bar))
+
+    report = {
+        "commit": _git_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
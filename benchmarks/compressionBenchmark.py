@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import datetime
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datastream.databaseQueries as dbq
+from datastream import barReader, schemaManager
+
+# Disk footprint and scan speed of a synthetic year of minute bars in a
+# TimescaleDB hypertable, in three states:
+#   raw         as inserted
+#   reordered   every chunk rewritten in (symbol, time DESC) order, which is
+#               what the reorder policy does to closed chunks
+#   compressed  every chunk compressed with the schemaManager settings
+#               (segment by symbol, order by time DESC)
+# The data goes into a scratch hypertable (BENCH_TABLE) with the same
+# columns, keys, index and chunk interval as stock_bars, in the database
+# from config.py. It is dropped afterwards unless --keep is given.
+
+BENCH_TABLE = "bench_stock_bars"
+BENCH_INDEX = f"idx_{BENCH_TABLE}_symbol_time"
+TRADING_DAYS = 252
+MINUTES_PER_DAY = 390
+YEAR_START = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+YEAR_END = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+async def create_table(conn):
+    await conn.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    await conn.execute(f"""
+        CREATE TABLE {BENCH_TABLE} (
+            time TIMESTAMPTZ NOT NULL,
+            symbol TEXT NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            volume DOUBLE PRECISION,
+            PRIMARY KEY (time, symbol)
+        )
+    """)
+    await conn.execute("SELECT create_hypertable($1::regclass, 'time', chunk_time_interval => $2::text::interval)",
+                       BENCH_TABLE, schemaManager.STORAGE_POLICIES["stock_bars"]["chunk_interval"])
+    await conn.execute(f"CREATE INDEX {BENCH_INDEX} ON {BENCH_TABLE} (symbol, time DESC)")
+
+
+# One day of bars for every symbol per COPY, in arrival order (time, symbol)
+async def build(conn, symbols, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    days = np.arange(np.datetime64("2023-01-02"), np.datetime64("2024-01-01"))
+    days = days[np.is_busday(days)][:TRADING_DAYS]
+    opens = (days.astype("datetime64[us]") + np.timedelta64(14 * 60 + 30, "m")).astype(np.int64)
+    minutes = np.arange(MINUTES_PER_DAY, dtype=np.int64) * 60_000_000
+    names = np.array(symbols)
+    last = np.full(len(symbols), 100.0)
+
+    start = time.perf_counter()
+    for day_open in opens:
+        close = last + np.cumsum(rng.normal(0.0, 0.05, (MINUTES_PER_DAY, len(symbols))), axis=0)
+        last = close[-1]
+        spread = rng.uniform(0.01, 0.1, close.shape)
+        times = np.repeat(day_open + minutes, len(symbols))
+        data = dbq.bars_to_copy_binary(times, np.tile(names, MINUTES_PER_DAY),
+                                       (close - spread / 2).ravel(), (close + spread).ravel(),
+                                       (close - spread).ravel(), close.ravel(),
+                                       rng.integers(100, 10000, close.size).astype(np.float64))
+        await conn.copy_to_table(BENCH_TABLE, source=io.BytesIO(data), columns=dbq.BAR_COLUMNS, format="binary")
+    await conn.execute(f"ANALYZE {BENCH_TABLE}")
+    print(f"built {len(symbols)} symbols x {len(opens) * MINUTES_PER_DAY} bars "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+async def footprint(conn) -> int:
+    return await conn.fetchval("SELECT hypertable_size($1::regclass)", BENCH_TABLE)
+
+
+def _range(symbols, start, end):
+    return barReader._fetch(barReader._range_query(BENCH_TABLE, "symbol"), symbols, start, end)
+
+
+def _latest(symbols, n):
+    return barReader._fetch(f"""
+        SELECT b.time, s.id, b.open, b.high, b.low, b.close, b.volume
+        FROM {barReader._SYMBOL_IDS}
+        CROSS JOIN LATERAL (
+            SELECT time, open, high, low, close, volume FROM {BENCH_TABLE}
+            WHERE symbol = s.symbol
+            ORDER BY time DESC
+            LIMIT $2
+        ) b
+        ORDER BY b.time, s.symbol
+    """, symbols, n)
+
+
+async def _full_scan(conn):
+    return await conn.fetch(f"SELECT symbol, avg(close), max(high), sum(volume) FROM {BENCH_TABLE} GROUP BY symbol")
+
+
+# name -> coroutine factory; the read paths of barReader plus a full scan
+def scans(symbols) -> dict:
+    month = (datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc),
+             datetime.datetime(2023, 7, 1, tzinfo=datetime.timezone.utc))
+    quarter = (datetime.datetime(2023, 4, 1, tzinfo=datetime.timezone.utc),
+               datetime.datetime(2023, 7, 1, tzinfo=datetime.timezone.utc))
+    some = symbols[:min(50, len(symbols))]
+    return {
+        "1 symbol, 1 month": lambda conn: _range(symbols[:1], *month),
+        f"{len(some)} symbols, 1 quarter": lambda conn: _range(some, *quarter),
+        "1 symbol, full year": lambda conn: _range(symbols[:1], YEAR_START, YEAR_END),
+        "last 500 bars, all symbols": lambda conn: _latest(symbols, 500),
+        "aggregate, full table": _full_scan,
+    }
+
+
+async def time_scans(conn, symbols, repeat: int) -> dict:
+    results = {}
+    for name, scan in scans(symbols).items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await scan(conn)
+            samples.append(time.perf_counter() - start)
+        results[name] = (min(samples), statistics.median(samples))
+    return results
+
+
+async def run(args):
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    await dbq.init_db_pool()
+    stages = {}
+    try:
+        async with dbq.pool.acquire() as conn:
+            await create_table(conn)
+            await build(conn, symbols)
+            stages["raw"] = (await footprint(conn), await time_scans(conn, symbols, args.repeat))
+
+            start = time.perf_counter()
+            await conn.execute("SELECT reorder_chunk(c, $1::regclass) FROM show_chunks($2::regclass) c",
+                               BENCH_INDEX, BENCH_TABLE)
+            await conn.execute(f"VACUUM ANALYZE {BENCH_TABLE}")
+            print(f"reordered in {time.perf_counter() - start:.1f}s")
+            stages["reordered"] = (await footprint(conn), await time_scans(conn, symbols, args.repeat))
+
+            start = time.perf_counter()
+            await schemaManager.enable_compression(conn, BENCH_TABLE)
+            chunks = await schemaManager.compress_chunks(conn, BENCH_TABLE)
+            await conn.execute(f"VACUUM ANALYZE {BENCH_TABLE}")
+            print(f"compressed {chunks} chunks in {time.perf_counter() - start:.1f}s")
+            stages["compressed"] = (await footprint(conn), await time_scans(conn, symbols, args.repeat))
+
+            if not args.keep:
+                await conn.execute(f"DROP TABLE {BENCH_TABLE}")
+    finally:
+        await dbq.close_db_pool()
+
+    raw_bytes = stages["raw"][0]
+    print(f"\n{'':28s}" + "".join(f"{stage:>22s}" for stage in stages))
+    print(f"{'size on disk':28s}" + "".join(f"{size / 1e6:12.1f} MB {raw_bytes / size:5.1f}x"
+                                          for size, _ in stages.values()))
+    for name in scans(symbols):
+        print(f"{name:28s}" + "".join(f"{timings[name][0] * 1000:10.1f} / {timings[name][1] * 1000:7.1f}ms"
+                                      for _, timings in stages.values()))
+    print("(scan times: best / median of", args.repeat, "runs)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TimescaleDB compression benchmark")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help=f"leave {BENCH_TABLE} in place")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest.backtestEngine import Backtest
+from benchmarks.backtestBenchmark import synthetic_bars
+from strategies.barHistory import Bar
+from strategies.baseStrategy import SIGNAL_CODES
+from strategies.ensembleStrategy import AdaptiveEnsembleStrategy, EnsembleStrategy
+from strategies.myStrategies import BreakoutStrategy, MovingAverageCrossoverStrategy, RSIStrategy
+from strategies.TALibStrategies import BollingerStrategy, MACDStrategy, ParabolicSARStrategy, StochasticStrategy
+
+# Checks that generate_signals() returns exactly the signals on_bar()
+# produces bar by bar, for every strategy over synthetic histories that
+# include flat stretches, prices on a coarse tick grid and gaps, and reports
+# how long each path takes. Also checks that Backtest.run_vectorized()
+# reproduces Backtest.run(). Exits with status 1 on any mismatch.
+
+CONFIGS = {
+    "Bollinger": [lambda: BollingerStrategy(), lambda: BollingerStrategy(period=10, nbdev=1.5)],
+    "MACD": [lambda: MACDStrategy(), lambda: MACDStrategy(fast=6, slow=30, signal=5)],
+    "Stochastic": [lambda: StochasticStrategy(), lambda: StochasticStrategy(21, 1, 5)],
+    "PSAR": [lambda: ParabolicSARStrategy(), lambda: ParabolicSARStrategy(0.04, 0.3)],
+    "MA_Crossover": [lambda: MovingAverageCrossoverStrategy(), lambda: MovingAverageCrossoverStrategy(50, 400)],
+    "Breakout": [lambda: BreakoutStrategy(), lambda: BreakoutStrategy(lookback=300)],
+    "RSI": [lambda: RSIStrategy(), lambda: RSIStrategy(period=200, rsi_buy=45, rsi_sell=55)],
+    "Ensemble": [lambda: EnsembleStrategy([BollingerStrategy(), MACDStrategy(),
+                                           ParabolicSARStrategy(), StochasticStrategy()]),
+                 lambda: EnsembleStrategy([MovingAverageCrossoverStrategy(), BreakoutStrategy(), RSIStrategy(),
+                                           EnsembleStrategy([BollingerStrategy(), MACDStrategy()])])],
+    "Adaptive": [lambda: AdaptiveEnsembleStrategy([BollingerStrategy(), MACDStrategy(),
+                                                   ParabolicSARStrategy(), StochasticStrategy()]),
+                 lambda: AdaptiveEnsembleStrategy([BollingerStrategy(period=p) for p in (10, 20, 30)]
+                                                  + [StochasticStrategy(k) for k in (9, 14, 21)]
+                                                  + [RSIStrategy(p) for p in (7, 14, 28)],
+                                                  halflife=20, min_weight=0.5, probe_every=10)],
+}
+
+
+# One symbol's OHLCV columns: a random walk with a flat stretch, a stretch
+# rounded to 0.1 and an overnight-style gap
+def synthetic_history(n: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 100.0 + np.cumsum(rng.normal(0.0, 0.3, n))
+    flat = slice(n // 4, n // 4 + n // 20)
+    close[flat] = close[flat.start - 1]
+    coarse = slice(n // 2, n // 2 + n // 20)
+    close[coarse] = np.round(close[coarse], 1)
+    close[3 * n // 4:] += 15.0
+    high = close + np.abs(rng.normal(0.0, 0.2, n))
+    low = close - np.abs(rng.normal(0.0, 0.2, n))
+    high[flat] = low[flat] = close[flat]
+    return {"open": np.concatenate(([close[0]], close[:-1])), "high": high, "low": low, "close": close,
+            "volume": rng.integers(100, 10000, n).astype(np.float64)}
+
+
+def streamed(strategy, bars) -> np.ndarray:
+    bar = Bar("SYM")
+    signals = np.empty(len(bars["close"]), dtype=np.int8)
+    columns = [bars[name].tolist() for name in ("open", "high", "low", "close", "volume")]
+    for i, (bar.open, bar.high, bar.low, bar.close, bar.volume) in enumerate(zip(*columns)):
+        signals[i] = SIGNAL_CODES[strategy.on_bar("SYM", bar)]
+    return signals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate_signals vs on_bar consistency check")
+    parser.add_argument("--bars", type=int, default=20000, help="bars per synthetic history")
+    parser.add_argument("--seeds", type=int, default=5, help="number of synthetic histories")
+    args = parser.parse_args()
+
+    failures = 0
+    histories = [synthetic_history(args.bars, seed) for seed in range(args.seeds)]
+    print(f"{'strategy':14s} {'config':>6s} {'mismatches':>10s} {'signals':>8s} {'on_bar':>9s} {'vectorized':>10s}")
+    for name, factories in CONFIGS.items():
+        for n, factory in enumerate(factories):
+            mismatches = active = 0
+            stream_s = vector_s = 0.0
+            for bars in histories:
+                start = time.perf_counter()
+                expected = streamed(factory(), bars)
+                stream_s += time.perf_counter() - start
+
+                start = time.perf_counter()
+                got = factory().generate_signals(bars)
+                vector_s += time.perf_counter() - start
+
+                bad = np.flatnonzero(got != expected)
+                if len(bad):
+                    print(f"  {name}[{n}]: first mismatch at bar {bad[0]}: "
+                          f"on_bar={expected[bad[0]]} generate_signals={got[bad[0]]}")
+                mismatches += len(bad)
+                active += int(np.count_nonzero(expected))
+            failures += mismatches
+            print(f"{name:14s} {n:6d} {mismatches:10d} {active:8d} {stream_s * 1000:7.0f}ms {vector_s * 1000:8.1f}ms")
+
+    # whole backtests: per-bar replay vs precomputed signals
+    data = synthetic_bars(50, 2000)
+    for name in ("Ensemble", "Adaptive", "RSI"):
+        factory = CONFIGS[name][0]
+        per_bar = Backtest(slippage_bps=1.0).run(data, factory)
+        vectorized = Backtest(slippage_bps=1.0).run_vectorized(data, factory)
+        same = all(per_bar[key] == vectorized[key] for key in ("trades", "round_trips", "final_equity"))
+        failures += not same
+        print(f"backtest {name}: run {per_bar['elapsed_s']:.2f}s, run_vectorized {vectorized['elapsed_s']:.2f}s, "
+              f"trades {per_bar['trades']} / {vectorized['trades']}  [{'OK' if same else 'MISMATCH'}]")
+
+    print("OK" if not failures else f"FAILED ({failures} mismatches)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
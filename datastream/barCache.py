@@ -0,0 +1,216 @@
+import datetime
+import json
+import mmap
+import os
+
+import numpy
+
+# Local columnar cache of OHLCV bars, filled incrementally from
+# stock_bars / crypto_bars so repeated research and backtest runs read from
+# disk instead of the database.
+#
+# Layout under `root`:
+#   manifest.json              per symbol: the time range that has been
+#                              filled, and per file its row count and
+#                              first / last bar time
+#   <SYMBOL>/<YYYY-MM>.bin     one month of bars, column-major: int64 unix
+#                              microsecond times followed by float64 open,
+#                              high, low, close and volume, each contiguous
+#
+# Files are opened with mmap and the columns handed out as read-only NumPy
+# views (no copy, no parse). The manifest lets a time-range read skip every
+# file outside the range without touching it.
+
+COLUMNS = ("time", "open", "high", "low", "close", "volume")
+
+_UNIX_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+# datetime (naive = UTC) or int unix microseconds -> int unix microseconds
+def _to_us(ts) -> int:
+    if ts is None or isinstance(ts, (int, numpy.integer)):
+        return ts
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=datetime.timezone.utc)
+    return (ts - _UNIX_EPOCH) // datetime.timedelta(microseconds=1)
+
+def _from_us(us: int) -> datetime.datetime:
+    return _UNIX_EPOCH + datetime.timedelta(microseconds=us)
+
+
+class BarCache:
+    def __init__(self, root: str, crypto: bool = False):
+        self.root = root
+        self.table = "crypto_bars" if crypto else "stock_bars"
+        self._manifest_path = os.path.join(root, "manifest.json")
+        self._maps = {}  # path -> (mmap, (6 x rows) int64 view)
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"table": self.table, "symbols": {}}
+
+    def symbols(self) -> list:
+        return sorted(self.manifest["symbols"])
+
+    # (start_us, end_us) that has been filled for `symbol`, or None
+    def coverage(self, symbol: str):
+        entry = self.manifest["symbols"].get(symbol)
+        return tuple(entry["covered"]) if entry else None
+
+    # Zero-copy column views for `symbol` in [start, end), one dict per file.
+    def segments(self, symbol: str, start=None, end=None) -> list:
+        entry = self.manifest["symbols"].get(symbol)
+        if entry is None:
+            return []
+        start, end = _to_us(start), _to_us(end)
+
+        segments = []
+        for month, info in sorted(entry["files"].items()):
+            if (end is not None and info["first"] >= end) or (start is not None and info["last"] < start):
+                continue
+            table = self._map(symbol, month, info["rows"])
+            times = table[0]
+            lo = 0 if start is None or info["first"] >= start else int(numpy.searchsorted(times, start))
+            hi = len(times) if end is None or info["last"] < end else int(numpy.searchsorted(times, end))
+            if lo < hi:
+                columns = {"time": times[lo:hi]}
+                floats = table[1:, lo:hi].view(numpy.float64)
+                for i, name in enumerate(COLUMNS[1:]):
+                    columns[name] = floats[i]
+                segments.append(columns)
+        return segments
+
+    # {symbol: columns} for every cached symbol in `symbols`
+    def read_many(self, symbols, start=None, end=None) -> dict:
+        return {symbol: self.read(symbol, start, end) for symbol in symbols if symbol in self.manifest["symbols"]}
+
+    # Columns for `symbol` in [start, end). A range inside one file is a
+    # zero-copy view; a range spanning files is concatenated.
+    def read(self, symbol: str, start=None, end=None) -> dict:
+        segments = self.segments(symbol, start, end)
+        if len(segments) == 1:
+            return segments[0]
+        if not segments:
+            return {name: numpy.empty(0, dtype=numpy.int64 if name == "time" else numpy.float64)
+                    for name in COLUMNS}
+        return {name: numpy.concatenate([s[name] for s in segments]) for name in COLUMNS}
+
+    # Merge bars into the cache. `columns` maps COLUMNS names to arrays with
+    # `time` in int64 unix microseconds; bars already cached for the same
+    # time are kept. Returns the number of new rows.
+    def write(self, symbol: str, columns: dict, covered=None) -> int:
+        times = numpy.asarray(columns["time"], dtype=numpy.int64)
+        entry = self.manifest["symbols"].setdefault(symbol, {"covered": None, "files": {}})
+        added = 0
+
+        if len(times):
+            os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+            if not numpy.all(times[1:] >= times[:-1]):
+                order = numpy.argsort(times, kind="stable")
+                columns = {name: numpy.asarray(columns[name])[order] for name in COLUMNS}
+                times = times[order]
+            months = times.astype("datetime64[us]").astype("datetime64[M]")
+            bounds = numpy.flatnonzero(months[1:] != months[:-1]) + 1
+
+            for lo, hi in zip(numpy.concatenate(([0], bounds)).tolist(),
+                              numpy.concatenate((bounds, [len(times)])).tolist()):
+                month = str(months[lo])
+                table = numpy.empty((len(COLUMNS), hi - lo), dtype=numpy.int64)
+                table[0] = times[lo:hi]
+                table[1:].view(numpy.float64)[:] = [numpy.asarray(columns[name][lo:hi], dtype=numpy.float64)
+                                                   for name in COLUMNS[1:]]
+                added += self._merge_file(symbol, month, entry, table)
+
+        if covered is not None:
+            start, end = _to_us(covered[0]), _to_us(covered[1])
+            if entry["covered"] is not None:
+                start, end = min(start, entry["covered"][0]), max(end, entry["covered"][1])
+            entry["covered"] = [start, end]
+        self._save_manifest()
+        return added
+
+    # Fetch whatever part of [start, end) is not cached yet for each symbol
+    # from the database and add it. Returns the number of new rows.
+    async def fill(self, pool, symbols, start, end) -> int:
+        start_us, end_us = _to_us(start), _to_us(end)
+        total = 0
+        for symbol in symbols:
+            covered = self.coverage(symbol)
+            if covered is None:
+                ranges = [(start_us, end_us)]
+            else:
+                ranges = []
+                if start_us < covered[0]:
+                    ranges.append((start_us, covered[0]))
+                if end_us > covered[1]:
+                    ranges.append((covered[1], end_us))
+                if not ranges:
+                    continue
+            for lo, hi in ranges:
+                columns = await self._fetch(pool, symbol, lo, hi)
+                total += self.write(symbol, columns, covered=(lo, hi))
+        print(f"Bar cache filled {total} new rows for {len(symbols)} symbols")
+        return total
+
+    async def _fetch(self, pool, symbol, start_us, end_us) -> dict:
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(f"""
+                SELECT time, open, high, low, close, volume FROM {self.table}
+                WHERE symbol = $1 AND time >= $2 AND time < $3
+                ORDER BY time
+            """, symbol, _from_us(start_us), _from_us(end_us))
+        columns = {"time": numpy.fromiter((_to_us(r["time"]) for r in rows), dtype=numpy.int64, count=len(rows))}
+        for i, name in enumerate(COLUMNS[1:], start=1):
+            columns[name] = numpy.fromiter((r[i] for r in rows), dtype=numpy.float64, count=len(rows))
+        return columns
+
+    # crypto pairs like BTC/USD can't be used as a directory name as-is
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol.replace("/", "_"))
+
+    def _path(self, symbol: str, month: str) -> str:
+        return os.path.join(self._symbol_dir(symbol), f"{month}.bin")
+
+    def _map(self, symbol: str, month: str, rows: int):
+        path = self._path(symbol, month)
+        cached = self._maps.get(path)
+        if cached is None:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            cached = (mm, numpy.frombuffer(mm, dtype=numpy.int64).reshape(len(COLUMNS), rows))
+            self._maps[path] = cached
+        return cached[1]
+
+    # Merge one month of new rows into its file (rewritten atomically).
+    def _merge_file(self, symbol: str, month: str, entry: dict, table) -> int:
+        info = entry["files"].get(month)
+        before = 0
+        if info is not None:
+            before = info["rows"]
+            table = numpy.concatenate((self._map(symbol, month, before), table), axis=1)
+        _, keep = numpy.unique(table[0], return_index=True)
+        if len(keep) != table.shape[1] or not numpy.all(table[0, 1:] > table[0, :-1]):
+            table = table[:, keep]
+
+        # views handed out earlier keep the old mapping alive until released
+        path = self._path(symbol, month)
+        self._maps.pop(path, None)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(numpy.ascontiguousarray(table).tobytes())
+        os.replace(tmp, path)
+
+        entry["files"][month] = {"rows": int(table.shape[1]), "first": int(table[0, 0]), "last": int(table[0, -1])}
+        return table.shape[1] - before
+
+    def _save_manifest(self):
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self._manifest_path)
+
+    # Drop the cached mappings (they are unmapped once no views remain)
+    def close(self):
+        self._maps.clear()
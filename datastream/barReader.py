@@ -0,0 +1,262 @@
+import asyncio
+import datetime
+
+import numpy
+
+from . import databaseQueries as dbq
+
+# Read side of stock_bars / crypto_bars and their continuous aggregates.
+#
+# Results never become Python row objects. Each query runs as
+# COPY (SELECT ...) TO STDOUT (FORMAT binary), with the symbol sent as its
+# int4 position in the requested list and NULL prices as
+# NaN, so every row has the same 82-byte layout. The stream is cut into
+# rows with one numpy.frombuffer per network chunk as it arrives, and COPY
+# hands rows over as the server produces them, so a reader can consume
+# millions of rows in bounded memory with stream_range().
+#
+# Results are dicts of columns, sorted by (time, symbol) unless noted:
+#   time       datetime64[us] (UTC); .view(numpy.int64) gives unix microseconds
+#   symbol_id  int32 index into the requested symbols
+#   symbol     the symbol names (object array built from symbol_id)
+#   open, high, low, close, volume  float64
+#
+# Range and latest-N queries use the (symbol, time DESC) indexes from
+# pytraderSchema.sql: one index range scan per symbol.
+
+# Tables per timeframe (continuous aggregates for everything above 1m)
+TIMEFRAME_SUFFIXES = {"1m": "", "5m": "_5m", "15m": "_15m", "1h": "_1h", "1d": "_1d"}
+TIMEFRAME_SECONDS = {"1m": 60, "5m": 5 * 60, "15m": 15 * 60, "1h": 60 * 60, "1d": 24 * 60 * 60}
+
+_FLOAT_COLUMNS = ("open", "high", "low", "close", "volume")
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+_PG_EPOCH_US = 946684800 * 1000000  # 2000-01-01 in unix microseconds
+
+# nfields, then (length, value) per field: time, symbol_id and the prices
+_ROW = numpy.dtype([("nfields", ">i2"), ("time_len", ">i4"), ("time", ">i8"),
+                    ("symbol_len", ">i4"), ("symbol_id", ">i4")]
+                   + [field for name in _FLOAT_COLUMNS for field in ((name + "_len", ">i4"), (name, ">f8"))])
+
+
+def _table(timeframe: str, crypto: bool) -> str:
+    if timeframe not in TIMEFRAME_SUFFIXES:
+        raise ValueError(f"Unknown timeframe {timeframe!r}, expected one of {list(TIMEFRAME_SUFFIXES)}")
+    return ("crypto_bars" if crypto else "stock_bars") + TIMEFRAME_SUFFIXES[timeframe]
+
+
+# Requested symbols with their 1-based position, joined to the bars to
+# turn the symbol into a fixed-width id (a hash join, not a per-row search)
+_SYMBOL_IDS = "unnest($1::text[]) WITH ORDINALITY AS s(symbol, id)"
+
+
+# Wrap a query returning time, id, open, high, low, close, volume in the
+# fixed-width binary COPY row layout.
+def _copy_query(query: str) -> str:
+    prices = ", ".join(f"coalesce({name}, 'NaN')::float8" for name in _FLOAT_COLUMNS)
+    return f"""
+        SELECT time, id::int4, {prices}
+        FROM ({query}) q
+    """
+
+
+# Splits a binary COPY stream into arrays of _ROW, at least `batch_rows`
+# rows at a time (except the last).
+class _CopyDecoder:
+    def __init__(self, batch_rows: int):
+        self.batch_rows = batch_rows
+        self._buffer = bytearray()
+        self._header_done = False
+        self._rows = []
+        self._count = 0
+
+    def feed(self, chunk: bytes) -> list:
+        buffer = self._buffer
+        buffer += chunk
+        start = 0
+        if not self._header_done:
+            # signature, flags, header extension length and extension
+            if len(buffer) < 19:
+                return []
+            if bytes(buffer[:11]) != _COPY_SIGNATURE:
+                raise ValueError("Unexpected COPY stream header")
+            start = 19 + int.from_bytes(buffer[15:19], "big")
+            if len(buffer) < start:
+                return []
+            self._header_done = True
+
+        n = (len(buffer) - start) // _ROW.itemsize
+        if n:
+            end = start + n * _ROW.itemsize
+            rows = numpy.frombuffer(bytes(buffer[start:end]), dtype=_ROW)
+            if (rows["nfields"] != 7).any() or (rows["symbol_len"] != 4).any():
+                raise ValueError("Unexpected row layout in COPY stream")
+            self._rows.append(rows)
+            self._count += len(rows)
+            start = end
+        del buffer[:start]
+
+        if self._count >= self.batch_rows:
+            return [self._take()]
+        return []
+
+    def finish(self) -> list:
+        if self._buffer != b"\xff\xff":
+            raise ValueError(f"COPY stream ended with {len(self._buffer)} unexpected bytes")
+        return [self._take()] if self._count else []
+
+    def _take(self):
+        rows = self._rows[0] if len(self._rows) == 1 else numpy.concatenate(self._rows)
+        self._rows = []
+        self._count = 0
+        return rows
+
+
+def _columns(rows, symbols) -> dict:
+    ids = rows["symbol_id"].astype(numpy.int32) - 1
+    columns = {
+        "time": (rows["time"].astype(numpy.int64) + _PG_EPOCH_US).view("datetime64[us]"),
+        "symbol_id": ids,
+        "symbol": symbols[ids],
+    }
+    for name in _FLOAT_COLUMNS:
+        columns[name] = rows[name].astype(numpy.float64)
+    return columns
+
+
+def _concat(batches, symbols) -> dict:
+    if not batches:
+        return _columns(numpy.empty(0, dtype=_ROW), symbols)
+    if len(batches) == 1:
+        return batches[0]
+    return {name: numpy.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+# Run `query` (see _copy_query; $1 = symbols, joined as _SYMBOL_IDS) and
+# yield column dicts of at least `batch_rows` rows as they arrive. Up to
+# `prefetch` batches are decoded ahead of the consumer before the socket is
+# left unread.
+async def _stream(query: str, symbols, *args, batch_rows: int = 100000, prefetch: int = 2, pool=None):
+    pool = pool or dbq.pool
+    symbols = list(symbols)
+    names = numpy.array(symbols, dtype=object)
+    decoder = _CopyDecoder(batch_rows)
+    batches = asyncio.Queue(maxsize=prefetch)
+
+    async def output(chunk):
+        for rows in decoder.feed(chunk):
+            await batches.put(rows)
+
+    async def copy():
+        try:
+            async with pool.acquire() as conn:
+                await conn.copy_from_query(_copy_query(query), symbols, *args, output=output, format="binary")
+            for rows in decoder.finish():
+                await batches.put(rows)
+            await batches.put(None)
+        except Exception as e:
+            await batches.put(e)
+
+    task = asyncio.create_task(copy())
+    try:
+        while True:
+            rows = await batches.get()
+            if rows is None:
+                break
+            if isinstance(rows, Exception):
+                raise rows
+            yield _columns(rows, names)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def _fetch(query: str, symbols, *args, pool=None) -> dict:
+    names = numpy.array(list(symbols), dtype=object)
+    batches = [batch async for batch in _stream(query, symbols, *args, pool=pool)]
+    return _concat(batches, names)
+
+
+def _range_query(table: str, order: str) -> str:
+    if order not in ("time", "symbol"):
+        raise ValueError(f"order must be 'time' or 'symbol', not {order!r}")
+    order_by = "b.time, b.symbol" if order == "time" else "b.symbol, b.time"
+    return f"""
+        SELECT b.time, s.id, b.open, b.high, b.low, b.close, b.volume
+        FROM {table} b JOIN {_SYMBOL_IDS} ON b.symbol = s.symbol
+        WHERE b.symbol = ANY($1::text[]) AND b.time >= $2 AND b.time < $3
+        ORDER BY {order_by}
+    """
+
+
+# Bars of `timeframe` for `symbols` in [start, end), as column batches of
+# about `batch_rows` rows. order="symbol" returns each symbol's bars
+# contiguously (time order within a symbol) instead of (time, symbol).
+async def stream_range(symbols, start, end, timeframe: str = "1m", crypto: bool = False,
+                       order: str = "time", batch_rows: int = 100000, pool=None):
+    query = _range_query(_table(timeframe, crypto), order)
+    async for batch in _stream(query, symbols, start, end, batch_rows=batch_rows, pool=pool):
+        yield batch
+
+
+# All of stream_range() in one set of columns
+async def fetch_range(symbols, start, end, timeframe: str = "1m", crypto: bool = False,
+                      order: str = "time", pool=None) -> dict:
+    return await _fetch(_range_query(_table(timeframe, crypto), order), symbols, start, end, pool=pool)
+
+
+# One symbol's bars in [start, end), oldest first
+async def fetch_symbol(symbol: str, start, end, timeframe: str = "1m", crypto: bool = False, pool=None) -> dict:
+    return await fetch_range([symbol], start, end, timeframe, crypto, pool=pool)
+
+
+# The last `n` bars of each symbol, oldest first in (time, symbol) order so
+# they can be replayed as they originally arrived. One index scan of at most
+# n rows per symbol.
+async def fetch_latest(symbols, n: int, timeframe: str = "1m", crypto: bool = False, pool=None) -> dict:
+    query = f"""
+        SELECT b.time, s.id, b.open, b.high, b.low, b.close, b.volume
+        FROM {_SYMBOL_IDS}
+        CROSS JOIN LATERAL (
+            SELECT time, open, high, low, close, volume FROM {_table(timeframe, crypto)}
+            WHERE symbol = s.symbol
+            ORDER BY time DESC
+            LIMIT $2
+        ) b
+        ORDER BY b.time, s.symbol
+    """
+    return await _fetch(query, symbols, n, pool=pool)
+
+
+# "30m", "2h", "1d" or a timedelta -> seconds
+def bucket_seconds(bucket) -> int:
+    if isinstance(bucket, datetime.timedelta):
+        seconds = int(bucket.total_seconds())
+    else:
+        units = {"m": 60, "h": 3600, "d": 86400}
+        try:
+            seconds = int(bucket[:-1]) * units[bucket[-1]]
+        except (KeyError, ValueError, IndexError):
+            raise ValueError(f"Bucket {bucket!r} should look like '30m', '4h' or '1d'")
+    if seconds < 60 or seconds % 60:
+        raise ValueError(f"Bucket must be a whole number of minutes, not {bucket!r}")
+    return seconds
+
+
+# Bars of `symbols` in [start, end) aggregated server-side into buckets of
+# any width with time_bucket. The aggregation reads the coarsest stored
+# timeframe that divides the bucket (e.g. 2h buckets from the 1h aggregate,
+# 30m from 15m), so wide buckets over long ranges scan few rows.
+async def fetch_downsampled(symbols, start, end, bucket, crypto: bool = False, pool=None) -> dict:
+    seconds = bucket_seconds(bucket)
+    source = max((tf for tf, width in TIMEFRAME_SECONDS.items() if seconds % width == 0),
+                 key=TIMEFRAME_SECONDS.get)
+    query = f"""
+        SELECT time_bucket($4::interval, b.time) AS time, s.id,
+               first(b.open, b.time) AS open, max(b.high) AS high, min(b.low) AS low,
+               last(b.close, b.time) AS close, sum(b.volume) AS volume
+        FROM {_table(source, crypto)} b JOIN {_SYMBOL_IDS} ON b.symbol = s.symbol
+        WHERE b.symbol = ANY($1::text[]) AND b.time >= $2 AND b.time < $3
+        GROUP BY 1, s.id, b.symbol
+        ORDER BY 1, b.symbol
+    """
+    return await _fetch(query, symbols, start, end, datetime.timedelta(seconds=seconds), pool=pool)
@@ -0,0 +1,122 @@
+import datetime
+import logging
+
+# Builds higher-timeframe bars incrementally from the live minute stream.
+#
+# Buckets are aligned to the unix epoch the same way TimescaleDB's
+# time_bucket() aligns them, so a bar built here matches the matching row of
+# the stock_bars_5m / _15m / _1h / _1d continuous aggregates. A bar is
+# emitted as soon as the minute that closes its bucket arrives, or, if that
+# minute never comes (no trades), when the first bar of a later bucket does.
+#
+# Handlers are async callables receiving a ResampledBar, which has the same
+# attributes as an alpaca Bar so existing bar handlers can take either.
+
+# timeframe -> bucket width in seconds
+TIMEFRAMES = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+
+class ResampledBar:
+    __slots__ = ("symbol", "timeframe", "timestamp", "open", "high", "low", "close", "volume",
+                 "trade_count", "_bucket")
+
+    def __init__(self, symbol, timeframe, bucket, bar):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timestamp = datetime.datetime.fromtimestamp(bucket, tz=datetime.timezone.utc)
+        self.open = bar.open
+        self.high = bar.high
+        self.low = bar.low
+        self.close = bar.close
+        self.volume = bar.volume
+        self.trade_count = getattr(bar, "trade_count", None)
+        self._bucket = bucket
+
+    def merge(self, bar):
+        if bar.high > self.high:
+            self.high = bar.high
+        if bar.low < self.low:
+            self.low = bar.low
+        self.close = bar.close
+        self.volume += bar.volume
+        trades = getattr(bar, "trade_count", None)
+        if trades is not None and self.trade_count is not None:
+            self.trade_count += trades
+
+    def __repr__(self):
+        return (f"ResampledBar({self.symbol} {self.timeframe} {self.timestamp.isoformat()} "
+                f"o={self.open} h={self.high} l={self.low} c={self.close} v={self.volume})")
+
+
+class BarResampler:
+    # base_seconds: width of the incoming bars
+    def __init__(self, base_seconds: int = 60):
+        self.base_seconds = base_seconds
+        self._handlers = {}  # timeframe -> [handler]
+        self._building = {}  # timeframe -> {symbol: ResampledBar}
+
+    # Call `handler(bar)` with every completed bar of `timeframe`. "1m"
+    # handlers receive the incoming minute bars unchanged.
+    def subscribe(self, timeframe: str, handler):
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe {timeframe!r}, expected one of {list(TIMEFRAMES)}")
+        self._handlers.setdefault(timeframe, []).append(handler)
+        if TIMEFRAMES[timeframe] > self.base_seconds:
+            self._building.setdefault(timeframe, {})
+
+    def timeframes(self) -> list:
+        return list(self._handlers)
+
+    # Feed one incoming (minute) bar, in time order per symbol.
+    async def on_bar(self, bar):
+        for handler in self._handlers.get("1m", ()):
+            await handler(bar)
+        if not self._building:
+            return
+
+        ts = int(bar.timestamp.timestamp())
+        symbol = bar.symbol
+        for timeframe, building in self._building.items():
+            width = TIMEFRAMES[timeframe]
+            bucket = ts - ts % width
+
+            current = building.get(symbol)
+            if current is not None and current._bucket != bucket:
+                if bucket < current._bucket:
+                    logging.warning(f"[{symbol}] out of order bar {bar.timestamp} for {timeframe}, skipped")
+                    continue
+                del building[symbol]
+                await self._emit(timeframe, current)
+                current = None
+
+            if current is None:
+                current = ResampledBar(symbol, timeframe, bucket, bar)
+                building[symbol] = current
+            else:
+                current.merge(bar)
+
+            # the last minute of the bucket closes it
+            if ts + self.base_seconds >= bucket + width:
+                del building[symbol]
+                await self._emit(timeframe, current)
+
+    # Emit every partially built bar, e.g. at the end of a replay.
+    async def flush(self):
+        for timeframe, building in self._building.items():
+            bars = list(building.values())
+            building.clear()
+            for bar in bars:
+                await self._emit(timeframe, bar)
+
+    async def _emit(self, timeframe: str, bar: ResampledBar):
+        for handler in self._handlers[timeframe]:
+            try:
+                await handler(bar)
+            except Exception as e:
+                logging.error(f"{timeframe} bar handler failed for {bar.symbol}: {e}")
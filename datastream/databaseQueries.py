@@ -1,4 +1,12 @@
+import asyncio
+import datetime
+import io
+import logging
+import struct
+import time
+
 import asyncpg
+import numpy
 import psycopg2
 import pandas
 
@@ -25,34 +33,81 @@ async def close_db_pool():
         await pool.close()
         pool = None
         
-# insert an entire dataframe
-async def insert_df_to_db(df:pandas.DataFrame, crypto:bool):
-    query = None
-    if crypto:
-        query = """
-            INSERT INTO crypto_bars (time, symbol, open, high, low, close, volume)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
-            ON CONFLICT (time, symbol) DO NOTHING
-        """
-    else:        
-        query = """
-            INSERT INTO stock_bars (time, symbol, open, high, low, close, volume)
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
+# Binary COPY framing: header, per-row field count and per-field byte lengths
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_PG_EPOCH_US = 946684800 * 1000000  # 2000-01-01 in unix microseconds
+_FLOAT_COLUMNS = ("open", "high", "low", "close", "volume")
+BAR_COLUMNS = ("time", "symbol") + _FLOAT_COLUMNS
+
+# Encode bar columns as a PostgreSQL binary COPY stream without a per-row loop.
+# times_us: int64 unix microseconds, symbols: str array, the rest float arrays.
+# Rows are grouped by symbol length so every group has a fixed-width layout.
+def bars_to_copy_binary(times_us, symbols, opens, highs, lows, closes, volumes) -> bytes:
+    symbols = numpy.asarray(symbols).astype("S")
+    lengths = numpy.char.str_len(symbols)
+    floats = (opens, highs, lows, closes, volumes)
+
+    chunks = [_COPY_HEADER]
+    for length in numpy.unique(lengths):
+        rows = lengths == length
+        dtype = [("nfields", ">i2"), ("time_len", ">i4"), ("time", ">i8"),
+                 ("symbol_len", ">i4"), ("symbol", f"S{length}")]
+        for name in _FLOAT_COLUMNS:
+            dtype += [(name + "_len", ">i4"), (name, ">f8")]
+
+        block = numpy.empty(int(rows.sum()), dtype=dtype)
+        block["nfields"] = len(BAR_COLUMNS)
+        block["time_len"] = 8
+        block["time"] = numpy.asarray(times_us, dtype=numpy.int64)[rows] - _PG_EPOCH_US
+        block["symbol_len"] = length
+        block["symbol"] = symbols[rows]
+        for name, values in zip(_FLOAT_COLUMNS, floats):
+            block[name + "_len"] = 8
+            block[name] = numpy.asarray(values, dtype=numpy.float64)[rows]
+        chunks.append(block.tobytes())
+    chunks.append(_COPY_TRAILER)
+    return b"".join(chunks)
+
+# COPY pre-encoded rows into a temporary staging table, then merge them into
+# `table`, skipping rows that already exist. Returns the number of new rows.
+async def copy_bars(conn, table: str, data: bytes) -> int:
+    staging = f"staging_{table}"
+    async with conn.transaction():
+        await conn.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        await conn.copy_to_table(staging, source=io.BytesIO(data), columns=BAR_COLUMNS, format="binary")
+        result = await conn.execute(f"""
+            INSERT INTO {table} (time, symbol, open, high, low, close, volume)
+            SELECT time, symbol, open, high, low, close, volume FROM {staging}
             ON CONFLICT (time, symbol) DO NOTHING
-        """
+        """)
+    return int(result.split()[-1])
 
-    for index, row in df.iterrows():
-        symbol = row['symbol']
-        ts = row['timestamp']
-        o = row['open']
-        h = row['high']
-        l = row['low']
-        c = row['close']
-        v = row['volume']
+# insert an entire dataframe
+# Columns are converted straight into a binary COPY stream and merged through
+# a staging table. Returns the number of new rows.
+async def insert_df_to_db(df:pandas.DataFrame, crypto:bool) -> int:
+    table = "crypto_bars" if crypto else "stock_bars"
+    if df.empty:
+        return 0
+
+    start = time.perf_counter()
+    timestamps = pandas.to_datetime(df["timestamp"], utc=True).dt.tz_localize(None)
+    data = bars_to_copy_binary(
+        timestamps.to_numpy(dtype="datetime64[us]").astype(numpy.int64),
+        df["symbol"].to_numpy(dtype=str),
+        df["open"].to_numpy(), df["high"].to_numpy(), df["low"].to_numpy(),
+        df["close"].to_numpy(), df["volume"].to_numpy(),
+    )
 
     async with pool.acquire() as conn:
-        await conn.execute(query, ts, symbol, o, h, l, c, v)
-    
+        inserted = await copy_bars(conn, table, data)
+
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {len(df)} rows into {table} ({inserted} new) in {elapsed:.2f}s, "
+          f"{len(df) / max(elapsed, 1e-9):,.0f} rows/s")
+    return inserted
+
 # Insert a single bar asynchronously
 async def insert_bar_asyncpg(bar, crypto:bool):
     # parse bar
@@ -82,74 +137,189 @@ async def insert_bar_asyncpg(bar, crypto:bool):
         await conn.execute(query, ts, symbol, o, h, l, c, v)
         
    
-batch_size = 100 # amount to store until INSERT
-stock_bar_buffer = []
-crypto_bar_buffer = []
+# Write-behind buffer for live bars going to one table.
+#
+# Bars are appended to an in-memory batch that a background task writes out
+# with COPY when it reaches `max_bars`, when its oldest bar is `max_delay_ms`
+# old, or on close(), whichever comes first. The batch being written is
+# swapped out first, so new bars keep arriving while a write is in flight.
+# If the database falls behind and `max_buffered` bars pile up, add() waits
+# for room instead of growing without bound.
+#
+# A failed write puts the batch back in front of the buffer, and while it
+# is retried it keeps counting towards `max_buffered`. Retries start after
+# `retry_delay_ms` and the delay doubles each time. The merge ignores bars
+# already stored, so a retry never writes a bar twice. Only after
+# `max_retries` failed retries in a row is the batch dropped, and logged as
+# such.
+class BarWriteBuffer:
+    def __init__(self, crypto: bool, max_bars: int = 100, max_delay_ms: float = 1000,
+                 max_buffered: int = 10000, max_retries: int = 5, retry_delay_ms: float = 500):
+        self.crypto = crypto
+        self.max_bars = max_bars
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_buffered = max_buffered
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay_ms / 1000.0
+        self._active = []
+        self._first_at = 0.0
+        self._task = None
+        self._has_data = None
+        self._full = None
+        self._space = None
+        self._closing = False
+        self._retrying = 0  # bars of a batch being retried
 
-# Add a stock bar to the stock buffer
-# Insert all bars in the buffer if the max size is reached
-async def on_stock_bar(bar):
-    print("Adding stock bar.: ", bar)
-    global stock_bar_buffer
-    stock_bar_buffer.append(bar)
+    def __len__(self):
+        return len(self._active)
+
+    def _start(self):
+        self._has_data = asyncio.Event()
+        self._full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._closing = False
+        self._task = asyncio.create_task(self._flusher())
+
+    async def add(self, bar):
+        if self._task is None:
+            self._start()
+
+        # backpressure: wait for the flusher to take the current batch
+        while len(self._active) + self._retrying >= self.max_buffered:
+            self._space.clear()
+            await self._space.wait()
+
+        if not self._active:
+            self._first_at = asyncio.get_running_loop().time()
+            self._has_data.set()
+        self._active.append(bar)
+        if len(self._active) >= self.max_bars:
+            self._full.set()
 
-    if len(stock_bar_buffer) >= batch_size:
-        await flush_bars(stock_bar_buffer, crypto=False)
-        bar_buffer = []
+    # Write out everything buffered and stop the background task.
+    async def close(self):
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_data.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def _flusher(self):
+        loop = asyncio.get_running_loop()
+        table = "crypto_bars" if self.crypto else "stock_bars"
+        failures = 0
+        while True:
+            if not self._active:
+                if self._closing:
+                    return
+                self._has_data.clear()
+                await self._has_data.wait()
+                continue
+
+            deadline = self._first_at + self.max_delay
+            while len(self._active) < self.max_bars and not self._closing:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            bars, self._active = self._active, []
+            self._retrying = len(bars) if failures else 0
+            self._space.set()
+            try:
+                await flush_bars(bars, self.crypto)
+                failures = 0
+            except Exception:
+                if failures >= self.max_retries:
+                    logging.exception(f"Dropped {len(bars)} bars for {table} after {failures + 1} failed writes")
+                    failures = 0
+                    continue
+                delay = self.retry_delay * 2 ** failures
+                failures += 1
+                logging.exception(f"Failed to write {len(bars)} bars to {table}, retry {failures} "
+                                  f"of {self.max_retries} in {delay:.1f}s")
+                self._active = bars + self._active
+                await asyncio.sleep(delay)
+            finally:
+                if self._retrying:
+                    self._retrying = 0
+                    self._space.set()
+
+stock_bar_buffer = BarWriteBuffer(crypto=False)
+crypto_bar_buffer = BarWriteBuffer(crypto=True)
+
+# Add a stock bar to the stock write-behind buffer
+async def on_stock_bar(bar):
+    await stock_bar_buffer.add(bar)
     
-# Add a crypto bar to the crypto buffer
-# Insert all bars in the buffer if the max size is reached
+# Add a crypto bar to the crypto write-behind buffer
 async def on_crypto_bar(bar):
-    print("Adding crypto bar.: ", bar)
-    global crypto_bar_buffer
-    crypto_bar_buffer.append(bar)
-
-    if len(crypto_bar_buffer) >= batch_size:
-        await flush_bars(crypto_bar_buffer, crypto=True)
-        bar_buffer = []
+    await crypto_bar_buffer.add(bar)
 
-# Insert all bars from the buffer into their appropriate table
+# Insert a list of live bars into their appropriate table with COPY
 async def flush_bars(bars, crypto:bool):
-    query = ""
-    if crypto:        
-        query = """
-            INSERT INTO crypto_bars (time, symbol, open, high, low, close, volume)
-            VALUES 
-        """
-    else:
-        query = """
-            INSERT INTO stock_bars (time, symbol, open, high, low, close, volume)
-            VALUES 
-        """
-        
-    placeholders = []
-    values = []
-    for i, bar in enumerate(bars):
-        placeholders.append(f"(${7 * i + 1}, ${7 * i + 2}, ${7 * i + 3}, ${7 * i + 4}, ${7 * i + 5}, ${7 * i + 6}, ${7 * i + 7})")
-        values.extend([
-            bar.timestamp,
-            bar.symbol,
-            bar.open,
-            bar.high,
-            bar.low,
-            bar.close,
-            int(bar.volume)
-        ])
-
-    query += ",".join(placeholders)
-    query += " ON CONFLICT (time, symbol) DO NOTHING"
-
+    if not bars:
+        return 0
+    table = "crypto_bars" if crypto else "stock_bars"
+    data = bars_to_copy_binary(
+        [_unix_us(bar.timestamp) for bar in bars],
+        [bar.symbol for bar in bars],
+        [bar.open for bar in bars],
+        [bar.high for bar in bars],
+        [bar.low for bar in bars],
+        [bar.close for bar in bars],
+        [bar.volume for bar in bars],
+    )
     async with pool.acquire() as conn:
-        await conn.execute(query, *values)
+        return await copy_bars(conn, table, data)
 
+# Write out whatever is still buffered; call before closing the pool
 async def flush_buffers():
-    global stock_bar_buffer
-    global crypto_bar_buffer
-    
-    if len(stock_bar_buffer) > 0:
-        await flush_bars(stock_bar_buffer, crypto=False)
-        stock_bar_buffer = []
-        
-    if len(crypto_bar_buffer) > 0:
-        await flush_bars(crypto_bar_buffer, crypto=True)
-        crypto_bar_buffer = []
+    await stock_bar_buffer.close()
+    await crypto_bar_buffer.close()
+
+_UNIX_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+def _unix_us(ts) -> int:
+    return (ts - _UNIX_EPOCH) // datetime.timedelta(microseconds=1)
+
+# Backfill checkpoints: one row per (table, symbol, window) chunk that has
+# been fully written, so an interrupted backfill can skip finished work.
+async def ensure_backfill_checkpoints():
+    async with pool.acquire() as conn:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                table_name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                chunk_start TIMESTAMPTZ NOT NULL,
+                chunk_end TIMESTAMPTZ NOT NULL,
+                row_count INTEGER NOT NULL,
+                completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, symbol, chunk_start, chunk_end)
+            )
+        """)
+
+# Set of (symbol, chunk_start, chunk_end) already completed for `table`
+async def load_completed_chunks(table: str) -> set:
+    async with pool.acquire() as conn:
+        rows = await conn.fetch("""
+            SELECT symbol, chunk_start, chunk_end FROM backfill_checkpoints
+            WHERE table_name = $1
+        """, table)
+    return {(row["symbol"], row["chunk_start"], row["chunk_end"]) for row in rows}
+
+async def record_completed_chunk(table: str, symbol: str, chunk_start, chunk_end, row_count: int):
+    async with pool.acquire() as conn:
+        await conn.execute("""
+            INSERT INTO backfill_checkpoints (table_name, symbol, chunk_start, chunk_end, row_count)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (table_name, symbol, chunk_start, chunk_end)
+            DO UPDATE SET row_count = EXCLUDED.row_count, completed_at = now()
+        """, table, symbol, chunk_start, chunk_end, row_count)
@@ -0,0 +1,81 @@
+import random
+import time
+
+import numpy as np
+import pandas
+
+# Offline stand-in for alpaca's StockHistoricalDataClient and
+# CryptoHistoricalDataClient. Requests return deterministic random-walk
+# minute bars for every symbol and minute in [start, end), after an injected
+# latency, in the same (symbol, timestamp)-indexed DataFrame shape as
+# alpaca's BarSet.df.
+class FakeDataClient:
+    # latency: seconds per request, failure_rate: probability a request raises
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.requests = []
+        self._rng = random.Random(seed)
+
+    def get_stock_bars(self, request):
+        return self._bars(request)
+
+    def get_crypto_bars(self, request):
+        return self._bars(request)
+
+    def _bars(self, request):
+        self.requests.append(request)
+        time.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            raise RuntimeError("simulated data API error")
+
+        symbols = request.symbol_or_symbols
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        index = pandas.date_range(request.start, request.end, freq="min", inclusive="left")
+        frames = []
+        for symbol in symbols:
+            frames.append(_random_walk(symbol, index, self.seed))
+        df = pandas.concat(frames) if frames else pandas.DataFrame()
+        return _BarSet(df)
+
+
+class _BarSet:
+    def __init__(self, df):
+        self.df = df
+
+
+# Per-symbol price level of the walk
+def base_price(symbol: str, seed: int = 0) -> float:
+    rng = np.random.default_rng([seed, sum(symbol.encode())])
+    return 100.0 + (rng.random() * 100.0)
+
+
+# Close, spread and volume of the walk at `minutes` since the epoch, for an
+# int or an array of them. `base` is base_price() of one symbol or an array
+# of them. Shared with fakeStream.FakeStockStream so both produce the same
+# bars.
+def walk(base, minutes):
+    close = base + (np.sin(minutes / 390.0) * 5.0 + (minutes % 97) * 0.01)
+    spread = 0.05 + (minutes % 13) * 0.01
+    volume = minutes % 1000 + 100.0
+    return close, spread, volume
+
+
+def _random_walk(symbol, index, seed):
+    # minutes since the epoch seed the walk, so overlapping requests agree.
+    # date_range may pick microseconds or nanoseconds, so fix the unit first.
+    minutes = index.as_unit("ns").asi8 // 60_000_000_000
+    close, spread, volume = walk(base_price(symbol, seed), minutes)
+    df = pandas.DataFrame({
+        "open": close - spread / 2,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": volume,
+        "trade_count": (minutes % 50 + 1).astype(float),
+        "vwap": close,
+    }, index=pandas.MultiIndex.from_arrays([[symbol] * len(index), index], names=["symbol", "timestamp"]))
+    return df
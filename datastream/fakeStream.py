@@ -0,0 +1,58 @@
+import asyncio
+import datetime
+import logging
+
+import numpy as np
+
+from .fakeDataClient import base_price, walk
+from strategies.barHistory import Bar
+
+# Offline stand-in for alpaca's StockDataStream. Once running it produces a
+# minute bar for every subscribed symbol each `interval` seconds, following
+# the same deterministic walk as FakeDataClient, so a symbol's bars are the
+# same whichever process or partition it is streamed in and line up with
+# fake historical data ingested for warm-up.
+#
+# It has the subscribe_bars/_run_forever/stop_ws surface Runtime uses, so it
+# can replace the real stream in main-style setups and in the supervisor.
+class FakeStockStream:
+    # minutes: bars per symbol before the stream ends (None = until stopped)
+    # interval: seconds between minutes (0 = as fast as the handlers allow)
+    # start: timestamp of the first bar
+    def __init__(self, minutes: int = None, interval: float = 60.0, start: datetime.datetime = None,
+                 seed: int = 0):
+        self.minutes = minutes
+        self.interval = interval
+        self.start = start or datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+        self.seed = seed
+        self.handler = None
+        self.symbols = []
+        self._stopped = False
+
+    def subscribe_bars(self, handler, *symbols):
+        self.handler = handler
+        self.symbols.extend(symbols)
+
+    async def stop_ws(self):
+        self._stopped = True
+
+    async def _run_forever(self):
+        symbols = self.symbols
+        base = np.array([base_price(symbol, self.seed) for symbol in symbols])
+        epoch_minute = int(self.start.timestamp()) // 60
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        m = 0
+        while not self._stopped and (self.minutes is None or m < self.minutes):
+            ts = self.start + datetime.timedelta(minutes=m)
+            close, spread, volume = walk(base, epoch_minute + m)
+            close = close.tolist()
+            for i, symbol in enumerate(symbols):
+                c = close[i]
+                await self.handler(Bar(symbol, ts, c - spread / 2, c + spread, c - spread, c, volume))
+
+            m += 1
+            due += self.interval
+            # always yield, as the websocket reads of a real stream would
+            await asyncio.sleep(max(0.0, due - loop.time()))
+        logging.info(f"Fake stream finished after {m} minutes of {len(symbols)} symbols")
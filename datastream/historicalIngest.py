@@ -1,6 +1,7 @@
 import asyncio
 import sys
 import os
+import time
 import datetime as dt
 
 # Add project root to sys.path, if needed
@@ -11,9 +12,6 @@ from alpaca.data.requests import CryptoBarsRequest, StockBarsRequest, TimeFrame
 from config import API_KEY, SECRET_KEY, STOCK_SYMBOLS_FILE, CRYPTO_SYMBOLS_FILE
 import databaseQueries as dbq
 
-mins_in_day = 60 * 24
-mins_in_week = mins_in_day * 14
-
 crypto_symbols = None
 stock_symbols = None
 
@@ -23,43 +21,107 @@ with open(CRYPTO_SYMBOLS_FILE) as f:
 with open(STOCK_SYMBOLS_FILE) as f:
     stock_symbols = [line.strip() for line in f]
 
-# Ingest historical STOCK data for the date range [start_date, end_date].
-async def ingest_stocks(start_date, end_date):
-    stock_client = StockHistoricalDataClient(API_KEY, SECRET_KEY)
-
-    request_params = StockBarsRequest(
-        symbol_or_symbols=stock_symbols,
+chunk_window = dt.timedelta(days=7)  # time span fetched per request
+max_concurrent_requests = 4
+requests_per_minute = 180            # stay under Alpaca's 200/min limit
+max_attempts = 3
+
+# Spaces requests evenly to stay under a requests-per-minute limit
+class RateLimiter:
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self.interval
+
+# Split [start_date, end_date) into (symbol, chunk_start, chunk_end) chunks.
+# Chunk boundaries sit on a fixed grid of `window` since the epoch, so the
+# same chunks come out of every run and checkpoints from earlier runs match.
+def plan_chunks(symbols, start_date, end_date, window=chunk_window):
+    epoch = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+    first = epoch + ((start_date - epoch) // window) * window
+
+    chunks = []
+    for symbol in symbols:
+        chunk_start = first
+        while chunk_start < end_date:
+            chunk_end = min(chunk_start + window, end_date)
+            chunks.append((symbol, chunk_start, chunk_end))
+            chunk_start = chunk_end
+    return chunks
+
+# Fetch one chunk with the blocking Alpaca client
+def fetch_chunk(client, crypto: bool, symbol, chunk_start, chunk_end):
+    request_cls = CryptoBarsRequest if crypto else StockBarsRequest
+    request_params = request_cls(
+        symbol_or_symbols=symbol,
         timeframe=TimeFrame.Minute,
-        start=start_date,
-        end=end_date,
-        limit=10000
+        start=chunk_start,
+        end=chunk_end,
     )
+    if crypto:
+        bars = client.get_crypto_bars(request_params)
+    else:
+        bars = client.get_stock_bars(request_params)
+    return bars.df.reset_index()
+
+# Backfill minute bars for `symbols` over [start_date, end_date).
+# Chunks are fetched concurrently under a rate limit and written as they
+# arrive; finished chunks are checkpointed so a rerun only does what is left.
+async def backfill(client, symbols, start_date, end_date, crypto: bool,
+                   window=chunk_window, concurrency=max_concurrent_requests,
+                   per_minute=requests_per_minute):
+    table = "crypto_bars" if crypto else "stock_bars"
+    await dbq.ensure_backfill_checkpoints()
+    completed = await dbq.load_completed_chunks(table)
+
+    chunks = [c for c in plan_chunks(symbols, start_date, end_date, window) if c not in completed]
+    print(f"Backfilling {table}: {len(chunks)} chunks to fetch, {len(completed)} already done.")
+
+    limiter = RateLimiter(per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"rows": 0, "failed": 0}
+
+    async def run_chunk(symbol, chunk_start, chunk_end):
+        async with semaphore:
+            for attempt in range(1, max_attempts + 1):
+                await limiter.acquire()
+                try:
+                    df = await asyncio.to_thread(fetch_chunk, client, crypto, symbol, chunk_start, chunk_end)
+                    await dbq.insert_df_to_db(df, crypto)
+                    await dbq.record_completed_chunk(table, symbol, chunk_start, chunk_end, len(df))
+                    totals["rows"] += len(df)
+                    return
+                except Exception as e:
+                    print(f"Chunk {symbol} {chunk_start} - {chunk_end} failed (attempt {attempt}): {e}")
+                    if attempt < max_attempts:
+                        await asyncio.sleep(2 ** attempt)
+            totals["failed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_chunk(*chunk) for chunk in chunks))
+    elapsed = time.perf_counter() - start
+    print(f"Finished {table} backfill: {totals['rows']} rows in {elapsed:.1f}s, "
+          f"{totals['failed']} chunks failed and will be retried on the next run.")
+    return totals
 
-    bars = stock_client.get_stock_bars(request_params)
-
-    df = bars.df.reset_index()
-    await dbq.insert_df_to_db(df, False)
-    print(f"Finished ingesting stock data for {len(stock_symbols)} symbols from {start_date} to {end_date}.")
-    print(f"Number of symbols ingeste is {df.shape[0]}.")
+# Ingest historical STOCK data for the date range [start_date, end_date].
+async def ingest_stocks(start_date, end_date):
+    stock_client = StockHistoricalDataClient(API_KEY, SECRET_KEY)
+    await backfill(stock_client, stock_symbols, start_date, end_date, crypto=False)
 
 # Ingest historical CRYPTO data for the date range [start_date, end_date].
 async def ingest_crypto(start_date, end_date):
     crypto_client = CryptoHistoricalDataClient(API_KEY, SECRET_KEY)
-
-    request_params = CryptoBarsRequest(
-        symbol_or_symbols=crypto_symbols,
-        timeframe=TimeFrame.Minute,
-        start=start_date,
-        end=end_date,
-        limit=10000
-    )
-
-    bars = crypto_client.get_crypto_bars(request_params)
-
-    df = bars.df.reset_index()
-    await dbq.insert_df_to_db(df, True)
-    print(f"Finished ingesting crypto data for {len(crypto_symbols)} symbols from {start_date} to {end_date}.")
-    print(f"Number of symbols ingester is {df.shape[0]}.")
+    await backfill(crypto_client, crypto_symbols, start_date, end_date, crypto=True)
 
 async def main():
     await dbq.init_db_pool()
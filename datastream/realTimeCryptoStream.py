@@ -1,13 +1,13 @@
 import asyncio
 import os
 import sys
-import threading
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from alpaca.data.live import CryptoDataStream
 from .databaseQueries import on_crypto_bar, init_db_pool, close_db_pool, flush_buffers
+from runtime import Runtime
 from config import API_KEY, SECRET_KEY, CRYPTO_SYMBOLS_FILE
 
 crypto_symbols = None
@@ -17,29 +17,15 @@ with open(CRYPTO_SYMBOLS_FILE) as f:
 crypto_stream = CryptoDataStream(API_KEY, SECRET_KEY)
 crypto_stream.subscribe_bars(on_crypto_bar, *crypto_symbols)
 
-# run on a separate thread
-def run_crypto_stream():
-    crypto_stream.run()
-
 # coroutine
+# The stream runs as a task on the caller's loop alongside the DB pool
 async def start():
-    await init_db_pool()
-
-    stock_thread = threading.Thread(target=run_crypto_stream, daemon=True)
-    stock_thread.start()
-    
-    # Keep main thread alive until user interrupts (Ctrl + C)
-    try:
-        while True:
-            await asyncio.sleep(1)
-    except (KeyboardInterrupt, asyncio.CancelledError):
-         print("KeyboardInterrupt received. Shutting down...")
-    finally:
-        crypto_stream.stop()
-        stock_thread.join()
-        await flush_buffers()
-        await close_db_pool()
-        print("Stream stopped, thread joined, DB closed.")
+    runtime = Runtime()
+    runtime.add_stream(crypto_stream)
+    runtime.on_startup(init_db_pool)
+    runtime.on_shutdown(close_db_pool)
+    runtime.on_shutdown(flush_buffers)
+    await runtime.run()
 
 #if __name__ == "__main__":
 #    asyncio.run(start())
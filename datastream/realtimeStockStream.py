@@ -1,13 +1,13 @@
 import asyncio
 import os
 import sys
-import threading
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from alpaca.data.live import StockDataStream
 from .databaseQueries import on_stock_bar, init_db_pool, close_db_pool, flush_buffers
+from runtime import Runtime
 from config import API_KEY, SECRET_KEY, STOCK_SYMBOLS_FILE
 
 stock_symbols = None
@@ -17,29 +17,15 @@ with open(STOCK_SYMBOLS_FILE) as f:
 stock_stream = StockDataStream(API_KEY, SECRET_KEY)
 stock_stream.subscribe_bars(on_stock_bar, *stock_symbols)
 
-# run on a separate thread
-def run_stock_stream():
-    stock_stream.run()
-
 # coroutine
+# The stream runs as a task on the caller's loop alongside the DB pool
 async def start():
-    await init_db_pool()
-
-    stock_thread = threading.Thread(target=run_stock_stream, daemon=True)
-    stock_thread.start()
-    
-    # Keep main thread alive until user interrupts (Ctrl + C)
-    try:
-        while True:
-            await asyncio.sleep(1)
-    except (KeyboardInterrupt, asyncio.CancelledError):
-         print("KeyboardInterrupt received. Shutting down...")
-    finally:
-        stock_stream.stop()
-        stock_thread.join()
-        await flush_buffers()
-        await close_db_pool()
-        print("Stream stopped, thread joined, DB closed.")
+    runtime = Runtime()
+    runtime.add_stream(stock_stream)
+    runtime.on_startup(init_db_pool)
+    runtime.on_shutdown(close_db_pool)
+    runtime.on_shutdown(flush_buffers)
+    await runtime.run()
 
 #if __name__ == "__main__":
 #    asyncio.run(start())
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datastream.databaseQueries as dbq
+
+# Creates the schema and keeps the TimescaleDB storage settings of the bar
+# tables in line with STORAGE_POLICIES:
+#
+#   chunk_interval  time range per chunk (applies to chunks created from now on)
+#   compress_after  chunks older than this are compressed, segmented by
+#                   symbol and ordered by time DESC, so a symbol's range is
+#                   one segment read and everything else is skipped
+#   retention       chunks older than this are dropped (None = keep forever);
+#                   continuous aggregates keep their already materialized
+#                   buckets, so the 5m..1d views outlive the raw minutes
+#   reorder_index   uncompressed closed chunks are rewritten in this
+#                   index's order, so they are read sequentially until they
+#                   are compressed
+#
+# apply_storage_policies() is idempotent: existing policies are replaced
+# with the configured ones, so changing a value here and re-running it is
+# the migration. Rows inserted into already compressed chunks (late bars,
+# backfills older than compress_after) need TimescaleDB 2.11 or later.
+#
+#   python datastream/schemaManager.py --schema --policies --report
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pytraderSchema.sql")
+
+STORAGE_POLICIES = {
+    # ~500 symbols x 390 bars a day: about 1.4M rows per weekly chunk
+    "stock_bars": {
+        "chunk_interval": "7 days",
+        "compress_after": "7 days",
+        "retention": "730 days",
+        "reorder_index": "idx_stock_bars_symbol_time",
+    },
+    # crypto trades around the clock, so chunks cover less time
+    "crypto_bars": {
+        "chunk_interval": "1 day",
+        "compress_after": "3 days",
+        "retention": "365 days",
+        "reorder_index": "idx_crypto_bars_symbol_time",
+    },
+}
+
+COMPRESS_SEGMENTBY = "symbol"
+COMPRESS_ORDERBY = "time DESC"
+
+
+# Run pytraderSchema.sql (every statement is IF NOT EXISTS), one statement
+# at a time so none of them ends up inside an implicit transaction block
+async def apply_schema(conn, path: str = SCHEMA_FILE):
+    with open(path) as f:
+        statements = f.read().split(";")
+    for statement in statements:
+        if any(line.strip() and not line.strip().startswith("--") for line in statement.splitlines()):
+            await conn.execute(statement)
+    logging.info(f"Applied {path}")
+
+
+# Chunking, compression, retention and reorder settings for one hypertable
+async def apply_table_policy(conn, table: str, policy: dict):
+    if policy.get("chunk_interval"):
+        await conn.execute("SELECT set_chunk_time_interval($1::regclass, $2::text::interval)",
+                           table, policy["chunk_interval"])
+
+    if policy.get("compress_after"):
+        await enable_compression(conn, table)
+        await conn.execute("SELECT remove_compression_policy($1::regclass, if_exists => true)", table)
+        await conn.execute("SELECT add_compression_policy($1::regclass, $2::text::interval)",
+                           table, policy["compress_after"])
+
+    await conn.execute("SELECT remove_retention_policy($1::regclass, if_exists => true)", table)
+    if policy.get("retention"):
+        await conn.execute("SELECT add_retention_policy($1::regclass, $2::text::interval)",
+                           table, policy["retention"])
+
+    await conn.execute("SELECT remove_reorder_policy($1::regclass, if_exists => true)", table)
+    if policy.get("reorder_index"):
+        await conn.execute("SELECT add_reorder_policy($1::regclass, $2)", table, policy["reorder_index"])
+
+    logging.info(f"{table}: " + ", ".join(f"{k}={v}" for k, v in policy.items()))
+
+
+async def apply_storage_policies(conn, policies: dict = STORAGE_POLICIES):
+    for table, policy in policies.items():
+        await apply_table_policy(conn, table, policy)
+
+
+# Turn on native compression (segment by symbol, newest first). Settings
+# can't be changed while chunks are compressed, so an already enabled table
+# is left alone unless its settings differ, which is reported instead.
+async def enable_compression(conn, table: str):
+    enabled = await conn.fetchval("""
+        SELECT compression_enabled FROM timescaledb_information.hypertables
+        WHERE hypertable_name = $1
+    """, table)
+    if enabled is None:
+        raise ValueError(f"{table} is not a hypertable")
+    if enabled:
+        segmentby = await conn.fetch("""
+            SELECT attname FROM timescaledb_information.compression_settings
+            WHERE hypertable_name = $1 AND segmentby_column_index IS NOT NULL
+        """, table)
+        if [row["attname"] for row in segmentby] != [COMPRESS_SEGMENTBY]:
+            logging.warning(f"{table} is compressed with segmentby {[row['attname'] for row in segmentby]}, "
+                            f"not {COMPRESS_SEGMENTBY!r}; decompress it to change the settings")
+        return
+    await conn.execute(f"""
+        ALTER TABLE {table} SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = '{COMPRESS_SEGMENTBY}',
+            timescaledb.compress_orderby = '{COMPRESS_ORDERBY}'
+        )
+    """)
+
+
+# Compress every chunk older than `older_than` now instead of waiting for
+# the policy job. Returns the number of chunks compressed.
+async def compress_chunks(conn, table: str, older_than: str = None) -> int:
+    if older_than is None:
+        chunks = await conn.fetch("SELECT show_chunks($1::regclass) AS chunk", table)
+    else:
+        chunks = await conn.fetch("SELECT show_chunks($1::regclass, older_than => $2::text::interval) AS chunk",
+                                  table, older_than)
+    for row in chunks:
+        await conn.execute("SELECT compress_chunk($1::regclass, if_not_compressed => true)", row["chunk"])
+    return len(chunks)
+
+
+# Size on disk and compression ratio per hypertable
+async def storage_report(conn, tables=tuple(STORAGE_POLICIES)) -> dict:
+    report = {}
+    for table in tables:
+        total = await conn.fetchval("SELECT hypertable_size($1::regclass)", table)
+        stats = await conn.fetchrow("""
+            SELECT sum(total_chunks) AS chunks, sum(number_compressed_chunks) AS compressed,
+                   sum(before_compression_total_bytes) AS before, sum(after_compression_total_bytes) AS after
+            FROM hypertable_compression_stats($1::regclass)
+        """, table)
+        report[table] = {
+            "bytes": total,
+            "chunks": stats["chunks"],
+            "compressed_chunks": stats["compressed"],
+            "compression_ratio": stats["before"] / stats["after"] if stats["after"] else None,
+        }
+    return report
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Create the schema and apply TimescaleDB storage policies")
+    parser.add_argument("--schema", action="store_true", help=f"run {os.path.basename(SCHEMA_FILE)}")
+    parser.add_argument("--policies", action="store_true", help="apply STORAGE_POLICIES")
+    parser.add_argument("--compress-now", action="store_true",
+                        help="compress chunks past compress_after without waiting for the policy jobs")
+    parser.add_argument("--report", action="store_true", help="print table sizes and compression ratios")
+    args = parser.parse_args()
+
+    await dbq.init_db_pool()
+    try:
+        async with dbq.pool.acquire() as conn:
+            if args.schema:
+                await apply_schema(conn)
+            if args.policies:
+                await apply_storage_policies(conn)
+            if args.compress_now:
+                for table, policy in STORAGE_POLICIES.items():
+                    n = await compress_chunks(conn, table, policy["compress_after"])
+                    print(f"{table}: {n} chunks compressed")
+            if args.report:
+                for table, r in (await storage_report(conn)).items():
+                    ratio = f"{r['compression_ratio']:.1f}x" if r["compression_ratio"] else "-"
+                    print(f"{table:14s} {r['bytes'] / 1e6:10.1f} MB  chunks {r['chunks']} "
+                          f"(compressed {r['compressed_chunks']})  ratio {ratio}")
+    finally:
+        await dbq.close_db_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    asyncio.run(main())
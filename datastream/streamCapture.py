@@ -0,0 +1,210 @@
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import struct
+import sys
+import time
+
+import msgpack
+from alpaca.data.live import CryptoDataStream, StockDataStream
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.latencyMetrics import metrics
+
+# Capture of raw market data stream messages and deterministic replay.
+#
+# capture(stream, path) hooks a StockDataStream/CryptoDataStream so every
+# message it dispatches is appended to a binary log, as received (before
+# alpaca parses it into a Bar) together with its wall-clock arrival time.
+#
+# Log layout: MAGIC, a uint32 length and a msgpack header
+# ({"version", "stream", "started_ns"}), then one record per message:
+#   uint64 arrival time (ns since the epoch), uint32 length, msgpack message
+# Messages are packed with msgpack just as alpaca receives them, so the
+# extension timestamps survive unchanged.
+#
+# ReplayStockStream / ReplayCryptoStream are the real stream classes with
+# the websocket replaced by a log: handlers subscribe with the same
+# subscribe_bars(...) calls and receive the same objects, so
+# strategyManager.on_stock_bar, databaseQueries.on_stock_bar or a whole
+# Runtime can be driven offline. speed=1 keeps the recorded gaps between
+# messages, speed=N divides them by N and speed=0 replays as fast as the
+# handlers allow.
+
+MAGIC = b"TBCAP\x01"
+VERSION = 1
+_RECORD = struct.Struct("<QI")
+_LENGTH = struct.Struct("<I")
+
+
+class CaptureLog:
+    # stream: name stored in the header (e.g. "StockDataStream")
+    # buffer_size: bytes buffered before a write to the file
+    def __init__(self, path: str, stream: str = "", buffer_size: int = 1 << 20):
+        self.path = path
+        self.count = 0
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab", buffering=buffer_size)
+        if new:
+            header = msgpack.packb({"version": VERSION, "stream": stream, "started_ns": time.time_ns()})
+            self._file.write(MAGIC + _LENGTH.pack(len(header)) + header)
+
+    def append(self, msg, arrival_ns: int = None):
+        payload = msgpack.packb(msg)
+        if arrival_ns is None:
+            arrival_ns = time.time_ns()
+        self._file.write(_RECORD.pack(arrival_ns, len(payload)))
+        self._file.write(payload)
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logging.info(f"Captured {self.count} stream messages to {self.path}")
+
+    # Runtime shutdown hook
+    async def aclose(self):
+        self.close()
+
+
+# Append every message `stream` dispatches to the log at `path`. Returns
+# the CaptureLog; close it (or register aclose as a shutdown hook) when done.
+def capture(stream, path: str) -> CaptureLog:
+    log = CaptureLog(path, type(stream).__name__)
+    dispatch = stream._dispatch
+
+    async def _dispatch(msg):
+        # packed before dispatching, as alpaca converts timestamps in place
+        log.append(msg)
+        await dispatch(msg)
+
+    stream._dispatch = _dispatch
+    return log
+
+
+# Default log name: <directory>/<stream>-<UTC start time>.cap
+def capture_path(directory: str, name: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{name}-{stamp}.cap")
+
+
+def read_header(f) -> dict:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a stream capture")
+    (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+    return msgpack.unpackb(f.read(length))
+
+
+# Yield (arrival_ns, message) for every record in the log at `path`. A
+# record cut short by a crash while writing ends the log.
+def read_capture(path: str):
+    with open(path, "rb", buffering=1 << 20) as f:
+        read_header(f)
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            arrival_ns, length = _RECORD.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield arrival_ns, msgpack.unpackb(payload)
+
+
+# Replaces the websocket loop of an alpaca data stream with a capture log.
+class _ReplayMixin:
+    def _init_replay(self, path: str, speed: float, yield_every: int):
+        self.path = path
+        self.speed = speed
+        self.yield_every = yield_every
+        self.replayed = 0
+        self.max_lag_ns = 0
+        self._stopped = False
+
+    async def stop_ws(self):
+        self._stopped = True
+
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        self._running = True
+        speed = self.speed
+        start = None
+        clock = time.perf_counter_ns
+        try:
+            for arrival_ns, msg in read_capture(self.path):
+                if self._stopped:
+                    break
+                if speed:
+                    if start is None:
+                        start, first = clock(), arrival_ns
+                    delay = (arrival_ns - first) / speed - (clock() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay / 1e9)
+                    elif -delay > self.max_lag_ns:
+                        # behind schedule: the handlers are slower than the recording
+                        self.max_lag_ns = -delay
+                    if metrics.enabled:
+                        metrics.record("replay.lag", max(0, int(-delay)))
+                elif self.replayed % self.yield_every == 0:
+                    # let other tasks run, as the socket reads of a live stream would
+                    await asyncio.sleep(0)
+                await self._dispatch(msg)
+                self.replayed += 1
+        finally:
+            self._running = False
+        logging.info(f"Replayed {self.replayed} messages from {self.path}"
+                     + (f", max lag {self.max_lag_ns / 1e6:.1f}ms" if speed else ""))
+
+
+class ReplayStockStream(_ReplayMixin, StockDataStream):
+    # speed: 1 = as recorded, N = N times faster, 0 = as fast as possible
+    # yield_every: at speed 0, messages between yields to the event loop
+    def __init__(self, path: str, speed: float = 1.0, raw_data: bool = False, yield_every: int = 256):
+        super().__init__("replay", "replay", raw_data=raw_data)
+        self._init_replay(path, speed, yield_every)
+
+
+class ReplayCryptoStream(_ReplayMixin, CryptoDataStream):
+    def __init__(self, path: str, speed: float = 1.0, raw_data: bool = False, yield_every: int = 256):
+        super().__init__("replay", "replay", raw_data=raw_data)
+        self._init_replay(path, speed, yield_every)
+
+
+# Summary of a log: message types, span and the busiest second
+def describe(path: str) -> dict:
+    with open(path, "rb") as f:
+        header = read_header(f)
+    types = collections.Counter()
+    per_second = collections.Counter()
+    first = last = None
+    for arrival_ns, msg in read_capture(path):
+        types[msg.get("T")] += 1
+        per_second[arrival_ns // 1_000_000_000] += 1
+        if first is None:
+            first = arrival_ns
+        last = arrival_ns
+    busiest = per_second.most_common(1)
+    return {
+        "stream": header.get("stream"),
+        "messages": sum(types.values()),
+        "types": dict(types),
+        "first": datetime.datetime.fromtimestamp(first / 1e9, datetime.timezone.utc).isoformat() if first else None,
+        "span_s": (last - first) / 1e9 if first else 0.0,
+        "peak_per_sec": busiest[0][1] if busiest else 0,
+        "bytes": os.path.getsize(path),
+    }
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(path)
+        for key, value in describe(path).items():
+            print(f"  {key}: {value}")
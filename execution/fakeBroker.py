@@ -0,0 +1,69 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+# Stand-in for alpaca's TradingClient for exercising the execution path
+# locally. submit_order() sleeps for a configurable latency and can fail a
+# fraction of requests; everything it receives is recorded for inspection.
+# Orders fill in full on submission and the returned order says so, so no
+# trading stream is needed alongside it.
+class FakeBroker:
+    # latency: seconds per request, or a (low, high) range sampled uniformly
+    # failure_rate: probability that a request raises
+    def __init__(self, latency=0.05, failure_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.orders = []           # accepted orders, in completion order
+        self.positions = {}        # symbol -> signed quantity after fills
+        self.max_in_flight = 0     # highest concurrency observed
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def submit_order(self, order_data):
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            latency = self.latency
+            if isinstance(latency, tuple):
+                latency = self._rng.uniform(*latency)
+            fail = self._rng.random() < self.failure_rate
+
+        try:
+            time.sleep(latency)
+            if fail:
+                raise RuntimeError("simulated broker rejection")
+
+            order = SimpleNamespace(
+                id=str(uuid.uuid4()),
+                client_order_id=order_data.client_order_id,
+                sequence=next(self._sequence),
+                symbol=order_data.symbol,
+                qty=order_data.qty,
+                filled_qty=order_data.qty,
+                side=order_data.side,
+                status="filled",
+            )
+            signed = order_data.qty if order_data.side == "buy" else -order_data.qty
+            with self._lock:
+                self.orders.append(order)
+                self.positions[order_data.symbol] = self.positions.get(order_data.symbol, 0) + signed
+            return order
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    # Orders accepted for `symbol`, in the order the broker saw them.
+    def orders_for(self, symbol: str) -> list:
+        return [order for order in self.orders if order.symbol == symbol]
+
+    def get_all_positions(self):
+        return [SimpleNamespace(symbol=symbol, qty=str(qty)) for symbol, qty in self.positions.items() if qty]
+
+    # Every order fills immediately, so there are never open orders.
+    def get_orders(self, filter=None):
+        return []
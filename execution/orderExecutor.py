@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from monitoring.latencyMetrics import metrics
+
+# Hands orders to the broker off the bar-processing path.
+#
+# submit() only appends to a bounded queue. `max_in_flight` workers drain it
+# and talk to the broker concurrently, but never more than one request per
+# symbol at a time: an order for a symbol that is already in flight is parked
+# behind it and sent by the same worker once the earlier one returns, so
+# orders for a symbol reach the broker in the order they were queued. The
+# broker client is synchronous (alpaca's TradingClient), so calls run on a
+# dedicated thread pool sized to the number of workers.
+#
+# With metrics enabled, the time an order waits for a worker (order.wait),
+# the broker call itself (order.broker) and, when submit() is given the
+# time the signal was handled, signal to broker ack (order.signal_to_ack)
+# are recorded.
+class OrderExecutor:
+    # broker: object with a blocking submit_order(order_data=...) method
+    # max_in_flight: number of concurrent broker requests
+    # max_queue: orders accepted but not yet finished before submit() rejects
+    # on_ack(order_data, order) / on_error(order_data, exc): optional callbacks
+    def __init__(self, broker, max_in_flight: int = 4, max_queue: int = 1000,
+                 on_ack=None, on_error=None):
+        self.broker = broker
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.on_ack = on_ack
+        self.on_error = on_error
+        self._queue = None
+        self._workers = None
+        self._pool = None
+        self._backlog = {}     # symbol -> deque of orders waiting behind an in-flight one
+        self._outstanding = 0  # accepted and not yet finished
+        self._idle = None
+
+    @property
+    def running(self) -> bool:
+        return self._workers is not None
+
+    # Start the workers on the running event loop.
+    def start(self):
+        if self.running:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="order")
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_in_flight)]
+
+    # Queue an order without waiting on the broker.
+    # started_ns: optional time.perf_counter_ns() of the signal, for latency
+    # Returns False if the queue is full and the order was dropped.
+    def submit(self, order_data, started_ns: int = None) -> bool:
+        if not self.running:
+            self.start()
+
+        if self._outstanding >= self.max_queue:
+            logging.error(f"Order queue full, dropping {order_data.side} order for {order_data.symbol}")
+            metrics.count("orders.dropped")
+            return False
+
+        self._outstanding += 1
+        self._idle.clear()
+        self._queue.put_nowait((order_data, started_ns, time.perf_counter_ns()))
+        return True
+
+    # Number of orders accepted but not yet acknowledged or failed.
+    def pending(self) -> int:
+        return self._outstanding
+
+    # Stop the workers. With drain=True queued orders are sent first.
+    async def stop(self, drain: bool = True):
+        if not self.running:
+            return
+        if drain:
+            await self._idle.wait()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._pool.shutdown(wait=True)
+        self._queue = None
+        self._workers = None
+        self._pool = None
+        self._backlog = {}
+        self._outstanding = 0
+
+    async def _work(self):
+        while True:
+            item = await self._queue.get()
+            symbol = item[0].symbol
+
+            backlog = self._backlog.get(symbol)
+            if backlog is not None:
+                # another worker is sending for this symbol; it will pick this up
+                backlog.append(item)
+                continue
+
+            backlog = self._backlog[symbol] = deque()
+            try:
+                await self._send(item)
+                while backlog:
+                    await self._send(backlog.popleft())
+            finally:
+                del self._backlog[symbol]
+
+    async def _send(self, item):
+        order_data, started_ns, queued_ns = item
+        loop = asyncio.get_running_loop()
+        timed = metrics.enabled
+        if timed:
+            metrics.record("order.wait", time.perf_counter_ns() - queued_ns)
+        try:
+            order, elapsed_ns = await loop.run_in_executor(self._pool, self._submit_blocking, order_data)
+            if timed:
+                metrics.record("order.broker", elapsed_ns)
+                if started_ns is not None:
+                    metrics.record_since("order.signal_to_ack", started_ns)
+                metrics.count("orders.acked")
+            logging.info(f"Order submitted: {order}")
+            if self.on_ack is not None:
+                self.on_ack(order_data, order)
+        except Exception as e:
+            logging.error(f"Error placing {order_data.side} order for {order_data.symbol}: {e}")
+            if timed:
+                metrics.count("orders.failed")
+            if self.on_error is not None:
+                self.on_error(order_data, e)
+        finally:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._idle.set()
+
+    # Runs on the pool; the duration goes back to the loop to be recorded.
+    def _submit_blocking(self, order_data):
+        start = time.perf_counter_ns()
+        order = self.broker.submit_order(order_data=order_data)
+        return order, time.perf_counter_ns() - start
@@ -0,0 +1,187 @@
+import logging
+import uuid
+
+from alpaca.trading.enums import OrderSide, OrderStatus, QueryOrderStatus
+from alpaca.trading.requests import GetOrdersRequest
+
+# In-memory view of what we hold and what we have asked the broker for.
+#
+# `positions` is the signed quantity held per symbol, `open_orders` the
+# signed quantity of orders sent but not yet filled. Signals are turned
+# into a target position and an order is only needed for the difference
+# between the target and (positions + open_orders), so a signal that repeats
+# bar after bar produces no further orders.
+#
+# The broker accepting an order is not a fill: a DAY market order sent
+# outside regular hours waits, and may still be canceled, expire or be
+# rejected. An order stays in `open_orders` until the broker reports it
+# filled (the quantity moves to `positions`) or finished without a fill (the
+# rest is released). Reports come from the acknowledgement and from the
+# trading stream's trade updates; each carries the order's cumulative filled
+# quantity, so they can arrive in any order or twice. Orders are matched by
+# client_order_id, which on_order_queued() assigns if the request has none.
+#
+# reconcile() replaces the book with the broker's positions and open orders.
+# It runs at startup and periodically as a safety net for missed updates.
+
+# Statuses after which an order will not fill any further. A tuple, as
+# OrderStatus members and plain strings compare equal but hash differently.
+_DONE = (OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.EXPIRED,
+         OrderStatus.REJECTED, OrderStatus.REPLACED)
+
+
+# An order sent for `symbol`: sign is +1 to buy and -1 to sell, qty and
+# filled are unsigned. acked is False while it is still on its way to the
+# broker.
+class _OpenOrder:
+    __slots__ = ("symbol", "sign", "qty", "filled", "acked")
+
+    def __init__(self, symbol: str, sign: int, qty: float, filled: float = 0.0, acked: bool = False):
+        self.symbol = symbol
+        self.sign = sign
+        self.qty = qty
+        self.filled = filled
+        self.acked = acked
+
+    def remaining(self) -> float:
+        return self.sign * (self.qty - self.filled)
+
+
+class PositionBook:
+    # allow_short: when False a SELL signal targets a flat position instead of a short one
+    def __init__(self, allow_short: bool = False):
+        self.allow_short = allow_short
+        self.positions = {}
+        self.open_orders = {}
+        # bumped by every ack, fill and failure, so a broker snapshot taken
+        # while one was applied is not loaded over it
+        self.version = 0
+        self._orders = {}  # client_order_id -> _OpenOrder
+
+    # Current positions and open orders at the broker. Blocking, so run it
+    # off the event loop and hand the result to load().
+    @staticmethod
+    def fetch(trading_client):
+        positions = trading_client.get_all_positions()
+        request = GetOrdersRequest(status=QueryOrderStatus.OPEN, limit=500)
+        return positions, trading_client.get_orders(filter=request)
+
+    # Load current positions and open orders from the broker.
+    def reconcile(self, trading_client):
+        self.load(*self.fetch(trading_client))
+
+    # Replace the book with a fetch() result. Orders queued here but not yet
+    # acknowledged are kept. With `version` (self.version when the fetch
+    # started), returns False without changing anything if an ack, fill or
+    # failure has been applied since.
+    def load(self, positions, orders, version: int = None) -> bool:
+        if version is not None and version != self.version:
+            return False
+
+        self.positions = {}
+        for position in positions:
+            self.positions[position.symbol] = float(position.qty)
+
+        unacked = {key: order for key, order in self._orders.items() if not order.acked}
+        self._orders = {}
+        self.open_orders = {}
+        for order in orders:
+            self._track(str(order.client_order_id),
+                        _OpenOrder(order.symbol, _sign(order.side), float(order.qty or 0),
+                                   float(order.filled_qty or 0), acked=True))
+        for key, order in unacked.items():
+            if key not in self._orders:
+                self._track(key, order)
+
+        logging.info(f"Reconciled {len(self.positions)} positions and {len(self.open_orders)} symbols with open orders")
+        return True
+
+    # Position including orders still in flight.
+    def exposure(self, symbol: str) -> float:
+        return self.positions.get(symbol, 0.0) + self.open_orders.get(symbol, 0.0)
+
+    # Target position for a signal, or None if the signal leaves it unchanged.
+    def target(self, signal: str, qty: float):
+        if signal == "BUY":
+            return qty
+        if signal == "SELL":
+            return -qty if self.allow_short else 0.0
+        return None
+
+    # Signed quantity to order to reach the signal's target (0 if already there).
+    def order_delta(self, symbol: str, signal: str, qty: float) -> float:
+        target = self.target(signal, qty)
+        if target is None:
+            return 0.0
+        return target - self.exposure(symbol)
+
+    def on_order_queued(self, order_data):
+        if order_data.client_order_id is None:
+            order_data.client_order_id = uuid.uuid4().hex
+        self._track(order_data.client_order_id,
+                    _OpenOrder(order_data.symbol, _sign(order_data.side), float(order_data.qty)))
+
+    # The broker accepted the order. Usually nothing has filled yet, but the
+    # returned order may already report fills.
+    def on_order_ack(self, order_data, order):
+        self.version += 1
+        tracked = self._orders.get(order_data.client_order_id)
+        if tracked is not None:
+            tracked.acked = True
+            self._apply(order_data.client_order_id, order)
+
+    def on_order_error(self, order_data, error):
+        self.version += 1
+        tracked = self._orders.pop(order_data.client_order_id, None)
+        if tracked is not None:
+            self._add_open(tracked.symbol, -tracked.remaining())
+
+    # Trading stream handler: fill, partial_fill, canceled, expired,
+    # rejected, ... Orders not sent or loaded by this book are ignored.
+    def on_trade_update(self, update):
+        self.version += 1
+        order = update.order
+        self._apply(str(order.client_order_id), order)
+
+    def _apply(self, key: str, order):
+        tracked = self._orders.get(key)
+        if tracked is None:
+            return
+
+        filled = float(order.filled_qty or 0)
+        if filled > tracked.filled:
+            qty = tracked.sign * (filled - tracked.filled)
+            tracked.filled = filled
+            self._add_open(tracked.symbol, -qty)
+            self._add_position(tracked.symbol, qty)
+
+        if order.status in _DONE:
+            del self._orders[key]
+            unfilled = tracked.remaining()
+            if unfilled:
+                self._add_open(tracked.symbol, -unfilled)
+                status = getattr(order.status, "value", order.status)
+                logging.warning(f"Order for {tracked.symbol} {status}, "
+                                f"{abs(unfilled)} of {tracked.qty} unfilled")
+
+    def _track(self, key: str, order: _OpenOrder):
+        self._orders[key] = order
+        self._add_open(order.symbol, order.remaining())
+
+    def _add_position(self, symbol: str, qty: float):
+        held = self.positions.get(symbol, 0.0) + qty
+        if held == 0:
+            self.positions.pop(symbol, None)
+        else:
+            self.positions[symbol] = held
+
+    def _add_open(self, symbol: str, qty: float):
+        total = self.open_orders.get(symbol, 0.0) + qty
+        if total == 0:
+            self.open_orders.pop(symbol, None)
+        else:
+            self.open_orders[symbol] = total
+
+
+def _sign(side) -> int:
+    return 1 if side == OrderSide.BUY else -1
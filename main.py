@@ -1,36 +1,118 @@
 import asyncio
-import threading
+import datetime
+import time
+import datastream.databaseQueries as dbq
 import strategies.strategyManager as sm
 
-from alpaca.data.live import StockDataStream
-from config import API_KEY, SECRET_KEY, STOCK_SYMBOLS_FILE
+from alpaca.data.live import CryptoDataStream, StockDataStream
+from datastream.streamCapture import ReplayStockStream, capture, capture_path
+from execution.fakeBroker import FakeBroker
+from config import API_KEY, SECRET_KEY, STOCK_SYMBOLS_FILE, CRYPTO_SYMBOLS_FILE
+from monitoring.latencyMetrics import metrics
+from runtime import Runtime
 
 stock_symbols = None
 with open(STOCK_SYMBOLS_FILE) as f:
     stock_symbols = [line.strip() for line in f]
+
+crypto_symbols = None
+with open(CRYPTO_SYMBOLS_FILE) as f:
+    crypto_symbols = [line.strip() for line in f]
     
-stock_stream = StockDataStream(API_KEY, SECRET_KEY)
-stock_stream.subscribe_bars(sm.on_stock_bar, *stock_symbols)
+# Single process. To spread the strategies over several cores, run
+# supervisor.py instead, which shards the symbols across worker processes.
+
+# Evaluate all symbols of a timestamp together instead of bar by bar
+BATCH_MODE = True
+# Store every live bar in the database as well as trading on it
+PERSIST_BARS = True
+# Prime the strategies from stored bars before subscribing
+WARM_UP = True
+# Record hot-path latencies, serve them on http://127.0.0.1:9108/metrics and
+# log a summary every minute
+METRICS = True
+# Append every raw stream message to a capture log in this directory
+# (see datastream/streamCapture.py), e.g. "captures"
+CAPTURE_DIR = None
+# Replay a capture log instead of connecting to alpaca. Orders go to a fake
+# broker. REPLAY_SPEED: 1 = as recorded, N = N times faster, 0 = max speed
+REPLAY_FILE = None
+REPLAY_SPEED = 1.0
+# Extra strategies on resampled bars: timeframe -> strategy factory,
+# e.g. {"15m": sm.build_ensemble}
+TIMEFRAME_STRATEGIES = {}
+
+for timeframe, factory in TIMEFRAME_STRATEGIES.items():
+    sm.add_timeframe_strategy(timeframe, factory)
+
+strategy_handler = sm.on_stock_bar_batched if BATCH_MODE else sm.on_stock_bar
+if BATCH_MODE:
+    sm.bar_batcher.expected_symbols = len(stock_symbols)
+
+BAR_LENGTH = datetime.timedelta(minutes=1)
+
+# A stream allows one handler per symbol, so fan each bar out from here
+async def on_stock_bar(bar):
+    if metrics.enabled:
+        start = time.perf_counter_ns()
+        # a minute bar is complete at timestamp + 1 minute
+        lag = datetime.datetime.now(datetime.timezone.utc) - bar.timestamp - BAR_LENGTH
+        metrics.record("bar.stream_lag", lag // datetime.timedelta(microseconds=1) * 1000)
+
+    if PERSIST_BARS:
+        await dbq.on_stock_bar(bar)
+    await strategy_handler(bar)
+    if TIMEFRAME_STRATEGIES:
+        await sm.resampler.on_bar(bar)
+
+    if metrics.enabled:
+        metrics.record_since("bar.handler", start)
+
+if REPLAY_FILE:
+    stock_stream = ReplayStockStream(REPLAY_FILE, speed=REPLAY_SPEED)
+    fake_broker = FakeBroker(latency=0.05)
+    sm.trading_client = fake_broker
+    sm.order_executor.broker = fake_broker
+    sm.trade_stream = None
+else:
+    stock_stream = StockDataStream(API_KEY, SECRET_KEY)
+stock_stream.subscribe_bars(on_stock_bar, *stock_symbols)
 print(f"Subscribed to: {stock_symbols}")
-       
-def run_stock_stream():
-    stock_stream.run()
-        
+
+crypto_stream = None
+if PERSIST_BARS and not REPLAY_FILE:
+    crypto_stream = CryptoDataStream(API_KEY, SECRET_KEY)
+    crypto_stream.subscribe_bars(dbq.on_crypto_bar, *crypto_symbols)
+    print(f"Recording: {crypto_symbols}")
+
+async def warm_up():
+    await sm.warm_up(stock_symbols, batch=BATCH_MODE)
+
+# Everything runs on this one event loop; shutdown hooks run in reverse order
 async def start():
-    stock_thread = threading.Thread(target=run_stock_stream, daemon=True)
-    stock_thread.start()
-    
-    try:
-        while True:
-            #print("waiting")
-            await asyncio.sleep(10)
-    except (KeyboardInterrupt, asyncio.CancelledError):
-         print("KeyboardInterrupt received. Shutting down...")
-    finally:
-        stock_stream.stop()
-        stock_thread.join()
-        print("Stream stopped.") 
+    runtime = Runtime()
+    runtime.add_stream(stock_stream)
+    if crypto_stream is not None:
+        runtime.add_stream(crypto_stream)
+    if CAPTURE_DIR and not REPLAY_FILE:
+        for stream, name in ((stock_stream, "stocks"), (crypto_stream, "crypto")):
+            if stream is not None:
+                runtime.on_shutdown(capture(stream, capture_path(CAPTURE_DIR, name)).aclose)
+
+    if PERSIST_BARS or WARM_UP:
+        runtime.on_startup(dbq.init_db_pool)
+        runtime.on_shutdown(dbq.close_db_pool)
+    if PERSIST_BARS:
+        runtime.on_shutdown(dbq.flush_buffers)
+    if WARM_UP:
+        runtime.on_startup(warm_up)
+    runtime.on_startup(sm.startup)
+    runtime.on_shutdown(sm.shutdown)
+    if METRICS:
+        runtime.on_startup(metrics.start)
+        runtime.on_shutdown(metrics.stop)
+
+    await runtime.run()
         
 if __name__ == "__main__":
     asyncio.run(start())
-    
\ No newline at end of file
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import time
+
+# Latency histograms and counters for the bar -> signal -> order hot path.
+#
+# Histograms are HDR-style: values (nanoseconds) land in log-linear buckets
+# with SUB_BUCKETS linear steps per power of two, so any recorded value is
+# reported within 1/SUB_BUCKETS (< 0.8%) and recording is a few integer
+# operations and one list increment, with no locks and no allocation. All
+# recording happens on the event-loop thread (the order executor returns
+# broker timings to the loop rather than recording from its threads).
+#
+# Instrumentation is off until `metrics.enabled` is set, so backtests and
+# research code pay only an attribute check. When running, a local HTTP
+# endpoint serves a JSON snapshot and a summary is logged periodically.
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = SUB_BUCKETS >> 1
+MAX_SHIFT = 40  # values up to ~2^48 ns (~3 days)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (SUB_BUCKETS + MAX_SHIFT * _HALF)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, ns: int):
+        if ns < 0:
+            ns = 0
+        if ns < SUB_BUCKETS:
+            index = ns
+        else:
+            shift = ns.bit_length() - SUB_BUCKET_BITS
+            if shift > MAX_SHIFT:
+                shift = MAX_SHIFT
+                ns = (SUB_BUCKETS << MAX_SHIFT) - 1
+            index = shift * _HALF + (ns >> shift)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+
+    # Upper edge of the bucket holding the q-th percentile (0-100), in ns.
+    def percentile(self, q: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, int(self.count * q / 100.0 + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_high(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000.0 if self.count else 0.0,
+            "min_us": (self.min or 0) / 1000.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p90_us": self.percentile(90) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "p99_9_us": self.percentile(99.9) / 1000.0,
+            "max_us": self.max / 1000.0,
+        }
+
+
+def _bucket_high(index: int) -> int:
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // _HALF - 1
+    return ((index - shift * _HALF + 1) << shift) - 1
+
+
+class Metrics:
+    # port: local HTTP port for the JSON snapshot (GET /metrics)
+    # dump_interval: seconds between logged summaries
+    def __init__(self, host: str = "127.0.0.1", port: int = 9108, dump_interval: float = 60.0):
+        self.enabled = False
+        self.host = host
+        self.port = port
+        self.dump_interval = dump_interval
+        self.histograms = {}
+        self.counters = {}
+        self._server = None
+        self._dumper = None
+        self._started = time.time()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def record(self, name: str, ns: int):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(ns)
+
+    # Record the time since `start_ns` (a time.perf_counter_ns() reading)
+    def record_since(self, name: str, start_ns: int):
+        self.record(name, time.perf_counter_ns() - start_ns)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s": time.time() - self._started,
+            "latency": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def format_summary(self) -> str:
+        lines = [f"{'stage':32s} {'count':>9s} {'p50us':>9s} {'p90us':>9s} {'p99us':>9s} {'maxus':>10s}"]
+        for name, h in sorted(self.histograms.items()):
+            s = h.summary()
+            lines.append(f"{name:32s} {s['count']:9d} {s['p50_us']:9.1f} {s['p90_us']:9.1f} "
+                         f"{s['p99_us']:9.1f} {s['max_us']:10.1f}")
+        if self.counters:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+        self._started = time.time()
+
+    # Runtime startup hook: enable recording, serve GET /metrics and start
+    # the periodic summary.
+    async def start(self):
+        self.enabled = True
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            logging.info(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            logging.error(f"Metrics endpoint not started on port {self.port}: {e}")
+        if self.dump_interval:
+            self._dumper = asyncio.create_task(self._dump_periodically())
+
+    # Runtime shutdown hook: stop serving and log a final summary.
+    async def stop(self):
+        if self._dumper is not None:
+            self._dumper.cancel()
+            await asyncio.gather(self._dumper, return_exceptions=True)
+            self._dumper = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.histograms:
+            logging.info("Latency summary:\n" + self.format_summary())
+
+    async def _dump_periodically(self):
+        while True:
+            await asyncio.sleep(self.dump_interval)
+            if self.histograms:
+                logging.info("Latency summary:\n" + self.format_summary())
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1] in (b"/", b"/metrics"):
+                status, body = b"200 OK", json.dumps(self.snapshot()).encode()
+            else:
+                status, body = b"404 Not Found", b'{"error": "not found"}'
+            writer.write(b"HTTP/1.0 " + status + b"\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+        except Exception as e:
+            logging.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+
+metrics = Metrics()
@@ -1,4 +1,5 @@
--- run once to create tables
+-- run once to create tables (python datastream/schemaManager.py --schema --policies
+-- also applies the chunking, compression, retention and reorder policies)
 
 -- For stocks
 CREATE TABLE IF NOT EXISTS stock_bars (
@@ -28,6 +29,177 @@ CREATE TABLE IF NOT EXISTS crypto_bars (
 
 SELECT create_hypertable('crypto_bars', 'time', if_not_exists => TRUE, migrate_data => TRUE);
 
--- Index on symbol
-CREATE INDEX IF NOT EXISTS idx_symbol_stock_bars ON stock_bars(symbol);
-CREATE INDEX IF NOT EXISTS idx_symbol_crypto_bars ON crypto_bars(symbol);
+-- (symbol, time DESC): "symbol X between t0 and t1" and "last N bars of X"
+-- are a single index range scan; the old symbol-only indexes are covered
+DROP INDEX IF EXISTS idx_symbol_stock_bars;
+DROP INDEX IF EXISTS idx_symbol_crypto_bars;
+CREATE INDEX IF NOT EXISTS idx_stock_bars_symbol_time ON stock_bars (symbol, time DESC);
+CREATE INDEX IF NOT EXISTS idx_crypto_bars_symbol_time ON crypto_bars (symbol, time DESC);
+
+-- Completed historical backfill chunks, used to resume interrupted backfills
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    table_name TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    chunk_start TIMESTAMPTZ NOT NULL,
+    chunk_end TIMESTAMPTZ NOT NULL,
+    row_count INTEGER NOT NULL,
+    completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (table_name, symbol, chunk_start, chunk_end)
+);
+
+-- Higher-timeframe bars as continuous aggregates over the 1-minute tables.
+-- Bucket boundaries match datastream/barResampler.py. Queries also see the
+-- newest, not yet materialized buckets (materialized_only = false); the
+-- refresh policies materialize them once they are complete.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS stock_bars_5m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '5 minutes', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM stock_bars
+GROUP BY time_bucket(INTERVAL '5 minutes', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('stock_bars_5m',
+    start_offset => INTERVAL '1 hour',
+    end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS stock_bars_15m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '15 minutes', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM stock_bars
+GROUP BY time_bucket(INTERVAL '15 minutes', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('stock_bars_15m',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '15 minutes',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS stock_bars_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM stock_bars
+GROUP BY time_bucket(INTERVAL '1 hour', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('stock_bars_1h',
+    start_offset => INTERVAL '2 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS stock_bars_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM stock_bars
+GROUP BY time_bucket(INTERVAL '1 day', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('stock_bars_1d',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS crypto_bars_5m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '5 minutes', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM crypto_bars
+GROUP BY time_bucket(INTERVAL '5 minutes', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('crypto_bars_5m',
+    start_offset => INTERVAL '1 hour',
+    end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS crypto_bars_15m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '15 minutes', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM crypto_bars
+GROUP BY time_bucket(INTERVAL '15 minutes', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('crypto_bars_15m',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '15 minutes',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS crypto_bars_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM crypto_bars
+GROUP BY time_bucket(INTERVAL '1 hour', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('crypto_bars_1h',
+    start_offset => INTERVAL '2 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS crypto_bars_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', time) AS time,
+       symbol,
+       first(open, time) AS open,
+       max(high) AS high,
+       min(low) AS low,
+       last(close, time) AS close,
+       sum(volume) AS volume
+FROM crypto_bars
+GROUP BY time_bucket(INTERVAL '1 day', time), symbol
+WITH NO DATA;
+
+SELECT add_continuous_aggregate_policy('crypto_bars_1d',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
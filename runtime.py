@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import signal
+
+# Runs market data streams, persistence and strategy work on one asyncio loop.
+#
+# Alpaca's stream.run() starts its own loop via asyncio.run(), which forced
+# the streams onto daemon threads and left the DB pool and order executor
+# (created on the main loop) being used from another loop. Here each stream's
+# websocket coroutine runs as a task on the current loop instead, so every
+# handler, the DB pool and the order executor share one loop and no bar has
+# to hop threads.
+#
+# Startup hooks run in order before the streams connect; shutdown hooks run
+# in reverse order after the streams have stopped, on Ctrl+C, SIGTERM or
+# when a stream task exits.
+class Runtime:
+    def __init__(self, stop_timeout: float = 10.0):
+        self.stop_timeout = stop_timeout
+        self._streams = []
+        self._startup = []
+        self._shutdown = []
+        self._stop = None
+
+    def add_stream(self, stream):
+        self._streams.append(stream)
+
+    # hook: zero-argument coroutine function
+    def on_startup(self, hook):
+        self._startup.append(hook)
+
+    def on_shutdown(self, hook):
+        self._shutdown.append(hook)
+
+    # Ask run() to shut down; safe to call from a signal handler.
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows; Ctrl+C then arrives as CancelledError
+
+        tasks = []
+        try:
+            for hook in self._startup:
+                await hook()
+
+            tasks = [asyncio.create_task(stream._run_forever()) for stream in self._streams]
+            stopper = asyncio.create_task(self._stop.wait())
+            done, _ = await asyncio.wait(tasks + [stopper], return_when=asyncio.FIRST_COMPLETED)
+            stopper.cancel()
+            for task in done:
+                if task is not stopper and task.exception() is not None:
+                    logging.error(f"Stream task failed: {task.exception()}")
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("KeyboardInterrupt received. Shutting down...")
+        finally:
+            await self._stop_streams(tasks)
+            for hook in reversed(self._shutdown):
+                try:
+                    await hook()
+                except Exception as e:
+                    logging.error(f"Shutdown step {getattr(hook, '__name__', hook)} failed: {e}")
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            print("Streams stopped, shutdown complete.")
+
+    async def _stop_streams(self, tasks):
+        for stream in self._streams:
+            try:
+                await stream.stop_ws()
+            except Exception as e:
+                logging.error(f"Error stopping stream: {e}")
+
+        pending = [task for task in tasks if not task.done()]
+        if not pending:
+            return
+        # the stream notices the stop request within its receive timeout
+        _, pending = await asyncio.wait(pending, timeout=self.stop_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
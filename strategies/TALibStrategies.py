@@ -1,72 +1,103 @@
 import numpy as np
 import talib
-from collections import deque
-from .baseStrategy import BaseStrategy
+
+from . import indicatorGraph as ind
+from .baseStrategy import BaseStrategy, column, signal_codes
+from .streamingIndicators import _EPSILON
+
+# The strategies below reproduce the TA-Lib indicators with the streaming
+# versions in streamingIndicators, so each bar costs O(1) no matter how long
+# the session has been running. The indicators are nodes in the strategy's
+# IndicatorGraph (see baseStrategy) and the attributes below hold their
+# handles. State is fixed-size and kept in __slots__ so thousands of
+# per-symbol instances stay cheap.
+#
+# generate_signals() computes the same signals for a whole history with
+# TA-Lib's own array functions (see BollingerStrategy for the one exception).
 
 class BollingerStrategy(BaseStrategy):
+    __slots__ = ("period", "nbdev", "bands")
+
     def __init__(self, period=20, nbdev=2.0, name="Bollinger_Strategy"):
         super().__init__(name)
         self.period = period
         self.nbdev = nbdev
-        self.close_prices = deque(maxlen=period*2)  # store some extra
+        self._own_graph()
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        close_price = bar_data["close"]
-        self.close_prices.append(close_price)
+    def declare(self, graph):
+        self.bands = graph.add(ind.bbands(self.period, self.nbdev))
+
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        close_price = bar.close
+        bands = self.graph.values[self.bands]
 
         # Not enough data
-        if len(self.close_prices) < self.period:
+        if bands is None:
             return "HOLD"
 
-        prices = np.array(self.close_prices, dtype=float)
-
-        # TA-Lib BBANDS
-        upper, middle, lower = talib.BBANDS(
-            prices,
-            timeperiod=self.period,
-            nbdevup=self.nbdev,
-            nbdevdn=self.nbdev,
-            matype=0  # 0 = simple moving average
-        )
-
-        last_close = prices[-1]
-        last_upper = upper[-1]
-        last_lower = lower[-1]
+        last_upper, _, last_lower = bands
 
         # Simple logic:
-        if last_close < last_lower:
+        if close_price < last_lower:
             return "BUY"
-        elif last_close > last_upper:
+        elif close_price > last_upper:
             return "SELL"
         else:
             return "HOLD"
 
+    # The middle band is talib.SMA. The deviation repeats the streaming
+    # bands' running sum of squares (TA-Lib's classic arithmetic) instead of
+    # calling talib.BBANDS: newer TA-Lib releases compute it differently, and
+    # the last-bit difference flips closes that sit exactly on a band. The
+    # running sum is a cumsum over the same sequence of additions and
+    # removals, so every value is the streaming one.
+    def generate_signals(self, bars) -> np.ndarray:
+        close = column(bars, "close")
+        n, period = len(close), self.period
+        codes = np.zeros(n, dtype=np.int8)
+        if n < period:
+            return codes
+
+        squares = close * close
+        steps = np.empty(2 * n - period)
+        steps[:period] = squares[:period]
+        steps[period::2] = -squares[:n - period]
+        steps[period + 1::2] = squares[period:]
+        mean_sq = np.cumsum(steps)[period - 1::2] / period
+        middle = talib.SMA(close, timeperiod=period)[period - 1:]
+        mean_sq -= middle * middle
+        stddev = np.where(mean_sq < _EPSILON, 0.0, np.sqrt(np.maximum(mean_sq, 0.0)))
+
+        close = close[period - 1:]
+        codes[period - 1:] = signal_codes(close < middle - stddev * self.nbdev, close > middle + stddev * self.nbdev)
+        return codes
+
 class MACDStrategy(BaseStrategy):
+    __slots__ = ("fast", "slow", "signal", "macd")
+
     def __init__(self, fast=12, slow=26, signal=9, name="MACD_Strategy"):
         super().__init__(name)
-        self.prices = deque()
         self.fast = fast
         self.slow = slow
         self.signal = signal
+        self._own_graph()
+
+    def declare(self, graph):
+        self.macd = graph.add(ind.macd(self.fast, self.slow, self.signal))
+
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        values = self.graph.values[self.macd]
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        self.prices.append(bar_data["close"])
-        
         # If not enough data to calculate MACD, hold
-        if len(self.prices) < self.slow:
+        if values is None:
             return "HOLD"
 
-        arr = np.array(self.prices, dtype=float)
-        macd, macd_signal, macd_hist = talib.MACD(
-            arr,
-            fastperiod=self.fast,
-            slowperiod=self.slow,
-            signalperiod=self.signal
-        )
-
         # get latest
-        last_macd = macd[-1]
-        last_signal = macd_signal[-1]
+        last_macd, last_signal, _ = values
 
         if last_macd > last_signal:
             return "BUY"
@@ -75,43 +106,34 @@ class MACDStrategy(BaseStrategy):
         else:
             return "HOLD"
 
+    def generate_signals(self, bars) -> np.ndarray:
+        macd, signal, _ = talib.MACD(column(bars, "close"), fastperiod=self.fast,
+                                     slowperiod=self.slow, signalperiod=self.signal)
+        return signal_codes(macd > signal, macd < signal)
+
 class StochasticStrategy(BaseStrategy):
+    __slots__ = ("fastk_period", "slowk_period", "slowd_period", "stoch")
+
     def __init__(self, fastk_period=14, slowk_period=3, slowd_period=3, name="Stoch_Strategy"):
         super().__init__(name)
-        self.highs = deque()
-        self.lows = deque()
-        self.closes = deque()
         self.fastk_period = fastk_period
         self.slowk_period = slowk_period
         self.slowd_period = slowd_period
+        self._own_graph()
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        self.highs.append(bar_data["high"])
-        self.lows.append(bar_data["low"])
-        self.closes.append(bar_data["close"])
+    def declare(self, graph):
+        self.stoch = graph.add(ind.stoch(self.fastk_period, self.slowk_period, self.slowd_period))
 
-        # need at least fastk_period bars
-        if len(self.closes) < self.fastk_period:
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        values = self.graph.values[self.stoch]
+
+        # need fastk_period bars plus the two smoothing windows
+        if values is None:
             return "HOLD"
 
-        highs_arr = np.array(self.highs, dtype=float)
-        lows_arr = np.array(self.lows, dtype=float)
-        closes_arr = np.array(self.closes, dtype=float)
-
-        # Stochastic
-        slowk, slowd = talib.STOCH(
-            highs_arr,
-            lows_arr,
-            closes_arr,
-            fastk_period=self.fastk_period,
-            slowk_period=self.slowk_period,
-            slowk_matype=0,
-            slowd_period=self.slowd_period,
-            slowd_matype=0
-        )
-
-        k_value = slowk[-1]
-        d_value = slowd[-1]
+        k_value, d_value = values
 
         if k_value < 20 and d_value < 20:
             return "BUY"
@@ -120,31 +142,42 @@ class StochasticStrategy(BaseStrategy):
         else:
             return "HOLD"
 
+    def generate_signals(self, bars) -> np.ndarray:
+        k, d = talib.STOCH(column(bars, "high"), column(bars, "low"), column(bars, "close"),
+                           fastk_period=self.fastk_period, slowk_period=self.slowk_period, slowk_matype=0,
+                           slowd_period=self.slowd_period, slowd_matype=0)
+        return signal_codes((k < 20) & (d < 20), (k > 80) & (d > 80))
+
 class ParabolicSARStrategy(BaseStrategy):
+    __slots__ = ("acceleration", "maximum", "sar")
+
     def __init__(self, acceleration=0.02, maximum=0.2, name="PSAR_Strategy"):
         super().__init__(name)
-        self.highs = deque()
-        self.lows = deque()
         self.acceleration = acceleration
         self.maximum = maximum
+        self._own_graph()
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        self.highs.append(bar_data["high"])
-        self.lows.append(bar_data["low"])
+    def declare(self, graph):
+        self.sar = graph.add(ind.sar(self.acceleration, self.maximum))
 
-        if len(self.highs) < 2:  # need at least 2-3 bars
-            return "HOLD"
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        last_psar = self.graph.values[self.sar]
 
-        hs = np.array(self.highs, dtype=float)
-        ls = np.array(self.lows, dtype=float)
+        if last_psar is None:  # need at least 2 bars
+            return "HOLD"
 
-        # compute parabolic SAR
-        psar = talib.SAR(hs, ls, acceleration=self.acceleration, maximum=self.maximum)
-        last_psar = psar[-1]
-        last_close = bar_data["close"]
+        last_close = bar.close
 
         # if psar below close => uptrend => buy
         if last_psar < last_close:
             return "BUY"
         else:
             return "SELL"  # or "HOLD"
+
+    def generate_signals(self, bars) -> np.ndarray:
+        psar = talib.SAR(column(bars, "high"), column(bars, "low"),
+                         acceleration=self.acceleration, maximum=self.maximum)
+        buy = psar < column(bars, "close")
+        return signal_codes(buy, ~np.isnan(psar) & ~buy)
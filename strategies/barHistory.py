@@ -0,0 +1,87 @@
+from array import array
+from operator import attrgetter
+
+# Compact bar type and per-symbol OHLCV history shared by strategies.
+#
+# Strategies take any object with open/high/low/close/volume attributes, so
+# live alpaca Bars and ResampledBars are passed straight through without
+# building a dict per bar. Bar is the equivalent for code that builds bars
+# itself (warm-up, backtests, benchmarks); its fields are only read during
+# on_bar, so a replay loop can reuse one instance for every row.
+#
+# BarHistory keeps the last `capacity` bars as preallocated float64 arrays,
+# one per field in `fields` (the others are None). An IndicatorGraph keeps
+# one when any node asks to look back over raw prices (require_history):
+# windowed nodes read the value leaving their window from it, so an ensemble
+# appends each bar once instead of every node keeping its own deque of
+# prices.
+# Each value is written twice, at i and i + capacity, so the most recent n
+# values are always one contiguous slice and window() can return a
+# zero-copy memoryview without wrap-around handling.
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class Bar:
+    __slots__ = ("symbol", "timestamp", "open", "high", "low", "close", "volume")
+
+    def __init__(self, symbol=None, timestamp=None, open=0.0, high=0.0, low=0.0, close=0.0, volume=0.0):
+        self.symbol = symbol
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    # Dict-style access for code written against the old bar dicts
+    def __getitem__(self, key):
+        return getattr(self, "timestamp" if key == "ts" else key)
+
+    def __repr__(self):
+        return (f"Bar({self.symbol} {self.timestamp} o={self.open} h={self.high} l={self.low} "
+                f"c={self.close} v={self.volume})")
+
+
+class BarHistory:
+    __slots__ = ("capacity", "count", "end", "open", "high", "low", "close", "volume", "_views", "_columns")
+
+    def __init__(self, capacity: int, fields=FIELDS):
+        self.capacity = max(1, capacity)
+        self.count = 0
+        self.end = self.capacity
+        zeros = bytes(2 * self.capacity * array("d").itemsize)
+        self._views = {}
+        self._columns = []
+        for field in FIELDS:
+            values = array("d", zeros) if field in fields else None
+            setattr(self, field, values)
+            if values is not None:
+                self._views[field] = memoryview(values)
+                self._columns.append((attrgetter(field), values))
+
+    # Number of bars held (at most capacity)
+    def __len__(self):
+        return self.count if self.count < self.capacity else self.capacity
+
+    def append(self, bar):
+        capacity = self.capacity
+        p = self.end - capacity
+        if p == capacity:
+            p = 0
+        q = p + capacity
+        for get, values in self._columns:
+            values[p] = values[q] = get(bar)
+        self.end = q + 1
+        self.count += 1
+
+    # The last `n` values of `field`, oldest first, as a read-only view.
+    # n must not exceed len(self).
+    def window(self, field: str, n: int):
+        end = self.end
+        return self._views[field][end - n:end]
+
+    # The value of `field` `ago` bars back (0 = the latest bar). Hot paths
+    # index the field's array directly: the latest value is at end - 1.
+    def last(self, field: str, ago: int = 0) -> float:
+        return getattr(self, field)[self.end - 1 - ago]
@@ -1,23 +1,74 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+
+from .indicatorGraph import IndicatorGraph
+
+# Integer encoding of signals for the array-based code paths
+BUY_CODE, HOLD_CODE, SELL_CODE = 1, 0, -1
+SIGNAL_CODES = {"BUY": BUY_CODE, "HOLD": HOLD_CODE, "SELL": SELL_CODE}
+SIGNAL_NAMES = {BUY_CODE: "BUY", HOLD_CODE: "HOLD", SELL_CODE: "SELL"}
+
+# One field of a column dict as float64 (see generate_signals)
+def column(bars, field: str) -> np.ndarray:
+    return np.ascontiguousarray(bars[field], dtype=np.float64)
+
+# int8 signal codes from boolean masks; BUY wins where both are set, like
+# the if/elif chains in on_bar, and everything else is a HOLD
+def signal_codes(buy, sell) -> np.ndarray:
+    codes = np.zeros(len(buy), dtype=np.int8)
+    codes[sell] = SELL_CODE
+    codes[buy] = BUY_CODE
+    return codes
+
 # An abstract base class for all trading strategies.
 # Each strategy must implement `on_bar()`, 
 # and optionally can track its own indicators or internal state.
+#
+# Strategies compute their indicators through an IndicatorGraph: declare()
+# adds the nodes they read and keeps the handles, and on_bar reads
+# `self.graph.values[handle]`. Standalone, a strategy owns its graph and
+# updates it with each bar itself; inside an EnsembleStrategy all members
+# declare into the ensemble's graph, so an indicator several of them use is
+# computed once per bar, and the ensemble updates it before asking them.
 class BaseStrategy(ABC):
+    __slots__ = ("name", "graph", "_owns_graph")
+
     def __init__(self, name: str):
         self.name = name
+        self.graph = None
+        self._owns_graph = False
 
-    # Called whenever a new bar arrives for `symbol`.
-    #          {
-    #            'timestamp': datetime,
-    #            'open': float,
-    #           'high': float,
-    #           'low': float,
-    #           'close': float,
-    #           'volume': float,
-    #           ...
-    #         }
+    # Add the indicators this strategy reads to `graph` and keep their handles
+    def declare(self, graph: IndicatorGraph):
+        pass
+
+    # Create a graph that on_bar updates; call at the end of __init__ once
+    # the parameters declare() needs are set.
+    def _own_graph(self):
+        self.graph = IndicatorGraph()
+        self.declare(self.graph)
+        self._owns_graph = True
+
+    # Read from a graph that someone else updates
+    def share_graph(self, graph: IndicatorGraph):
+        self.graph = graph
+        self._owns_graph = False
+        self.declare(graph)
+
+    # Called whenever a new bar arrives for `symbol`. `bar` is any object
+    # with timestamp, open, high, low, close and volume attributes (an
+    # alpaca Bar, a ResampledBar or a barHistory.Bar).
     # Return a string signal: "BUY", "SELL", or "HOLD".
     @abstractmethod
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
+    def on_bar(self, symbol: str, bar) -> str:
         pass
+
+    # Signals for a symbol's whole history in one call. `bars` maps open,
+    # high, low, close and volume to equal-length arrays (a barReader or
+    # BarCache column dict). Returns an int8 array of signal codes where
+    # element i is what on_bar returns for bar i on a fresh instance, computed
+    # with TA-Lib / NumPy array functions instead of a loop over the bars.
+    # Independent of the streaming state, which it neither reads nor changes.
+    def generate_signals(self, bars) -> np.ndarray:
+        raise NotImplementedError(f"{type(self).__name__} has no vectorized signal generation")
@@ -0,0 +1,389 @@
+import asyncio
+
+import numpy as np
+
+from .baseStrategy import BUY_CODE, HOLD_CODE, SELL_CODE
+
+# Vectorized evaluation of the default ensemble (Bollinger, MACD, Parabolic
+# SAR, Stochastic) for many symbols at once.
+#
+# Every indicator keeps its state in NumPy arrays indexed by symbol slot, so
+# one call to BatchEnsemble.update() advances every symbol that printed a bar
+# at a given timestamp and returns a vector of integer signals. The
+# arithmetic follows the scalar indicators in streamingIndicators exactly, so
+# the signals agree with the per-symbol EnsembleStrategy.
+
+# Column layout of the bar matrix passed to BatchEnsemble.update()
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(BAR_FIELDS))
+
+_EPSILON = 0.00000001
+
+
+# Base for the per-indicator state holders: `specs` maps an attribute name to
+# (dtype, fill value, leading shape) so the arrays can grow with the universe.
+# Slots are always the last axis, so ring buffers are (period x slots) and
+# reductions over a window run across contiguous rows.
+class _SlotState:
+    def __init__(self, capacity: int, specs: dict):
+        self._specs = specs
+        for name, (dtype, fill, shape) in specs.items():
+            setattr(self, name, np.full(shape + (capacity,), fill, dtype=dtype))
+
+    def resize(self, capacity: int):
+        for name, (dtype, fill, shape) in self._specs.items():
+            old = getattr(self, name)
+            new = np.full(shape + (capacity,), fill, dtype=dtype)
+            new[..., :old.shape[-1]] = old
+            setattr(self, name, new)
+
+
+# Member updates take:
+#   rows  slots to update, as an index array or a slice when they are 0..k-1
+#         (plain slicing avoids NumPy's fancy-indexing copies on the hot path)
+#   ring  slots for (position, slot) ring access: `rows` when n is a scalar,
+#         otherwise the index array (an array of positions needs one)
+#   n     bars each slot had seen before this one, as an array, or a scalar
+#         when every slot is in step (the common case), which keeps ring
+#         access to plain slicing
+# and compute every row unconditionally, masking rows that are not warmed up
+# at the end, which is cheaper than subsetting once most symbols are ready.
+
+
+# Simple moving average with a ring buffer and running total per slot.
+# `m` counts the values fed to this average; rows with m < 0 have no value
+# yet and their results are ignored.
+class _BatchSMA(_SlotState):
+    def __init__(self, capacity: int, period: int):
+        self.period = period
+        super().__init__(capacity, {
+            "window": (np.float64, 0.0, (period,)),
+            "total": (np.float64, 0.0, ()),
+        })
+
+    def update(self, rows, ring, m, x):
+        p = self.period
+        self.window[m % p, ring] = x
+        total = np.where(m == 0, 0.0, self.total[rows]) + x
+        ready = m + 1 >= p
+        oldest = self.window[(m + 1) % p, ring]
+        self.total[rows] = total - np.where(ready, oldest, 0.0)
+        return total / p
+
+
+class _BatchBollinger(_SlotState):
+    def __init__(self, capacity: int, period: int, nbdev: float):
+        self.period = period
+        self.nbdev = nbdev
+        super().__init__(capacity, {
+            "window": (np.float64, 0.0, (period,)),
+            "total": (np.float64, 0.0, ()),
+            "total_sq": (np.float64, 0.0, ()),
+        })
+
+    def update(self, rows, ring, n, close):
+        p = self.period
+        self.window[n % p, ring] = close
+        total = self.total[rows] + close
+        total_sq = self.total_sq[rows] + close * close
+        ready = n + 1 >= p
+        oldest = np.where(ready, self.window[(n + 1) % p, ring], 0.0)
+        self.total[rows] = total - oldest
+        self.total_sq[rows] = total_sq - oldest * oldest
+
+        middle = total / p
+        mean_sq = total_sq / p
+        mean_sq -= middle * middle
+        stddev = np.sqrt(np.where(mean_sq < _EPSILON, 0.0, mean_sq))
+        upper = middle + stddev * self.nbdev
+        lower = middle - stddev * self.nbdev
+
+        signal = np.where(close < lower, BUY_CODE, np.where(close > upper, SELL_CODE, HOLD_CODE))
+        return np.where(ready, signal, HOLD_CODE)
+
+
+class _BatchMACD(_SlotState):
+    def __init__(self, capacity: int, fast: int, slow: int, signal: int):
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        super().__init__(capacity, {
+            "recent": (np.float64, 0.0, (fast,)),
+            "fast_ema": (np.float64, np.nan, ()),
+            "slow_ema": (np.float64, np.nan, ()),
+            "slow_seed": (np.float64, 0.0, ()),
+            "signal_ema": (np.float64, np.nan, ()),
+            "signal_seed": (np.float64, 0.0, ()),
+        })
+
+    def update(self, rows, ring, n, close):
+        fast, slow, sig = self.fast, self.slow, self.signal
+        self.recent[n % fast, ring] = close
+
+        # slow EMA, seeded with the SMA of the first `slow` closes
+        slow_seed = self.slow_seed[rows] + np.where(n < slow, close, 0.0)
+        self.slow_seed[rows] = slow_seed
+        prev = self.slow_ema[rows]
+        slow_ema = np.where(n >= slow, ((close - prev) * (2.0 / (slow + 1))) + prev,
+                            np.where(n == slow - 1, slow_seed / slow, np.nan))
+        self.slow_ema[rows] = slow_ema
+
+        # fast EMA, seeded on the slow EMA's first bar from the last `fast` closes
+        prev = self.fast_ema[rows]
+        fast_ema = np.where(n >= slow, ((close - prev) * (2.0 / (fast + 1))) + prev, np.nan)
+        seeding = n == slow - 1
+        if np.any(seeding):
+            seeding = np.broadcast_to(seeding, fast_ema.shape)
+            seed_rows = np.arange(self.recent.shape[1])[ring][seeding]
+            start = np.broadcast_to(n, fast_ema.shape)[seeding] - fast + 1
+            seed = np.zeros(len(seed_rows))
+            for j in range(fast):
+                seed += self.recent[(start + j) % fast, seed_rows]
+            fast_ema[seeding] = seed / fast
+        self.fast_ema[rows] = fast_ema
+
+        # signal line: EMA of the MACD line, seeded with its first `signal` values
+        macd = fast_ema - slow_ema
+        m = n - (slow - 1)
+        signal_seed = self.signal_seed[rows] + np.where((m >= 0) & (m < sig), macd, 0.0)
+        self.signal_seed[rows] = signal_seed
+        prev = self.signal_ema[rows]
+        signal_ema = np.where(m >= sig, ((macd - prev) * (2.0 / (sig + 1))) + prev,
+                              np.where(m == sig - 1, signal_seed / sig, np.nan))
+        self.signal_ema[rows] = signal_ema
+
+        signal = np.where(macd > signal_ema, BUY_CODE, np.where(macd < signal_ema, SELL_CODE, HOLD_CODE))
+        return np.where(m >= sig - 1, signal, HOLD_CODE)
+
+
+class _BatchStochastic(_SlotState):
+    def __init__(self, capacity: int, fastk_period: int, slowk_period: int, slowd_period: int):
+        self.fastk_period = fastk_period
+        self.slowk_period = slowk_period
+        self.slowd_period = slowd_period
+        super().__init__(capacity, {
+            "highs": (np.float64, -np.inf, (fastk_period,)),
+            "lows": (np.float64, np.inf, (fastk_period,)),
+        })
+        self.slowk = _BatchSMA(capacity, slowk_period)
+        self.slowd = _BatchSMA(capacity, slowd_period)
+
+    def resize(self, capacity: int):
+        super().resize(capacity)
+        self.slowk.resize(capacity)
+        self.slowd.resize(capacity)
+
+    def update(self, rows, ring, n, high, low, close):
+        k = self.fastk_period
+        self.highs[n % k, ring] = high
+        self.lows[n % k, ring] = low
+
+        highest = self.highs[:, rows].max(axis=0)
+        lowest = self.lows[:, rows].min(axis=0)
+        diff = (highest - lowest) / 100.0
+        fastk = np.divide(close - lowest, diff, out=np.zeros(len(diff)), where=diff != 0.0)
+
+        m = n - (k - 1)
+        slowk = self.slowk.update(rows, ring, m, fastk)
+        m = m - (self.slowk_period - 1)
+        slowd = self.slowd.update(rows, ring, m, slowk)
+
+        signal = np.where((slowk < 20) & (slowd < 20), BUY_CODE,
+                          np.where((slowk > 80) & (slowd > 80), SELL_CODE, HOLD_CODE))
+        return np.where(m >= self.slowd_period - 1, signal, HOLD_CODE)
+
+
+class _BatchParabolicSAR(_SlotState):
+    def __init__(self, capacity: int, acceleration: float, maximum: float):
+        if acceleration > maximum:
+            acceleration = maximum
+        self.acceleration = acceleration
+        self.maximum = maximum
+        super().__init__(capacity, {
+            "prev_high": (np.float64, np.nan, ()),
+            "prev_low": (np.float64, np.nan, ()),
+            "sar": (np.float64, np.nan, ()),
+            "ep": (np.float64, np.nan, ()),
+            "af": (np.float64, acceleration, ()),
+            "is_long": (np.bool_, False, ()),
+        })
+
+    def update(self, rows, ring, n, high, low, close):
+        acc, maximum = self.acceleration, self.maximum
+
+        prev_high = self.prev_high[rows]
+        prev_low = self.prev_low[rows]
+        sar = self.sar[rows]
+        ep = self.ep[rows]
+        af = self.af[rows]
+        is_long = self.is_long[rows]
+
+        # second bar: -DM over one bar picks the starting trend
+        first = n == 1
+        if np.any(first):
+            diff_plus = high - prev_high
+            diff_minus = prev_low - low
+            start_long = ~((diff_minus > 0) & (diff_plus < diff_minus))
+            is_long = np.where(first, start_long, is_long)
+            ep = np.where(first, np.where(start_long, high, low), ep)
+            sar = np.where(first, np.where(start_long, prev_low, prev_high), sar)
+            prev_high = np.where(first, high, prev_high)
+            prev_low = np.where(first, low, prev_low)
+
+        flip_short = is_long & (low <= sar)
+        flip_long = ~is_long & (high >= sar)
+        flip = flip_short | flip_long
+
+        # trend reversal: the SAR jumps to the old extreme point
+        rev = np.where(flip_short,
+                       np.maximum(np.maximum(ep, prev_high), high),
+                       np.minimum(np.minimum(ep, prev_low), low))
+        rev_ep = np.where(flip_short, low, high)
+        rev_next = rev + acc * (rev_ep - rev)
+        rev_next = np.where(flip_short,
+                            np.maximum(np.maximum(rev_next, prev_high), high),
+                            np.minimum(np.minimum(rev_next, prev_low), low))
+
+        # trend continues: extend the extreme point and accelerate
+        extend = np.where(is_long, high > ep, low < ep)
+        cont_ep = np.where(extend, np.where(is_long, high, low), ep)
+        cont_af = np.where(extend, np.minimum(af + acc, maximum), af)
+        cont_next = sar + cont_af * (cont_ep - sar)
+        cont_next = np.where(is_long,
+                             np.minimum(np.minimum(cont_next, prev_low), low),
+                             np.maximum(np.maximum(cont_next, prev_high), high))
+
+        out = np.where(flip, rev, sar)
+        started = n >= 1
+        new_sar = np.where(started, np.where(flip, rev_next, cont_next), sar)
+        new_ep = np.where(started, np.where(flip, rev_ep, cont_ep), ep)
+        new_af = np.where(started, np.where(flip, acc, cont_af), af)
+        new_is_long = np.where(started, is_long ^ flip, is_long)
+        self.sar[rows] = new_sar
+        self.ep[rows] = new_ep
+        self.af[rows] = new_af
+        self.is_long[rows] = new_is_long
+        self.prev_high[rows] = high
+        self.prev_low[rows] = low
+
+        signal = np.where(out < close, BUY_CODE, SELL_CODE)
+        return np.where(started, signal, HOLD_CODE)
+
+
+# Majority vote over a (members x symbols) matrix of signal codes with the
+# same tie rule as EnsembleStrategy: a tie for the top count is a HOLD, so a
+# side wins only with strictly more votes than each of the other two.
+def majority_vote(votes: np.ndarray) -> np.ndarray:
+    buy = (votes == BUY_CODE).sum(axis=0, dtype=np.int16)
+    sell = (votes == SELL_CODE).sum(axis=0, dtype=np.int16)
+    hold = votes.shape[0] - buy - sell
+    result = np.zeros(votes.shape[1], dtype=np.int8)
+    result[(buy > sell) & (buy > hold)] = BUY_CODE
+    result[(sell > buy) & (sell > hold)] = SELL_CODE
+    return result
+
+
+# The default four-member ensemble evaluated for a whole cross-section of
+# symbols per call. Parameters mirror the scalar strategy constructors.
+class BatchEnsemble:
+    def __init__(self, capacity: int = 64,
+                 period=20, nbdev=2.0,
+                 fast=12, slow=26, signal=9,
+                 acceleration=0.02, maximum=0.2,
+                 fastk_period=14, slowk_period=3, slowd_period=3):
+        self.capacity = capacity
+        self.count = np.zeros(capacity, dtype=np.int64)  # bars seen per slot
+        self.bollinger = _BatchBollinger(capacity, period, nbdev)
+        self.macd = _BatchMACD(capacity, fast, slow, signal)
+        self.sar = _BatchParabolicSAR(capacity, acceleration, maximum)
+        self.stoch = _BatchStochastic(capacity, fastk_period, slowk_period, slowd_period)
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for member in (self.bollinger, self.macd, self.sar, self.stoch):
+            member.resize(capacity)
+        count = np.zeros(capacity, dtype=np.int64)
+        count[:self.capacity] = self.count
+        self.count = count
+        self.capacity = capacity
+
+    # slots: (k,) distinct symbol slots, bars: (k x len(BAR_FIELDS)) matrix.
+    # Returns a (k,) int8 vector of signal codes.
+    def update(self, slots, bars) -> np.ndarray:
+        idx = np.asarray(slots, dtype=np.intp)
+        bars = np.asarray(bars, dtype=np.float64)
+        k = len(idx)
+        if k == 0:
+            return np.empty(0, dtype=np.int8)
+        self._ensure_capacity(int(idx.max()) + 1)
+
+        # slots 0..k-1 in order (the whole universe printed) -> use slices
+        rows = idx
+        if idx[0] == 0 and idx[-1] == k - 1 and (k == 1 or (np.diff(idx) > 0).all()):
+            rows = slice(0, k)
+
+        high = bars[:, HIGH]
+        low = bars[:, LOW]
+        close = bars[:, CLOSE]
+        n = self.count[idx]
+        ring = idx
+        if n[0] == n[-1] and (n == n[0]).all():
+            n = n[0]
+            ring = rows
+
+        votes = np.empty((4, k), dtype=np.int8)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            votes[0] = self.bollinger.update(rows, ring, n, close)
+            votes[1] = self.macd.update(rows, ring, n, close)
+            votes[2] = self.sar.update(rows, ring, n, high, low, close)
+            votes[3] = self.stoch.update(rows, ring, n, high, low, close)
+        self.count[idx] = n + 1
+        return majority_vote(votes)
+
+
+# Groups streamed bars by timestamp and hands each complete cross-section to
+# `handler(timestamp, bars)`. A batch is flushed when a bar with a newer
+# timestamp arrives, when `expected_symbols` bars are in, or `flush_delay`
+# seconds after its first bar, whichever happens first.
+class BarBatcher:
+    def __init__(self, handler, flush_delay: float = 0.5, expected_symbols: int = None):
+        self.handler = handler
+        self.flush_delay = flush_delay
+        self.expected_symbols = expected_symbols
+        self._timestamp = None
+        self._bars = {}
+        self._timer = None
+
+    async def add(self, bar):
+        if self._bars and bar.timestamp != self._timestamp:
+            await self.flush()
+
+        self._timestamp = bar.timestamp
+        self._bars[bar.symbol] = bar
+
+        if self.expected_symbols is not None and len(self._bars) >= self.expected_symbols:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._bars:
+            return
+
+        timestamp = self._timestamp
+        bars = list(self._bars.values())
+        self._bars = {}
+        await self.handler(timestamp, bars)
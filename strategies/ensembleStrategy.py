@@ -1,18 +1,66 @@
-from .baseStrategy import BaseStrategy
+import time
+from .baseStrategy import BUY_CODE, HOLD_CODE, SELL_CODE, SIGNAL_CODES, SIGNAL_NAMES, BaseStrategy, column
+from .batchEnsemble import majority_vote
 from collections import Counter
 
+import numpy as np
+
+from monitoring.latencyMetrics import metrics
+
 class EnsembleStrategy(BaseStrategy):
-    # strategies: a list of BaseStrategy instances
+    __slots__ = ("strategies",)
+
+    # strategies: a list of BaseStrategy instances. All members (including
+    # those of nested ensembles) declare their indicators into one
+    # IndicatorGraph, so identical indicators are computed once per bar, and
+    # the ensemble updates it before asking the members.
     def __init__(self, strategies, name="Ensemble_Strategy"):
         super().__init__(name)
         self.strategies = strategies
+        self._own_graph()
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
+    def declare(self, graph):
+        for strat in self.strategies:
+            strat.share_graph(graph)
+
+    def on_bar(self, symbol: str, bar) -> str:
+        if metrics.enabled:
+            return self._on_bar_timed(symbol, bar)
+
+        if self._owns_graph:
+            self.graph.update(bar)
         signals = []
         for strat in self.strategies:
-            signal = strat.on_bar(symbol, bar_data)
+            signal = strat.on_bar(symbol, bar)
             signals.append(signal)
+        return self.vote(signals)
+
+    # on_bar with each member and the vote recorded in the latency metrics
+    def _on_bar_timed(self, symbol: str, bar) -> str:
+        clock = time.perf_counter_ns
+        if self._owns_graph:
+            start = clock()
+            self.graph.update(bar)
+            metrics.record("ensemble.indicators", clock() - start)
 
+        signals = []
+        for strat in self.strategies:
+            start = clock()
+            signals.append(strat.on_bar(symbol, bar))
+            metrics.record("strategy." + strat.name, clock() - start)
+
+        start = clock()
+        signal = self.vote(signals)
+        metrics.record("ensemble.vote", clock() - start)
+        return signal
+
+    # Members' whole-history signals, one row each, put to the same vote
+    def generate_signals(self, bars) -> np.ndarray:
+        votes = np.stack([strat.generate_signals(bars) for strat in self.strategies])
+        return majority_vote(votes)
+
+    @staticmethod
+    def vote(signals) -> str:
         # Count frequency of signals
         counter = Counter(signals)
         if(len(counter) == 1):
@@ -23,3 +71,154 @@ class EnsembleStrategy(BaseStrategy):
             return "HOLD"
         
         return top_two[0][0]
+
+
+# Per-member accuracy tracking and the weighted vote of an
+# AdaptiveEnsembleStrategy, on integer signal codes.
+#
+# Each bar first scores the members that voted on the previous bar against
+# the close-to-close move: BUY is a hit if the close rose, SELL if it fell
+# (HOLDs and unchanged closes are not scored). accuracy is an exponentially
+# weighted hit rate that starts at 0.5 and forgets with the given halflife
+# (in scored calls). A member's vote weighs its accuracy; below min_weight it
+# weighs nothing and is muted.
+#
+# The vote asks members in order of weight and stops as soon as the leading
+# side is ahead by more than the weight still to come, so members that
+# cannot change the outcome are never evaluated, and muted members only on
+# probe bars (every probe_every bars everyone is evaluated and scored, which
+# lets a muted member earn its weight back). Skipping a member loses
+# nothing: its indicators live in the shared graph, which the ensemble
+# updates every bar. The result is the side with strictly the most weight,
+# otherwise HOLD; with equal weights that is EnsembleStrategy.vote.
+class _AdaptiveVote:
+    def __init__(self, n: int, halflife: float, min_weight: float, probe_every: int):
+        self.alpha = 1.0 - 0.5 ** (1.0 / halflife)
+        self.min_weight = min_weight
+        self.probe_every = probe_every
+        # per-member state is a few dozen numbers at most, which plain lists
+        # update faster than numpy arrays
+        self.accuracy = [0.5] * n
+        self.signals = [HOLD_CODE] * n
+        # members that voted BUY or SELL on the last bar, to be scored
+        self.voters = []
+        self.evaluated = 0
+        self.count = 0
+        self._prev_close = None
+        self._reweigh()
+
+    def _reweigh(self):
+        min_weight = self.min_weight
+        self.weights = [a if a >= min_weight else 0.0 for a in self.accuracy]
+        # heaviest first; equal weights keep the members' order
+        self._order = sorted(range(len(self.weights)), key=[-w for w in self.weights].__getitem__)
+        self._total_weight = sum(self.weights)
+
+    # Score the previous bar's votes against the move to `close`
+    def score(self, close: float):
+        prev = self._prev_close
+        self._prev_close = close
+        voters = self.voters
+        if not voters:
+            return
+        self.voters = []
+        if prev is None or close == prev:
+            return
+
+        move = BUY_CODE if close > prev else SELL_CODE
+        accuracy = self.accuracy
+        signals = self.signals
+        alpha = self.alpha
+        for i in voters:
+            accuracy[i] += alpha * ((signals[i] == move) - accuracy[i])
+        self._reweigh()
+
+    # signal_of(i) returns member i's signal code for this bar
+    def vote(self, signal_of) -> int:
+        self.count += 1
+        probe = self.count % self.probe_every == 0
+        weights = self.weights
+        remaining = self._total_weight
+        totals = [0.0, 0.0, 0.0]  # SELL, HOLD, BUY
+        signals = self.signals
+        voters = self.voters
+        evaluated = 0
+        for i in self._order:
+            w = weights[i]
+            if not w and not probe:
+                break
+            code = signal_of(i)
+            signals[i] = code
+            if code != HOLD_CODE:
+                voters.append(i)
+            evaluated += 1
+            totals[code + 1] += w
+            remaining -= w
+            if not probe:
+                top, second = sorted(totals)[:0:-1]
+                if top - second > remaining + 1e-12:
+                    break
+        self.evaluated += evaluated
+
+        sell, hold, buy = totals
+        if buy > sell and buy > hold:
+            return BUY_CODE
+        if sell > buy and sell > hold:
+            return SELL_CODE
+        return HOLD_CODE
+
+
+class AdaptiveEnsembleStrategy(EnsembleStrategy):
+    __slots__ = ("halflife", "min_weight", "probe_every", "votes")
+
+    # halflife: scored calls after which an old hit or miss counts half
+    # min_weight: accuracy below which a member is muted (0.0 mutes nobody,
+    # 0.5 mutes members doing worse than a coin flip)
+    # probe_every: bars between full evaluations of every member
+    def __init__(self, strategies, halflife=50, min_weight=0.0, probe_every=20, name="Adaptive_Ensemble"):
+        self.halflife = halflife
+        self.min_weight = min_weight
+        self.probe_every = probe_every
+        super().__init__(strategies, name)
+        self.votes = self._new_vote()
+
+    def _new_vote(self) -> _AdaptiveVote:
+        return _AdaptiveVote(len(self.strategies), self.halflife, self.min_weight, self.probe_every)
+
+    # (name, accuracy, weight) per member, in member order
+    def weights(self) -> list:
+        return [(strat.name, float(a), float(w))
+                for strat, a, w in zip(self.strategies, self.votes.accuracy, self.votes.weights)]
+
+    def on_bar(self, symbol: str, bar) -> str:
+        timed = metrics.enabled
+        clock = time.perf_counter_ns
+        if self._owns_graph:
+            start = clock() if timed else 0
+            self.graph.update(bar)
+            if timed:
+                metrics.record("ensemble.indicators", clock() - start)
+
+        strategies = self.strategies
+        self.votes.score(bar.close)
+        if timed:
+            def signal_of(i):
+                start = clock()
+                code = SIGNAL_CODES[strategies[i].on_bar(symbol, bar)]
+                metrics.record("strategy." + strategies[i].name, clock() - start)
+                return code
+        else:
+            def signal_of(i):
+                return SIGNAL_CODES[strategies[i].on_bar(symbol, bar)]
+        return SIGNAL_NAMES[self.votes.vote(signal_of)]
+
+    # The weights depend on which members were asked on earlier bars, so the
+    # vote is replayed bar by bar, over the members' vectorized signals.
+    def generate_signals(self, bars) -> np.ndarray:
+        members = np.stack([strat.generate_signals(bars) for strat in self.strategies])
+        votes = self._new_vote()
+        result = []
+        for close, codes in zip(column(bars, "close").tolist(), members.T.tolist()):
+            votes.score(close)
+            result.append(votes.vote(codes.__getitem__))
+        return np.array(result, dtype=np.int8)
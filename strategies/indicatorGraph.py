@@ -0,0 +1,319 @@
+import math
+from operator import attrgetter
+
+from .barHistory import BarHistory
+from .rolling import RollingMax, RollingMin, RollingSum, RollingVariance
+from .streamingIndicators import _EPSILON, EMA, MACD, ParabolicSAR, Stochastic, WilderRSI
+
+# Per-symbol graph of indicator nodes shared by the strategies of an ensemble.
+#
+# Strategies declare the indicators they read with add(spec), where a spec
+# is a hashable tuple built by the helpers below (sma(20), bbands(20, 2.0),
+# ...). Identical specs map to the same node, so an indicator is computed
+# once per bar however many strategies use it, and nodes can be built on
+# other nodes (Bollinger bands reuse the SMA node of the same period).
+# Adding a strategy whose indicators already exist costs only its own
+# decision logic.
+#
+# update(bar) appends the bar to the shared BarHistory if anything asked for
+# one (require_history) and then updates the nodes in the order they were
+# added, which puts every node after its inputs. Windowed nodes keep only
+# running totals (see rolling) and read the value leaving their window back
+# from the BarHistory, so the prices are stored once per symbol, sized for
+# the longest window, and a long window costs no more per bar than a short
+# one. Values are read from `values[handle]` and are None until warmed up,
+# like the streaming indicators they wrap.
+
+
+# Spec helpers
+def sma(period: int, field: str = "close") -> tuple:
+    return ("sma", period, field)
+
+def ema(period: int, field: str = "close") -> tuple:
+    return ("ema", period, field)
+
+def bbands(period: int = 20, nbdev: float = 2.0, field: str = "close") -> tuple:
+    return ("bbands", period, float(nbdev), field)
+
+def macd(fast: int = 12, slow: int = 26, signal: int = 9) -> tuple:
+    return ("macd", fast, slow, signal)
+
+def stoch(fastk_period: int = 14, slowk_period: int = 3, slowd_period: int = 3) -> tuple:
+    return ("stoch", fastk_period, slowk_period, slowd_period)
+
+def sar(acceleration: float = 0.02, maximum: float = 0.2) -> tuple:
+    return ("sar", float(acceleration), float(maximum))
+
+def rsi(period: int = 14) -> tuple:
+    return ("rsi", period)
+
+# RSI from plain averages of the gains and losses over the last `period`
+# changes (what RSIStrategy uses), as opposed to Wilder's smoothing in rsi()
+def simple_rsi(period: int = 14) -> tuple:
+    return ("simple_rsi", period)
+
+# Rolling population standard deviation (Welford)
+def stddev(period: int, field: str = "close") -> tuple:
+    return ("stddev", period, field)
+
+def highest(period: int, field: str = "high") -> tuple:
+    return ("highest", period, field)
+
+def lowest(period: int, field: str = "low") -> tuple:
+    return ("lowest", period, field)
+
+
+class IndicatorGraph:
+    def __init__(self):
+        self.nodes = []
+        self.values = []
+        self._updates = []
+        self.history = None
+        self.count = 0
+        self._handles = {}
+        self._history_length = 0
+        self._history_fields = set()
+
+    # Handle (index into values) for the node computing `spec`, creating it
+    # and its inputs if needed. Nodes must be added before the first bar.
+    def add(self, spec: tuple) -> int:
+        handle = self._handles.get(spec)
+        if handle is not None:
+            return handle
+        if self.count:
+            raise RuntimeError(f"Cannot add indicator {spec} after the first bar")
+
+        factory = _NODES.get(spec[0])
+        if factory is None:
+            raise ValueError(f"Unknown indicator {spec[0]!r}")
+        node = factory(self, *spec[1:])
+        handle = len(self.nodes)
+        self.nodes.append(node)
+        self.values.append(None)
+        self._updates.append((handle, node.update))
+        self._handles[spec] = handle
+        return handle
+
+    # Keep at least the last `n` values of `field` in self.history
+    def require_history(self, n: int, field: str = "close"):
+        if self.count and (n > self._history_length or field not in self._history_fields):
+            raise RuntimeError("Cannot extend the bar history after the first bar")
+        self._history_fields.add(field)
+        if n > self._history_length:
+            self._history_length = n
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def update(self, bar):
+        if self._history_length:
+            if self.history is None:
+                self.history = BarHistory(self._history_length, self._history_fields)
+            self.history.append(bar)
+        self.count += 1
+        values = self.values
+        for handle, update in self._updates:
+            values[handle] = update(bar, values)
+
+
+# Nodes: update(bar, values) returns the node's value for this bar.
+
+# Same running total as streamingIndicators.SMA (and TA-Lib), kept inline
+# as it is the most shared node. The new value and the oldest one, dropped
+# after this bar, are read from the graph's history.
+class _SMANode:
+    __slots__ = ("period", "column", "graph", "_total")
+
+    def __init__(self, graph, period, field):
+        self.period = period
+        self.column = attrgetter(field)
+        self.graph = graph
+        self._total = 0.0
+        graph.require_history(period, field)
+
+    def update(self, bar, values):
+        history = self.graph.history
+        column = self.column(history)
+        end = history.end
+        self._total += column[end - 1]
+        if history.count < self.period:
+            return None
+
+        total = self._total
+        self._total -= column[end - self.period]
+        return total / self.period
+
+
+class _EMANode:
+    __slots__ = ("get", "ema")
+
+    def __init__(self, graph, period, field):
+        self.get = attrgetter(field)
+        self.ema = EMA(period)
+
+    def update(self, bar, values):
+        return self.ema.update(self.get(bar))
+
+
+# Same arithmetic as streamingIndicators.BollingerBands, with the middle
+# band taken from the SMA node of the same period and the value leaving the
+# window from the graph's history.
+class _BBandsNode:
+    __slots__ = ("period", "nbdev", "column", "graph", "middle", "_total_sq")
+
+    def __init__(self, graph, period, nbdev, field):
+        self.period = period
+        self.nbdev = nbdev
+        self.column = attrgetter(field)
+        self.graph = graph
+        self.middle = graph.add(sma(period, field))
+        self._total_sq = 0.0
+
+    def update(self, bar, values):
+        history = self.graph.history
+        column = self.column(history)
+        end = history.end
+        x = column[end - 1]
+        self._total_sq += x * x
+        middle = values[self.middle]
+        if middle is None:
+            return None
+
+        # the oldest value is dropped after this bar, not before it
+        oldest = column[end - self.period]
+        mean_sq = self._total_sq / self.period
+        self._total_sq -= oldest * oldest
+        mean_sq -= middle * middle
+        stddev = math.sqrt(mean_sq) if not mean_sq < _EPSILON else 0.0
+        return (middle + stddev * self.nbdev, middle, middle - stddev * self.nbdev)
+
+
+class _MACDNode:
+    __slots__ = ("macd",)
+
+    def __init__(self, graph, fast, slow, signal):
+        # TA-Lib seeds the fast EMA late to line up with the slow one, so it
+        # is not the same series as ema(fast) and is kept inside this node
+        self.macd = MACD(fast, slow, signal)
+
+    def update(self, bar, values):
+        return self.macd.update(bar.close)
+
+
+class _StochNode:
+    __slots__ = ("stoch",)
+
+    def __init__(self, graph, fastk_period, slowk_period, slowd_period):
+        self.stoch = Stochastic(fastk_period, slowk_period, slowd_period)
+
+    def update(self, bar, values):
+        return self.stoch.update(bar.high, bar.low, bar.close)
+
+
+class _SARNode:
+    __slots__ = ("sar",)
+
+    def __init__(self, graph, acceleration, maximum):
+        self.sar = ParabolicSAR(acceleration, maximum)
+
+    def update(self, bar, values):
+        return self.sar.update(bar.high, bar.low)
+
+
+class _RSINode:
+    __slots__ = ("rsi",)
+
+    def __init__(self, graph, period):
+        self.rsi = WilderRSI(period)
+
+    def update(self, bar, values):
+        return self.rsi.update(bar.close)
+
+
+# Gains and losses of the last `period` close-to-close changes as two
+# rolling sums, instead of re-adding the whole window every bar. The change
+# leaving the window is recomputed from the closes in the graph's history.
+class _SimpleRSINode:
+    __slots__ = ("period", "graph", "gains", "losses")
+
+    def __init__(self, graph, period):
+        self.period = period
+        self.graph = graph
+        self.gains = RollingSum(period)
+        self.losses = RollingSum(period)
+        graph.require_history(period + 2)
+
+    def update(self, bar, values):
+        history = self.graph.history
+        if history.count < 2:
+            return None
+
+        close = history.close
+        end = history.end
+        diff = close[end - 1] - close[end - 2]
+        old_gain = old_loss = None
+        if history.count > self.period + 1:
+            old = close[end - 1 - self.period] - close[end - 2 - self.period]
+            old_gain, old_loss = (old, 0.0) if old >= 0 else (0.0, -old)
+        if diff >= 0:
+            gains = self.gains.update(diff, old_gain)
+            losses = self.losses.update(0.0, old_loss)
+        else:
+            gains = self.gains.update(0.0, old_gain)
+            losses = self.losses.update(-diff, old_loss)
+        if gains is None:
+            return None
+
+        avg_gain = gains / self.period
+        avg_loss = losses / self.period if losses != 0 else 1e-9  # avoid zero-div
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+class _StdDevNode:
+    __slots__ = ("period", "column", "graph", "variance", "_window")
+
+    def __init__(self, graph, period, field):
+        self.period = period
+        self.column = attrgetter(field)
+        self.graph = graph
+        self.variance = RollingVariance(period)
+        self._window = lambda: graph.history.window(field, period)
+        graph.require_history(period + 1, field)
+
+    def update(self, bar, values):
+        history = self.graph.history
+        column = self.column(history)
+        end = history.end
+        old = column[end - 1 - self.period] if history.count > self.period else None
+        variance = self.variance.update(column[end - 1], old, self._window)
+        if variance is None:
+            return None
+        return math.sqrt(variance)
+
+
+# Highest / lowest `field` over the last `period` bars (monotonic deque)
+class _ExtremeNode:
+    __slots__ = ("get", "window")
+
+    def __init__(self, graph, period, field, window):
+        self.get = attrgetter(field)
+        self.window = window(period)
+
+    def update(self, bar, values):
+        return self.window.update(self.get(bar))
+
+
+_NODES = {
+    "sma": _SMANode,
+    "ema": _EMANode,
+    "bbands": _BBandsNode,
+    "macd": _MACDNode,
+    "stoch": _StochNode,
+    "sar": _SARNode,
+    "rsi": _RSINode,
+    "simple_rsi": _SimpleRSINode,
+    "stddev": _StdDevNode,
+    "highest": lambda graph, period, field: _ExtremeNode(graph, period, field, RollingMax),
+    "lowest": lambda graph, period, field: _ExtremeNode(graph, period, field, RollingMin),
+}
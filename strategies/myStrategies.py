@@ -1,54 +1,85 @@
-from baseStrategy import BaseStrategy
-from collections import deque
 import numpy as np
+import talib
+
+from . import indicatorGraph as ind
+from .baseStrategy import BaseStrategy, column, signal_codes
+
+# These strategies read their indicators from the IndicatorGraph (see
+# baseStrategy), so inside an ensemble the moving averages are shared with
+# any other member using the same ones (e.g. Bollinger's SMA(20)). Every
+# indicator is O(1) per bar (running totals, compensated sums and
+# monotonic-deque extremes), so the windows can be made as long as needed.
+
+# The graph's SMAs are running totals, which carry rounding residue once
+# values have left the window; averages this close (relative) are a tie.
+MA_TIE_TOLERANCE = 1e-9
+
+# Rolling sums of `x` as TA-Lib computes them, except that a window holding
+# only zeros sums to exactly 0.0 as with rolling.RollingSum
+def _window_sum(x, period: int) -> np.ndarray:
+    sums = talib.SUM(x, timeperiod=period)
+    sums[talib.SUM((x != 0).astype(np.float64), timeperiod=period) == 0] = 0.0
+    return sums
 
 class MovingAverageCrossoverStrategy(BaseStrategy):
     def __init__(self, short_window=5, long_window=20, name="MA_Crossover"):
         super().__init__(name)
         self.short_window = short_window
         self.long_window = long_window
-        
-        # Deques to store recent close prices
-        self.short_prices = deque(maxlen=short_window)
-        self.long_prices  = deque(maxlen=long_window)
+        self._own_graph()
+
+    def declare(self, graph):
+        self.short_ma = graph.add(ind.sma(self.short_window))
+        self.long_ma = graph.add(ind.sma(self.long_window))
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        close_price = bar_data['close']
-        self.short_prices.append(close_price)
-        self.long_prices.append(close_price)
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        values = self.graph.values
+        short_ma = values[self.short_ma]
+        long_ma = values[self.long_ma]
 
         # If we don't have enough data yet, just hold
-        if len(self.short_prices) < self.short_window or len(self.long_prices) < self.long_window:
+        if short_ma is None or long_ma is None:
             return "HOLD"
-        
-        short_ma = np.mean(self.short_prices)
-        long_ma = np.mean(self.long_prices)
 
-        if short_ma > long_ma:
+        if abs(short_ma - long_ma) <= MA_TIE_TOLERANCE * abs(long_ma):
+            return "HOLD"
+        elif short_ma > long_ma:
             return "BUY"
         elif short_ma < long_ma:
             return "SELL"
         else:
             return "HOLD"
 
+    def generate_signals(self, bars) -> np.ndarray:
+        close = column(bars, "close")
+        short_ma = talib.SMA(close, timeperiod=self.short_window)
+        long_ma = talib.SMA(close, timeperiod=self.long_window)
+        tie = np.abs(short_ma - long_ma) <= MA_TIE_TOLERANCE * np.abs(long_ma)
+        return signal_codes((short_ma > long_ma) & ~tie, (short_ma < long_ma) & ~tie)
+
 class BreakoutStrategy(BaseStrategy):
     def __init__(self, lookback=20, name="Breakout_Strategy"):
         super().__init__(name)
         self.lookback = lookback
-        
-        self.highs = deque(maxlen=lookback)
-        self.lows  = deque(maxlen=lookback)
+        self._own_graph()
+
+    def declare(self, graph):
+        self.highest_high = graph.add(ind.highest(self.lookback, "high"))
+        self.lowest_low = graph.add(ind.lowest(self.lookback, "low"))
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        self.highs.append(bar_data['high'])
-        self.lows.append(bar_data['low'])
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        values = self.graph.values
+        highest_high = values[self.highest_high]
 
-        if len(self.highs) < self.lookback:
+        if highest_high is None:
             return "HOLD"
 
-        current_close = bar_data['close']
-        highest_high = max(self.highs)
-        lowest_low = min(self.lows)
+        current_close = bar.close
+        lowest_low = values[self.lowest_low]
 
         if current_close > highest_high:
             return "BUY"
@@ -57,39 +88,33 @@ class BreakoutStrategy(BaseStrategy):
         else:
             return "HOLD"
 
+    def generate_signals(self, bars) -> np.ndarray:
+        close = column(bars, "close")
+        highest_high = talib.MAX(column(bars, "high"), timeperiod=self.lookback)
+        lowest_low = talib.MIN(column(bars, "low"), timeperiod=self.lookback)
+        return signal_codes(close > highest_high, close < lowest_low)
+
 class RSIStrategy(BaseStrategy):
     def __init__(self, period=14, rsi_buy=30, rsi_sell=70, name="RSI_Strategy"):
         super().__init__(name)
         self.period = period
         self.rsi_buy = rsi_buy
         self.rsi_sell = rsi_sell
-        
-        self.prices = deque(maxlen=period+1)
         self.last_rsi = None
+        self._own_graph()
 
-    def on_bar(self, symbol: str, bar_data: dict) -> str:
-        close_price = bar_data['close']
-        self.prices.append(close_price)
+    def declare(self, graph):
+        self.rsi = graph.add(ind.simple_rsi(self.period))
+
+    def on_bar(self, symbol: str, bar) -> str:
+        if self._owns_graph:
+            self.graph.update(bar)
+        rsi = self.graph.values[self.rsi]
 
         # Not enough data for RSI
-        if len(self.prices) < self.period+1:
+        if rsi is None:
             return "HOLD"
 
-        # Compute price differences
-        gains = 0.0
-        losses = 0.0
-        for i in range(1, len(self.prices)):
-            diff = self.prices[i] - self.prices[i-1]
-            if diff >= 0:
-                gains += diff
-            else:
-                losses += abs(diff)
-
-        avg_gain = gains / self.period
-        avg_loss = losses / self.period if losses != 0 else 1e-9  # avoid zero-div
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
         self.last_rsi = rsi  # store for debugging
 
         # Basic RSI logic: Buy if oversold (< rsi_buy), Sell if overbought (> rsi_sell)
@@ -99,3 +124,15 @@ class RSIStrategy(BaseStrategy):
             return "SELL"
         else:
             return "HOLD"
+
+    def generate_signals(self, bars) -> np.ndarray:
+        close = column(bars, "close")
+        if len(close) <= self.period:
+            return np.zeros(len(close), dtype=np.int8)
+
+        diff = np.diff(close)
+        avg_gain = _window_sum(np.where(diff >= 0, diff, 0.0), self.period) / self.period
+        losses = _window_sum(np.where(diff < 0, -diff, 0.0), self.period)
+        avg_loss = np.where(losses != 0, losses / self.period, 1e-9)  # avoid zero-div
+        rsi = np.concatenate(([np.nan], 100 - (100 / (1 + avg_gain / avg_loss))))
+        return signal_codes(rsi < self.rsi_buy, rsi > self.rsi_sell)
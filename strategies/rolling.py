@@ -0,0 +1,172 @@
+import math
+from collections import deque
+
+# Rolling-window primitives for streaming indicators. Every update is O(1)
+# (amortized O(1) for the extremes) whatever the window length, so a
+# 500-bar window costs the same per bar as a 5-bar one.
+#
+# RollingSum and RollingVariance keep only running state, not the window:
+# the caller passes the value leaving the window, so IndicatorGraph nodes
+# read it from the graph's shared BarHistory instead of each keeping a copy
+# of the prices. update(x, old) pushes the next value, with `old` the value
+# dropping out (None while the window is still filling), and returns the
+# statistic over the last `period` values, or None until that many have
+# been seen. The latest result is also kept in `value`.
+#
+# RollingMax and RollingMin need no eviction: their deque holds only the
+# values that can still become the extreme, and they expire by position.
+
+
+# Sum of the last `period` values. Additions and removals use Neumaier's
+# compensated summation: the rounding error of each operation is collected
+# in a second term, so the sum stays within an ulp or so of the exact window
+# sum instead of drifting as values pass through. A window of zeros sums to
+# exactly 0.0.
+class RollingSum:
+    __slots__ = ("period", "count", "value", "_sum", "_comp", "_nonzero")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self.value = None
+        self._sum = 0.0
+        self._comp = 0.0
+        self._nonzero = 0
+
+    def update(self, x: float, old: float = None):
+        s = self._sum
+        if old is not None:
+            if old:
+                self._nonzero -= 1
+                t = s - old
+                if abs(s) >= abs(old):
+                    self._comp += (s - t) - old
+                else:
+                    self._comp += (-old - t) + s
+                s = t
+        else:
+            self.count += 1
+        if x:
+            self._nonzero += 1
+            t = s + x
+            if abs(s) >= abs(x):
+                self._comp += (s - t) + x
+            else:
+                self._comp += (x - t) + s
+            s = t
+        if not self._nonzero:
+            s = self._comp = 0.0
+        self._sum = s
+
+        if self.count < self.period:
+            return None
+        self.value = s + self._comp
+        return self.value
+
+
+# Mean and variance of the last `period` values with Welford's update
+# (adding a value and dropping the oldest in a single step), which avoids
+# the cancellation of sum(x * x) / n - mean * mean. The sliding update
+# still remembers the rounding of values that have left (a jump in level
+# leaves a residue behind), so both are recomputed exactly every `period`
+# updates from window(), which returns the last `period` values including x
+# and is only called then (O(1) per update on average). ddof=0 gives the
+# population variance, ddof=1 the sample variance.
+class RollingVariance:
+    __slots__ = ("period", "ddof", "count", "mean", "value", "_m2", "_since_exact")
+
+    def __init__(self, period: int, ddof: int = 0):
+        if period <= ddof:
+            raise ValueError(f"period must be greater than ddof ({ddof}), got {period}")
+        self.period = period
+        self.ddof = ddof
+        self.count = 0
+        self.mean = 0.0
+        self.value = None
+        self._m2 = 0.0
+        self._since_exact = 0
+
+    def update(self, x: float, old: float = None, window=None):
+        mean = self.mean
+        if old is not None:
+            n = self.period
+            new_mean = mean + (x - old) / n
+            self._m2 += (x - old) * (x - new_mean + old - mean)
+        else:
+            self.count = n = self.count + 1
+            new_mean = mean + (x - mean) / n
+            self._m2 += (x - mean) * (x - new_mean)
+        self.mean = new_mean
+
+        if n < self.period:
+            return None
+        self._since_exact += 1
+        if self._since_exact >= self.period:
+            self._since_exact = 0
+            window = window()
+            new_mean = math.fsum(window) / n
+            self.mean = new_mean
+            self._m2 = math.fsum((v - new_mean) * (v - new_mean) for v in window)
+        if self._m2 < 0.0:
+            # rounding can push a (near) constant window just below zero
+            self._m2 = 0.0
+        self.value = self._m2 / (n - self.ddof)
+        return self.value
+
+    @property
+    def std(self):
+        return math.sqrt(self.value) if self.value is not None else None
+
+
+# Maximum of the last `period` values. The deque holds (index, value) pairs
+# with decreasing values: a new value evicts every smaller one, as none of
+# them can be the maximum again, and the front is the current maximum.
+class RollingMax:
+    __slots__ = ("period", "value", "_deque", "_count")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.value = None
+        self._deque = deque()
+        self._count = 0
+
+    def update(self, x: float):
+        i = self._count
+        self._count = i + 1
+        d = self._deque
+        while d and d[-1][1] <= x:
+            d.pop()
+        d.append((i, x))
+        if d[0][0] <= i - self.period:
+            d.popleft()
+
+        if self._count < self.period:
+            return None
+        self.value = d[0][1]
+        return self.value
+
+
+# Minimum of the last `period` values (increasing deque, see RollingMax)
+class RollingMin:
+    __slots__ = ("period", "value", "_deque", "_count")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.value = None
+        self._deque = deque()
+        self._count = 0
+
+    def update(self, x: float):
+        i = self._count
+        self._count = i + 1
+        d = self._deque
+        while d and d[-1][1] >= x:
+            d.pop()
+        d.append((i, x))
+        if d[0][0] <= i - self.period:
+            d.popleft()
+
+        if self._count < self.period:
+            return None
+        self.value = d[0][1]
+        return self.value
@@ -1,73 +1,256 @@
+import asyncio
 import logging
 import os
 import sys
+import time
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from alpaca.trading.client import TradingClient
+from alpaca.trading.stream import TradingStream
 from alpaca.trading.requests import MarketOrderRequest, OrderSide, TimeInForce
+import numpy as np
+from .barHistory import Bar
+from .baseStrategy import SIGNAL_NAMES
+from .batchEnsemble import BarBatcher, BatchEnsemble
 from .ensembleStrategy import EnsembleStrategy
+from .symbolRegistry import SymbolRegistry
 from .TALibStrategies import BollingerStrategy, MACDStrategy, ParabolicSARStrategy, StochasticStrategy
 
+import datastream.barReader as barReader
+from datastream.barResampler import BarResampler
+from execution.orderExecutor import OrderExecutor
+from monitoring.latencyMetrics import metrics
+from execution.positionBook import PositionBook
 from config import API_KEY, SECRET_KEY
 
-boll = BollingerStrategy(period=20, nbdev=2)
-macd = MACDStrategy()
-para = ParabolicSARStrategy()
-stoch = StochasticStrategy()
-ensemble = EnsembleStrategy([boll, macd, para, stoch])
+# Build the strategy set for a single symbol
+def build_ensemble():
+    boll = BollingerStrategy(period=20, nbdev=2)
+    macd = MACDStrategy()
+    para = ParabolicSARStrategy()
+    stoch = StochasticStrategy()
+    return EnsembleStrategy([boll, macd, para, stoch])
 
+# One ensemble per symbol, created the first time the symbol shows up
+registry = SymbolRegistry(build_ensemble)
+
+# The stream's Bar goes to the strategies as-is; they only read its fields.
 async def on_stock_bar(bar):
-    bar_dict = {
-        'ts' : bar.timestamp,
-        'open': bar.open,
-        'high': bar.high,
-        'low': bar.low,
-        'close': bar.close,
-        'volume': bar.volume
-    }
-    signal = ensemble.on_bar(bar.symbol, bar_dict)
+    ensemble = registry.get(bar.symbol)
+    signal = ensemble.on_bar(bar.symbol, bar)
     await execute_signal(signal, bar.symbol)
+
+# Higher timeframes: live minute bars go through the resampler, and each
+# subscribed timeframe gets its own per-symbol strategies.
+resampler = BarResampler()
+timeframe_registries = {}
+
+# Run strategies from `factory` on `timeframe` bars ("5m", "15m", "1h", "1d")
+# and trade their signals like the minute strategies'.
+def add_timeframe_strategy(timeframe: str, factory) -> SymbolRegistry:
+    tf_registry = SymbolRegistry(factory)
+
+    async def on_bar(bar):
+        signal = tf_registry.get(bar.symbol).on_bar(bar.symbol, bar)
+        await execute_signal(signal, bar.symbol)
+
+    resampler.subscribe(timeframe, on_bar)
+    timeframe_registries.setdefault(timeframe, []).append(tf_registry)
+    return tf_registry
+
+# Batch mode: bars sharing a timestamp are collected and the default ensemble
+# is evaluated for all of them in one vectorized pass.
+batch_registry = SymbolRegistry(None)
+batch_ensemble = BatchEnsemble()
+
+async def evaluate_batch(timestamp, bars):
+    slots = np.fromiter((batch_registry.slot(bar.symbol) for bar in bars), dtype=np.intp, count=len(bars))
+    matrix = np.array([(bar.open, bar.high, bar.low, bar.close, bar.volume) for bar in bars], dtype=np.float64)
+    if metrics.enabled:
+        start = time.perf_counter_ns()
+        signals = batch_ensemble.update(slots, matrix)
+        metrics.record_since("batch.update", start)
+        metrics.count("batch.evaluations")
+        metrics.count("batch.bars", len(bars))
+    else:
+        signals = batch_ensemble.update(slots, matrix)
+    for bar, code in zip(bars, signals):
+        await execute_signal(SIGNAL_NAMES[int(code)], bar.symbol)
+
+bar_batcher = BarBatcher(evaluate_batch)
+
+async def on_stock_bar_batched(bar):
+    await bar_batcher.add(bar)
     
     
     
+# Bars of stored history replayed into the strategies before going live.
+# MACD(12, 26, 9) is the slowest to warm up and needs 34.
+WARMUP_BARS = 100
+
+# Prime every symbol's strategies with its last `n_bars` stored bars so the
+# first live bar can already produce a signal. Signals from the replay are
+# discarded. Needs the database pool; run before the streams start.
+async def warm_up(symbols, n_bars: int = WARMUP_BARS, batch: bool = False):
+    start = time.perf_counter()
+    bars = await barReader.fetch_latest(symbols, n_bars)
+    loaded = time.perf_counter() - start
+
+    times, names = bars["time"], bars["symbol"]
+    count = len(times)
+    if batch:
+        # slots are looked up once per symbol rather than once per row
+        slot_of = np.array([batch_registry.slot(symbol) for symbol in symbols], dtype=np.intp)
+        slots = slot_of[bars["symbol_id"]]
+        matrix = np.column_stack((bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"]))
+        bounds = (np.flatnonzero(times[1:] != times[:-1]) + 1).tolist()
+        for lo, hi in zip([0] + bounds, bounds + [count]):
+            batch_ensemble.update(slots[lo:hi], matrix[lo:hi])
+    else:
+        opens, highs, lows = bars["open"].tolist(), bars["high"].tolist(), bars["low"].tolist()
+        closes, volumes = bars["close"].tolist(), bars["volume"].tolist()
+        timestamps = times.tolist()
+        # strategies copy what they need, so one Bar is reused for every row
+        bar = Bar()
+        for i, symbol in enumerate(names.tolist()):
+            bar.symbol, bar.timestamp = symbol, timestamps[i]
+            bar.open, bar.high, bar.low, bar.close, bar.volume = opens[i], highs[i], lows[i], closes[i], volumes[i]
+            registry.get(symbol).on_bar(symbol, bar)
+
+    elapsed = time.perf_counter() - start
+    logging.info(f"Warm-up: {count} bars for {len(np.unique(bars['symbol_id']))}/{len(symbols)} symbols in {elapsed:.2f}s "
+                 f"(query {loaded:.2f}s, replay {elapsed - loaded:.2f}s)")
 
 # Create a global or class-level trading client
 trading_client = TradingClient(API_KEY, SECRET_KEY, paper=True)
 
+# Positions and in-flight orders, so only changes in target position are traded
+position_book = PositionBook()
+
+# Fills, cancels, expiries and rejections of our orders. Set to None when
+# trading_client is replaced by a broker that reports fills in its acks.
+trade_stream = TradingStream(API_KEY, SECRET_KEY, paper=True)
+
+# Seconds between position reconciliations while running, in case a trade
+# update was missed (e.g. while the trading stream reconnected)
+RECONCILE_INTERVAL = 300.0
+
+# Orders are sent from a background worker pool so bar handling never waits
+# on the broker's HTTP round trip
+order_executor = OrderExecutor(trading_client, max_in_flight=4, max_queue=1000,
+                               on_ack=position_book.on_order_ack,
+                               on_error=position_book.on_order_error)
+
+# Sync the position book with the account. The account is read off the
+# loop; returns False, leaving the book as it was, if an order was
+# acknowledged or filled meanwhile (the next call will catch up).
+async def reconcile_positions() -> bool:
+    version = position_book.version
+    snapshot = await asyncio.to_thread(PositionBook.fetch, trading_client)
+    return position_book.load(*snapshot, version=version)
+
+async def reconcile_periodically(interval: float = RECONCILE_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await reconcile_positions():
+                logging.info("Orders updated during reconciliation, retrying at the next interval")
+        except Exception:
+            logging.exception("Position reconciliation failed")
+
+async def on_trade_update(update):
+    position_book.on_trade_update(update)
+
+_background_tasks = []
+
+# Runtime startup hook: sync positions, start order workers on this loop and
+# follow our orders until they fill or finish
+async def startup():
+    await reconcile_positions()
+    order_executor.start()
+    if trade_stream is not None:
+        trade_stream.subscribe_trade_updates(on_trade_update)
+        _background_tasks.append(asyncio.create_task(trade_stream._run_forever()))
+    _background_tasks.append(asyncio.create_task(reconcile_periodically()))
+
+# Runtime shutdown hook: evaluate any partial batch, then send queued orders
+async def shutdown():
+    await bar_batcher.flush()
+    flush_signals()
+    await order_executor.stop(drain=True)
+    if trade_stream is not None and _background_tasks:
+        await trade_stream.stop_ws()
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+# Sharded mode (see supervisor.py): a worker process only runs strategies and
+# hands BUY/SELL signals to the execution process, which owns the position
+# book and the order executor. Signals raised while handling bars are
+# collected and put on `signal_queue` as one list per event loop pass, as
+# (signal, symbol, qty, perf_counter_ns) tuples.
+signal_queue = None
+_pending_signals = []
+
+def forward_signals(queue):
+    global signal_queue
+    signal_queue = queue
+
+def flush_signals():
+    if _pending_signals:
+        signal_queue.put(_pending_signals[:])
+        _pending_signals.clear()
+
 logging.basicConfig(
     level=logging.INFO,           # or DEBUG, WARNING, ERROR, etc.
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
-# Receives a signal and places a market order if needed.
-# By default, it buys/sells `qty` shares/contracts.
+# Receives a signal and queues a market order if it changes the target position.
+# BUY targets a long position of `qty` shares/contracts, SELL targets flat.
 async def execute_signal(signal: str, symbol: str, qty: int = 1):
-    # Do nothing
+    timed = metrics.enabled
+    if timed:
+        start = time.perf_counter_ns()
+        metrics.count("signals." + signal)
+
+    # Do nothing. HOLD is the signal for nearly every bar, so it is only
+    # logged at DEBUG and the message is not even built otherwise.
     if signal == "HOLD":
-        logging.info(f"[{symbol}] HOLD signal received, no order placed.")
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"[{symbol}] HOLD signal received, no order placed.")
         return
 
-    # prepare the order
-    if signal == "BUY":
-        side = OrderSide.BUY
-    elif signal == "SELL":
-        side = OrderSide.SELL
-    else:
+    if signal not in ("BUY", "SELL"):
         logging.warning(f"Unknown signal: {signal}")
         return
 
+    if signal_queue is not None:
+        if not _pending_signals:
+            asyncio.get_running_loop().call_soon(flush_signals)
+        _pending_signals.append((signal, symbol, qty, time.perf_counter_ns()))
+        return
+
+    # only trade the difference to the target position
+    delta = position_book.order_delta(symbol, signal, qty)
+    if delta == 0:
+        logging.debug(f"[{symbol}] {signal} signal already matches position, no order placed.")
+        return
+
+    side = OrderSide.BUY if delta > 0 else OrderSide.SELL
     order_data = MarketOrderRequest(
         symbol=symbol,
-        qty=qty,
+        qty=abs(delta),
         side=side,
         time_in_force=TimeInForce.DAY
     )
 
-    try:
-        logging.info(f"Placing {signal} order for {symbol}, qty={qty}")
-        order = trading_client.submit_order(order_data=order_data)
-        logging.info(f"Order submitted: {order}")
-    except Exception as e:
-        logging.error(f"Error placing {signal} order for {symbol}: {e}")
\ No newline at end of file
+    logging.info(f"Queueing {signal} order for {symbol}, qty={abs(delta)}")
+    position_book.on_order_queued(order_data)
+    if not order_executor.submit(order_data, start if timed else None):
+        position_book.on_order_error(order_data, None)
+    if timed:
+        metrics.record_since("order.queue", start)
\ No newline at end of file
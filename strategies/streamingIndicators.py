@@ -0,0 +1,394 @@
+import math
+from collections import deque
+
+from .rolling import RollingMax, RollingMin
+
+# Streaming versions of the TA-Lib indicators used by the strategies.
+# Every indicator keeps a fixed amount of state and does O(1) work per
+# update, so the cost of a bar does not grow with the length of the session.
+#
+# The arithmetic mirrors TA-Lib's C implementation operation for operation
+# (same seeding, same running totals, same order of additions), so the
+# streamed values agree with TA-Lib run over the full history to within
+# TALIB_TOLERANCE (and are normally bit-identical).
+#
+# update() returns None until the indicator has enough data, which lines up
+# with the leading NaNs TA-Lib produces for its lookback period.
+
+TALIB_TOLERANCE = 1e-9
+
+# TA-Lib's TA_IS_ZERO / TA_IS_ZERO_OR_NEG thresholds
+_EPSILON = 0.00000001
+
+
+# Exponential moving average seeded with the SMA of the first `period` values.
+class EMA:
+    __slots__ = ("period", "k", "value", "_seed_sum", "_count")
+
+    def __init__(self, period: int, k: float = None):
+        self.period = period
+        self.k = k if k is not None else 2.0 / (period + 1)
+        self.value = None
+        self._seed_sum = 0.0
+        self._count = 0
+
+    # Start the average directly from a list of values (used by MACD, which
+    # seeds its fast EMA late so it lines up with the slow one).
+    def seed(self, values) -> float:
+        total = 0.0
+        for v in values:
+            total += v
+        self.value = total / self.period
+        self._count = self.period
+        return self.value
+
+    def update(self, x: float):
+        if self.value is not None:
+            self.value = ((x - self.value) * self.k) + self.value
+            return self.value
+
+        self._seed_sum += x
+        self._count += 1
+        if self._count == self.period:
+            self.value = self._seed_sum / self.period
+        return self.value
+
+
+# Simple moving average over a fixed window using a running total.
+class SMA:
+    __slots__ = ("period", "value", "_window", "_total")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.value = None
+        self._window = deque(maxlen=period)
+        self._total = 0.0
+
+    def update(self, x: float):
+        self._window.append(x)
+        self._total += x
+        if len(self._window) < self.period:
+            return None
+
+        total = self._total
+        self._total -= self._window[0]
+        self.value = total / self.period
+        return self.value
+
+
+# Bollinger bands: SMA middle band +/- nbdev population standard deviations.
+# update() returns (upper, middle, lower).
+class BollingerBands:
+    __slots__ = ("period", "nbdevup", "nbdevdn", "value", "stddev",
+                 "_window", "_total", "_total_sq")
+
+    def __init__(self, period: int = 20, nbdevup: float = 2.0, nbdevdn: float = None):
+        self.period = period
+        self.nbdevup = nbdevup
+        self.nbdevdn = nbdevdn if nbdevdn is not None else nbdevup
+        self.value = None
+        self.stddev = None
+        self._window = deque(maxlen=period)
+        self._total = 0.0
+        self._total_sq = 0.0
+
+    def update(self, x: float):
+        self._window.append(x)
+        self._total += x
+        self._total_sq += x * x
+        if len(self._window) < self.period:
+            return None
+
+        oldest = self._window[0]
+        total = self._total
+        self._total -= oldest
+        middle = total / self.period
+
+        mean_sq = self._total_sq / self.period
+        self._total_sq -= oldest * oldest
+        mean_sq -= middle * middle
+        self.stddev = math.sqrt(mean_sq) if not mean_sq < _EPSILON else 0.0
+
+        self.value = (middle + self.stddev * self.nbdevup,
+                      middle,
+                      middle - self.stddev * self.nbdevdn)
+        return self.value
+
+
+# MACD line, signal line and histogram. update() returns (macd, signal, hist).
+class MACD:
+    __slots__ = ("fast", "slow", "signal", "value", "_fast_ema", "_slow_ema",
+                 "_signal_ema", "_recent")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        if slow < fast:
+            fast, slow = slow, fast
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        self.value = None
+        self._fast_ema = EMA(fast)
+        self._slow_ema = EMA(slow)
+        self._signal_ema = EMA(signal)
+        # TA-Lib starts the fast EMA on the same bar as the slow one, seeded
+        # from the `fast` closes ending there, so keep just those until then.
+        self._recent = deque(maxlen=fast)
+
+    def update(self, x: float):
+        slow_value = self._slow_ema.update(x)
+        if self._fast_ema.value is not None:
+            fast_value = self._fast_ema.update(x)
+        else:
+            self._recent.append(x)
+            if slow_value is None:
+                return None
+            fast_value = self._fast_ema.seed(self._recent)
+            self._recent = None
+
+        macd = fast_value - slow_value
+        signal = self._signal_ema.update(macd)
+        if signal is None:
+            return None
+
+        self.value = (macd, signal, macd - signal)
+        return self.value
+
+
+# Slow stochastic oscillator with SMA smoothing. update() returns (slowk, slowd).
+class Stochastic:
+    __slots__ = ("fastk_period", "value", "_highest", "_lowest", "_slowk", "_slowd")
+
+    def __init__(self, fastk_period: int = 14, slowk_period: int = 3, slowd_period: int = 3):
+        self.fastk_period = fastk_period
+        self.value = None
+        self._highest = RollingMax(fastk_period)
+        self._lowest = RollingMin(fastk_period)
+        self._slowk = SMA(slowk_period)
+        self._slowd = SMA(slowd_period)
+
+    def update(self, high: float, low: float, close: float):
+        highest = self._highest.update(high)
+        lowest = self._lowest.update(low)
+        if highest is None:
+            return None
+
+        diff = (highest - lowest) / 100.0
+        fastk = (close - lowest) / diff if diff != 0.0 else 0.0
+
+        slowk = self._slowk.update(fastk)
+        if slowk is None:
+            return None
+        slowd = self._slowd.update(slowk)
+        if slowd is None:
+            return None
+
+        self.value = (slowk, slowd)
+        return self.value
+
+
+# Wilder's parabolic SAR, following TA-Lib's choice of initial direction.
+class ParabolicSAR:
+    __slots__ = ("acceleration", "maximum", "value", "_af", "_ep", "_sar",
+                 "_is_long", "_prev_high", "_prev_low")
+
+    def __init__(self, acceleration: float = 0.02, maximum: float = 0.2):
+        if acceleration > maximum:
+            acceleration = maximum
+        self.acceleration = acceleration
+        self.maximum = maximum
+        self.value = None
+        self._af = acceleration
+        self._ep = None
+        self._sar = None
+        self._is_long = None
+        self._prev_high = None
+        self._prev_low = None
+
+    def update(self, high: float, low: float):
+        if self._prev_high is None:
+            self._prev_high = high
+            self._prev_low = low
+            return None
+
+        if self._is_long is None:
+            # -DM over one bar decides the starting trend
+            diff_plus = high - self._prev_high
+            diff_minus = self._prev_low - low
+            self._is_long = not (diff_minus > 0 and diff_plus < diff_minus)
+            if self._is_long:
+                self._ep = high
+                self._sar = self._prev_low
+            else:
+                self._ep = low
+                self._sar = self._prev_high
+            # TA-Lib uses the current bar as the "previous" one on the first pass
+            prev_high, prev_low = high, low
+        else:
+            prev_high, prev_low = self._prev_high, self._prev_low
+        self._prev_high = high
+        self._prev_low = low
+
+        sar = self._sar
+        ep = self._ep
+        af = self._af
+        acc = self.acceleration
+
+        if self._is_long:
+            if low <= sar:
+                # switch to short
+                self._is_long = False
+                sar = ep
+                if sar < prev_high:
+                    sar = prev_high
+                if sar < high:
+                    sar = high
+                self.value = sar
+                af = acc
+                ep = low
+                sar = sar + af * (ep - sar)
+                if sar < prev_high:
+                    sar = prev_high
+                if sar < high:
+                    sar = high
+            else:
+                self.value = sar
+                if high > ep:
+                    ep = high
+                    af += acc
+                    if af > self.maximum:
+                        af = self.maximum
+                sar = sar + af * (ep - sar)
+                if sar > prev_low:
+                    sar = prev_low
+                if sar > low:
+                    sar = low
+        else:
+            if high >= sar:
+                # switch to long
+                self._is_long = True
+                sar = ep
+                if sar > prev_low:
+                    sar = prev_low
+                if sar > low:
+                    sar = low
+                self.value = sar
+                af = acc
+                ep = high
+                sar = sar + af * (ep - sar)
+                if sar > prev_low:
+                    sar = prev_low
+                if sar > low:
+                    sar = low
+            else:
+                self.value = sar
+                if low < ep:
+                    ep = low
+                    af += acc
+                    if af > self.maximum:
+                        af = self.maximum
+                sar = sar + af * (ep - sar)
+                if sar < prev_high:
+                    sar = prev_high
+                if sar < high:
+                    sar = high
+
+        self._sar = sar
+        self._ep = ep
+        self._af = af
+        return self.value
+
+
+# Wilder-smoothed RSI (TA-Lib's RSI).
+class WilderRSI:
+    __slots__ = ("period", "value", "_prev", "_gain", "_loss", "_count")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.value = None
+        self._prev = None
+        self._gain = 0.0
+        self._loss = 0.0
+        self._count = 0
+
+    def update(self, x: float):
+        if self._prev is None:
+            self._prev = x
+            return None
+
+        diff = x - self._prev
+        self._prev = x
+        self._count += 1
+
+        if self._count <= self.period:
+            if diff < 0:
+                self._loss -= diff
+            else:
+                self._gain += diff
+            if self._count < self.period:
+                return None
+            self._loss /= self.period
+            self._gain /= self.period
+        else:
+            self._loss *= (self.period - 1)
+            self._gain *= (self.period - 1)
+            if diff < 0:
+                self._loss -= diff
+            else:
+                self._gain += diff
+            self._loss /= self.period
+            self._gain /= self.period
+
+        total = self._gain + self._loss
+        if -_EPSILON < total < _EPSILON:
+            self.value = 0.0
+        else:
+            self.value = 100.0 * (self._gain / total)
+        return self.value
+
+
+# Run every indicator over a random walk and compare against TA-Lib.
+# Returns the largest absolute difference seen per indicator.
+def compare_with_talib(n: int = 5000, seed: int = 0) -> dict:
+    import numpy as np
+    import talib
+
+    rng = np.random.default_rng(seed)
+    close = 100.0 + np.cumsum(rng.normal(0.0, 0.5, n))
+    high = close + rng.uniform(0.0, 0.5, n)
+    low = close - rng.uniform(0.0, 0.5, n)
+
+    def streamed(indicator, *columns, width=1):
+        out = np.full((n, width), np.nan)
+        for i in range(n):
+            v = indicator.update(*(c[i] for c in columns))
+            if v is not None:
+                out[i] = v
+        return out
+
+    def max_diff(ours, theirs):
+        theirs = np.column_stack(theirs) if isinstance(theirs, tuple) else theirs[:, None]
+        if not np.array_equal(np.isnan(ours), np.isnan(theirs)):
+            return float("inf")
+        mask = ~np.isnan(theirs)
+        return float(np.max(np.abs(ours[mask] - theirs[mask]), initial=0.0))
+
+    return {
+        "EMA": max_diff(streamed(EMA(20), close), talib.EMA(close, 20)),
+        "SMA": max_diff(streamed(SMA(20), close), talib.SMA(close, 20)),
+        "BBANDS": max_diff(streamed(BollingerBands(20, 2.0), close, width=3),
+                           talib.BBANDS(close, 20, 2.0, 2.0, matype=0)),
+        "MACD": max_diff(streamed(MACD(12, 26, 9), close, width=3),
+                         talib.MACD(close, 12, 26, 9)),
+        "STOCH": max_diff(streamed(Stochastic(14, 3, 3), high, low, close, width=2),
+                          talib.STOCH(high, low, close, 14, 3, 0, 3, 0)),
+        "SAR": max_diff(streamed(ParabolicSAR(0.02, 0.2), high, low),
+                        talib.SAR(high, low, 0.02, 0.2)),
+        "RSI": max_diff(streamed(WilderRSI(14), close), talib.RSI(close, 14)),
+    }
+
+
+# python -m strategies.streamingIndicators (from the project root)
+if __name__ == "__main__":
+    for name, diff in compare_with_talib().items():
+        status = "OK" if diff <= TALIB_TOLERANCE else "MISMATCH"
+        print(f"{name:7s} max abs diff {diff:.3e}  {status}")
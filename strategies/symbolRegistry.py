@@ -0,0 +1,43 @@
+# Keeps one independent strategy instance per symbol so bars from different
+# symbols never share indicator state.
+#
+# Symbols get a dense integer slot the first time they are seen; the slot is
+# stable for the life of the registry, which lets other components keep
+# per-symbol data in flat arrays indexed by slot instead of dicts.
+class SymbolRegistry:
+    __slots__ = ("factory", "max_symbols", "slots", "symbols", "strategies")
+
+    # factory: zero-argument callable returning a fresh strategy for one symbol,
+    #          or None when only the symbol -> slot mapping is needed
+    # max_symbols: optional hard cap on the number of symbols tracked
+    def __init__(self, factory, max_symbols: int = None):
+        self.factory = factory
+        self.max_symbols = max_symbols
+        self.slots = {}        # symbol -> slot index
+        self.symbols = []      # slot index -> symbol
+        self.strategies = []   # slot index -> strategy
+
+    # Slot index for `symbol`, creating its strategy on first use.
+    def slot(self, symbol: str) -> int:
+        idx = self.slots.get(symbol)
+        if idx is not None:
+            return idx
+
+        if self.max_symbols is not None and len(self.symbols) >= self.max_symbols:
+            raise ValueError(f"Symbol registry is full ({self.max_symbols} symbols), cannot add {symbol}")
+
+        idx = len(self.symbols)
+        self.slots[symbol] = idx
+        self.symbols.append(symbol)
+        self.strategies.append(self.factory() if self.factory is not None else None)
+        return idx
+
+    # Strategy instance for `symbol`, created lazily.
+    def get(self, symbol: str):
+        return self.strategies[self.slot(symbol)]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.slots
+
+    def __len__(self) -> int:
+        return len(self.symbols)
@@ -0,0 +1,360 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+
+from config import API_KEY, SECRET_KEY, STOCK_SYMBOLS_FILE, CRYPTO_SYMBOLS_FILE
+from runtime import Runtime
+
+# Sharded live trading: the stock symbols are split across N worker
+# processes that each run the strategies for their share, so strategy CPU
+# scales with cores instead of sharing one interpreter's GIL.
+#
+#   supervisor  - starts everything; in fan-out mode it holds the one stock
+#                 stream and routes each bar to the worker owning the symbol;
+#                 records crypto bars when persisting, as main.py does
+#   worker i    - strategies (and bar persistence / warm-up) for partition i,
+#                 fed by its own stream subscription or by the fan-out queue;
+#                 BUY/SELL signals go to the execution process (see
+#                 strategyManager.forward_signals)
+#   execution   - the only process with a position book and order executor,
+#                 so positions stay consistent and the broker sees one client
+#
+# Alpaca accepts a limited number of market data connections per account,
+# so with more workers than that use --fanout. --fake-stream and
+# --fake-broker run the whole thing offline.
+#
+#   python supervisor.py --workers 4 --fanout
+#   python supervisor.py --workers 4 --fake-stream 390 --interval 0 --fake-broker --symbols 2000
+
+# Base port for the metrics endpoints: execution uses it, worker i uses +1+i
+METRICS_PORT = 9108
+
+
+def load_symbols(path: str) -> list:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# Split symbols into n partitions of near-equal size. Round-robin over the
+# file order keeps a symbol in the same partition from run to run.
+def partition(symbols, n: int) -> list:
+    return [symbols[i::n] for i in range(n)]
+
+
+def _setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(processName)s] [%(levelname)s] %(message)s"
+    )
+
+
+def _make_stream(options: dict):
+    if options["fake_stream"] is not None:
+        from datastream.fakeStream import FakeStockStream
+        return FakeStockStream(minutes=options["fake_stream"], interval=options["interval"],
+                               start=datetime.datetime.fromisoformat(options["start"]))
+    from alpaca.data.live import StockDataStream
+    return StockDataStream(API_KEY, SECRET_KEY)
+
+
+# Receiving end of the fan-out: a worker's stream that reads the bars the
+# supervisor routed to it. A None item ends the stream.
+class QueueStream:
+    def __init__(self, bar_queue):
+        self.bar_queue = bar_queue
+        self.handler = None
+        self._stopped = False
+
+    def subscribe_bars(self, handler, *symbols):
+        self.handler = handler
+
+    async def stop_ws(self):
+        self._stopped = True
+
+    async def _run_forever(self):
+        from strategies.barHistory import Bar
+        loop = asyncio.get_running_loop()
+        while not self._stopped:
+            try:
+                rows = await loop.run_in_executor(None, self.bar_queue.get, True, 0.5)
+            except queue.Empty:
+                continue
+            if rows is None:
+                return
+            for symbol, ts, o, h, l, c, v in rows:
+                await self.handler(Bar(symbol, ts, o, h, l, c, v))
+
+
+# Sending end of the fan-out, subscribed to the supervisor's stream. Bars
+# are routed by symbol and sent as one list per worker per event loop pass,
+# so a minute's burst costs a few queue puts instead of one per bar.
+class BarFanOut:
+    def __init__(self, partitions, bar_queues):
+        self.bar_queues = bar_queues
+        self.owner = {symbol: i for i, part in enumerate(partitions) for symbol in part}
+        self._pending = [[] for _ in bar_queues]
+        self._scheduled = False
+
+    async def on_bar(self, bar):
+        i = self.owner.get(bar.symbol)
+        if i is None:
+            return
+        self._pending[i].append((bar.symbol, bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume))
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self._scheduled = False
+        for i, rows in enumerate(self._pending):
+            if rows:
+                self.bar_queues[i].put(rows)
+                self._pending[i] = []
+
+    # Send what is buffered and end every worker's stream
+    def close(self):
+        self.flush()
+        for bar_queue in self.bar_queues:
+            bar_queue.put(None)
+
+
+# Stream-shaped watcher so the supervisor's Runtime also shuts down when a
+# process it depends on exits (e.g. a worker whose fake stream finished).
+class ProcessWatch:
+    def __init__(self, processes, poll: float = 0.5):
+        self.processes = processes
+        self.poll = poll
+        self._stopped = False
+
+    async def stop_ws(self):
+        self._stopped = True
+
+    async def _run_forever(self):
+        while not self._stopped and all(p.is_alive() for p in self.processes):
+            await asyncio.sleep(self.poll)
+
+
+# Worker process: strategies for `symbols`, signals to `signal_queue`.
+def run_worker(index: int, symbols: list, bar_queue, signal_queue, result_queue, options: dict):
+    _setup_logging()
+    asyncio.run(_worker(index, symbols, bar_queue, signal_queue, result_queue, options))
+
+
+async def _worker(index, symbols, bar_queue, signal_queue, result_queue, options):
+    import datastream.databaseQueries as dbq
+    import strategies.strategyManager as sm
+    from monitoring.latencyMetrics import metrics
+
+    sm.forward_signals(signal_queue)
+    if options["batch"]:
+        sm.bar_batcher.expected_symbols = len(symbols)
+    strategy_handler = sm.on_stock_bar_batched if options["batch"] else sm.on_stock_bar
+    persist = options["persist"]
+    bars = 0
+
+    async def on_stock_bar(bar):
+        nonlocal bars
+        bars += 1
+        if persist:
+            await dbq.on_stock_bar(bar)
+        await strategy_handler(bar)
+
+    stream = QueueStream(bar_queue) if bar_queue is not None else _make_stream(options)
+    stream.subscribe_bars(on_stock_bar, *symbols)
+    logging.info(f"Worker {index}: {len(symbols)} symbols")
+
+    async def warm_up():
+        await sm.warm_up(symbols, batch=options["batch"])
+
+    runtime = Runtime()
+    runtime.add_stream(stream)
+    if persist or options["warm_up"]:
+        runtime.on_startup(dbq.init_db_pool)
+        runtime.on_shutdown(dbq.close_db_pool)
+    if persist:
+        runtime.on_shutdown(dbq.flush_buffers)
+    if options["warm_up"]:
+        runtime.on_startup(warm_up)
+    # no sm.startup: workers have no order executor; shutdown flushes the
+    # last batch and any signals not yet sent
+    runtime.on_shutdown(sm.shutdown)
+    if options["metrics"]:
+        metrics.port = METRICS_PORT + 1 + index
+        runtime.on_startup(metrics.start)
+        runtime.on_shutdown(metrics.stop)
+
+    await runtime.run()
+    result_queue.put({"process": f"worker-{index}", "symbols": len(symbols), "bars": bars,
+                      "cpu_s": time.process_time()})
+
+
+# Execution process: trades the signals of all workers until a None arrives.
+def run_execution(signal_queue, result_queue, options: dict):
+    _setup_logging()
+    # Ctrl+C reaches every process in the group; this one stops when the
+    # supervisor says so, after the workers, so that no signal is lost
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_execution(signal_queue, result_queue, options))
+
+
+async def _execution(signal_queue, result_queue, options):
+    import strategies.strategyManager as sm
+    from monitoring.latencyMetrics import metrics
+
+    broker = None
+    if options["fake_broker"]:
+        from execution.fakeBroker import FakeBroker
+        broker = FakeBroker(latency=0.005)
+        sm.trading_client = broker
+        sm.order_executor.broker = broker
+        sm.trade_stream = None
+
+    if options["metrics"]:
+        metrics.port = METRICS_PORT
+        await metrics.start()
+    await sm.startup()
+
+    loop = asyncio.get_running_loop()
+    received = 0
+    while True:
+        batch = await loop.run_in_executor(None, signal_queue.get)
+        if batch is None:
+            break
+        received += len(batch)
+        for signal_name, symbol, qty, sent_ns in batch:
+            # perf_counter is CLOCK_MONOTONIC on Linux, shared by all processes
+            if metrics.enabled:
+                metrics.record_since("order.ipc", sent_ns)
+            await sm.execute_signal(signal_name, symbol, qty)
+
+    await sm.shutdown()
+    if options["metrics"]:
+        await metrics.stop()
+    result = {"process": "execution", "signals": received, "cpu_s": time.process_time(),
+              "positions": sum(1 for qty in sm.position_book.positions.values() if qty)}
+    if broker is not None:
+        result["orders"] = len(broker.orders)
+    result_queue.put(result)
+
+
+# Start the execution process and `n_workers` workers, run until the
+# streams end or Ctrl+C/SIGTERM, then stop workers before execution.
+def run(n_workers: int, stock_symbols: list, crypto_symbols: list, options: dict) -> list:
+    # spawn: children start clean instead of inheriting the parent's loop,
+    # threads and clients
+    ctx = multiprocessing.get_context("spawn")
+    signal_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    partitions = partition(stock_symbols, n_workers)
+    bar_queues = [ctx.Queue() for _ in partitions] if options["fanout"] else [None] * n_workers
+    for bar_queue in bar_queues:
+        if bar_queue is not None:
+            # a worker stopped by Ctrl+C leaves bars unread; don't hang on exit
+            bar_queue.cancel_join_thread()
+
+    execution = ctx.Process(target=run_execution, name="execution",
+                            args=(signal_queue, result_queue, options))
+    workers = [ctx.Process(target=run_worker, name=f"worker-{i}",
+                           args=(i, part, bar_queues[i], signal_queue, result_queue, options))
+               for i, part in enumerate(partitions)]
+    execution.start()
+    for worker in workers:
+        worker.start()
+    print(f"Supervisor: {len(stock_symbols)} symbols across {n_workers} workers "
+          f"({'fan-out' if options['fanout'] else 'stream per worker'})")
+
+    start = time.perf_counter()
+    fanout = BarFanOut(partitions, bar_queues) if options["fanout"] else None
+    try:
+        asyncio.run(_supervise(workers + [execution], fanout, crypto_symbols, options))
+    finally:
+        if fanout is not None:
+            fanout.close()
+        for worker in workers:
+            worker.join(timeout=30)
+            if worker.is_alive():
+                # SIGTERM: the worker's Runtime shuts down cleanly
+                worker.terminate()
+                worker.join()
+        signal_queue.put(None)
+        execution.join()
+    elapsed = time.perf_counter() - start
+
+    results = []
+    while True:
+        try:
+            results.append(result_queue.get(timeout=1))
+        except queue.Empty:
+            break
+    bars = sum(r.get("bars", 0) for r in results)
+    for r in sorted(results, key=lambda r: r["process"]):
+        print("  " + ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items()))
+    print(f"Supervisor: {bars:,} bars in {elapsed:.1f}s = {bars / elapsed:,.0f} bars/s")
+    return results
+
+
+async def _supervise(processes, fanout, crypto_symbols, options):
+    runtime = Runtime()
+    runtime.add_stream(ProcessWatch(processes))
+    if fanout is not None:
+        stream = _make_stream(options)
+        stream.subscribe_bars(fanout.on_bar, *fanout.owner)
+        runtime.add_stream(stream)
+
+    if options["persist"] and options["fake_stream"] is None:
+        import datastream.databaseQueries as dbq
+        from alpaca.data.live import CryptoDataStream
+        crypto_stream = CryptoDataStream(API_KEY, SECRET_KEY)
+        crypto_stream.subscribe_bars(dbq.on_crypto_bar, *crypto_symbols)
+        runtime.add_stream(crypto_stream)
+        runtime.on_startup(dbq.init_db_pool)
+        runtime.on_shutdown(dbq.close_db_pool)
+        runtime.on_shutdown(dbq.flush_buffers)
+
+    await runtime.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the strategies sharded across worker processes")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--fanout", action="store_true",
+                        help="one stock stream in the supervisor, routed to the workers")
+    parser.add_argument("--symbols", type=int, default=None,
+                        help="trade N generated symbols instead of the symbols file (with --fake-stream)")
+    parser.add_argument("--fake-stream", type=int, default=None, metavar="MINUTES",
+                        help="generate MINUTES of bars locally instead of connecting to alpaca")
+    parser.add_argument("--interval", type=float, default=60.0,
+                        help="seconds between fake minutes (0 = as fast as possible)")
+    parser.add_argument("--fake-broker", action="store_true")
+    parser.add_argument("--no-batch", action="store_true", help="evaluate bar by bar instead of per timestamp")
+    parser.add_argument("--persist", action="store_true", help="store live bars in the database")
+    parser.add_argument("--warm-up", action="store_true", help="prime the strategies from stored bars")
+    parser.add_argument("--metrics", action="store_true")
+    args = parser.parse_args()
+
+    stock_symbols = load_symbols(STOCK_SYMBOLS_FILE)
+    if args.symbols:
+        stock_symbols = [f"SYM{i}" for i in range(args.symbols)]
+    options = {
+        "fanout": args.fanout,
+        "fake_stream": args.fake_stream,
+        "interval": args.interval,
+        # every fake stream starts at the same minute so shards line up
+        "start": datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0).isoformat(),
+        "fake_broker": args.fake_broker,
+        "batch": not args.no_batch,
+        "persist": args.persist,
+        "warm_up": args.warm_up,
+        "metrics": args.metrics,
+    }
+    run(max(1, args.workers), stock_symbols, load_symbols(CRYPTO_SYMBOLS_FILE), options)
+
+
+if __name__ == "__main__":
+    _setup_logging()
+    main()